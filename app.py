@@ -1,7 +1,7 @@
 # this file contains all of the Chalice routing logic to implement the AWS Data API as a REST JSON Endpoint using IAM
 # authentication. The Data API can also be accessed natively as a python library using aws_data_api.py
 from chalice import Chalice, CORSConfig, Response, IAMAuthorizer, CognitoUserPoolAuthorizer, AuthResponse, \
-    BadRequestError, ConflictError, NotFoundError
+    BadRequestError, ConflictError, NotFoundError, Rate
 import http
 import os
 from functools import wraps
@@ -10,11 +10,13 @@ from chalicelib.api_metadata import ApiMetadata
 import chalicelib.parameters as params
 # TODO move data api implementation to cell based layers
 import chalicelib.aws_data_api as dapi
-from chalicelib.streams_integration import StreamsIntegration
+from chalicelib.streams_integration import StreamsIntegration, DELIVERY_BUFFER_INTERVAL_SECONDS, \
+    DELIVERY_BUFFER_SIZE_MB, BULK_FLUSH_SIZE, BULK_CONCURRENCY
 from chalicelib.exceptions import *
 import chalicelib.understander as u
 from chalicelib.data_api_cache import DataApiCache
 import json
+import boto3
 
 # this environment variable is setup by AWS Lambda
 REGION = os.getenv('AWS_REGION')
@@ -74,15 +76,22 @@ else:
 # setup class logger
 log = utils.setup_logging()
 
-# create an API Metadata Handler
-api_metadata_handler = ApiMetadata(REGION, log)
+# API Metadata Handler, created on first use so that functions which don't need it have no control table calls at
+# cold start
+api_metadata_handler = None
+
+
+def _get_api_metadata_handler():
+    global api_metadata_handler
+
+    if api_metadata_handler is None:
+        api_metadata_handler = ApiMetadata(REGION, log)
+
+    return api_metadata_handler
 
 # create the streams integration handler, which is used by the lambda function embedded at the end of this app
 es_indexer = None
 
-# module level settings used as flags for lazy initialisers in functions
-search_flow_verified = False
-
 # load the cors config
 cors_config = None
 cors = None
@@ -242,10 +251,11 @@ def namespace_metadata(api_name):
         if request.query_params is not None and params.ATTRIBUTE_FILTER_PARAM in request.query_params:
             attr_filter = request.query_params.get(params.ATTRIBUTE_FILTER_PARAM).split(',')
 
-        return api_metadata_handler.get_api_metadata(api_name=api_name, stage=STAGE,
-                                                     attribute_filters=attr_filter)
+        return _get_api_metadata_handler().get_api_metadata(api_name=api_name, stage=STAGE,
+                                                            attribute_filters=attr_filter)
     else:
-        response = api_metadata_handler.update_metadata(api_name=api_name, stage=STAGE, updates=request.json_body)
+        response = _get_api_metadata_handler().update_metadata(api_name=api_name, stage=STAGE,
+                                                               updates=request.json_body)
 
         if response is not None:
             # remove the API from the cache, so that we will reinstantiate the reference on next call
@@ -260,7 +270,14 @@ def namespace_metadata(api_name):
 @app.route('/{api_name}/usage', methods=['GET'], authorizer=use_authorizer, cors=cors)
 @chalice_function
 def get_usage(api_name):
-    return api_cache.get(api_name).get_usage()
+    qp = app.current_request.query_params
+    usage_args = {}
+
+    # exact counts are only supported by some storage handlers
+    if qp is not None and params.QUERY_PARAM_EXACT in qp:
+        usage_args["exact"] = utils.strtobool(qp.get(params.QUERY_PARAM_EXACT))
+
+    return api_cache.get(api_name).get_usage(**usage_args)
 
 
 # method to get and create API level metadata - not per-item
@@ -313,11 +330,38 @@ def find_item(api_name):
     return api_cache.get(api_name).find(**app.current_request.json_body)
 
 
+# search arguments are supplied in the request body, and options such as Hydrate, or the ExclusiveStartKey of a
+# paginated search, may also be supplied as query params
+def _get_search_args():
+    search_args = dict(app.current_request.json_body if app.current_request.json_body is not None else {})
+    query_params = app.current_request.query_params if app.current_request.query_params is not None else {}
+    for p in [params.SEARCH_HYDRATE, params.SEARCH_MERGE, params.SEARCH_PAGINATE, params.SEARCH_KEEP_ALIVE,
+              params.EXCLUSIVE_START_KEY, params.EXPORT_S3_PATH]:
+        if p in query_params:
+            search_args[p] = query_params.get(p)
+
+    return search_args
+
+
 # method to perform an elasticsearch query
 @app.route('/{api_name}/search/{search_type}', methods=['PUT'], authorizer=use_authorizer, cors=cors)
 @chalice_function
 def api_search(api_name, search_type):
-    return api_cache.get(api_name).search(search_type, **app.current_request.json_body)
+    return api_cache.get(api_name).search(search_type, **_get_search_args())
+
+
+# method to export all the hits of an elasticsearch query to S3
+@app.route('/{api_name}/search/{search_type}/export', methods=['PUT'], authorizer=use_authorizer, cors=cors)
+@chalice_function
+def api_search_export(api_name, search_type):
+    return api_cache.get(api_name).search_export(search_type, **_get_search_args())
+
+
+# method to perform an elasticsearch query across both the Resource and Metadata
+@app.route('/{api_name}/search', methods=['PUT'], authorizer=use_authorizer, cors=cors)
+@chalice_function
+def api_search_all(api_name):
+    return api_cache.get(api_name).search(None, **_get_search_args())
 
 
 # method to get, delete, and check for an item with ID from the body/uri
@@ -374,6 +418,11 @@ def process_item_request(api_name, id):
         if qp is not None and params.SUPPRESS_ITEM_METADATA_FETCH in qp:
             suppress_meta_fetch = utils.strtobool(qp.get(params.SUPPRESS_ITEM_METADATA_FETCH))
 
+        # determine if the read must be served by the writer so that it reflects prior writes
+        consistent_read = False
+        if qp is not None and params.QUERY_PARAM_CONSISTENT in qp:
+            consistent_read = utils.strtobool(qp.get(params.QUERY_PARAM_CONSISTENT))
+
         # determine if an attribute whitelist has been included
         only_attributes = None
         if qp is not None and params.WHITELIST_ATTRIBUTES in qp:
@@ -385,11 +434,14 @@ def process_item_request(api_name, id):
             not_attributes = qp.get(params.BLACKLIST_ATTRIBUTES).split(',')
 
         return api.get(id=id, master_option=master, suppress_meta_fetch=suppress_meta_fetch,
-                       only_attributes=only_attributes, not_attributes=not_attributes)
+                       only_attributes=only_attributes, not_attributes=not_attributes,
+                       consistent_read=consistent_read)
     elif request.method == 'DELETE':
         return {params.DATA_MODIFIED: api.delete(id=id, **request.json_body)}
     elif request.method == 'HEAD':
-        return api.check(id=id)
+        qp = app.current_request.query_params
+        return api.check(id=id, consistent_read=qp is not None and utils.strtobool(
+            qp.get(params.QUERY_PARAM_CONSISTENT, False)))
     elif request.method == 'PUT':
         return api.update_item(id=id, **request.json_body)
 
@@ -407,7 +459,9 @@ def restore(api_name, id):
 @app.route('/{api_name}/{id}/meta', methods=['GET'], authorizer=use_authorizer, cors=cors)
 @chalice_function
 def metadata(api_name, id):
-    return api_cache.get(api_name).get_metadata(id=id)
+    qp = app.current_request.query_params
+    return api_cache.get(api_name).get_metadata(id=id, consistent_read=qp is not None and utils.strtobool(
+        qp.get(params.QUERY_PARAM_CONSISTENT, False)))
 
 
 # method to paginate a bunch of items
@@ -474,39 +528,110 @@ def export(api_name):
         return api_cache.get(api_name).export_to_s3(**request_params)
 
 
-# lambda function to act as an indexer for the update stream from this table
+# method to reindex search from the namespace tables, or to get the status of the last reindex
+@app.route('/{api_name}/reindex', methods=['GET', 'POST'], authorizer=use_authorizer, cors=cors)
+@chalice_function
+def reindex(api_name):
+    if app.current_request.method == 'GET':
+        return api_cache.get(api_name).get_reindex_status()
+    else:
+        request_params = app.current_request.json_body if app.current_request.json_body is not None else {}
+
+        return api_cache.get(api_name).reindex(**request_params)
+
+
+# lambda function to act as an indexer for the update streams of every namespace in the stage. Batches are routed by
+# their event source ARN, with the routing table loaded from the control table on a routing miss, and the reindex
+# target of each route refreshed periodically
 @app.lambda_function(params.INDEXER_NAME)
 def indexing_lambda(event, context):
     if 'Records' in event:
-        global search_flow_verified
         global es_indexer
 
-        if search_flow_verified is False:
-            # determine the source API information to ensure the search flow is configured
-            api_name = None
-            event_source_tokens = event.get("eventSourceARN").split(":")
-            if event_source_tokens[2] == "dynamodb":
-                table_spec_tokens = event_source_tokens[5].split("/")
-                table = table_spec_tokens[1]
+        if es_indexer is None:
+            es_indexer = StreamsIntegration(STAGE)
 
-            # create an API Metadata Handler
-            api_metadata_handler = ApiMetadata(REGION, log)
+        return es_indexer.forward(records=event['Records'])
 
-            api_metadata = api_metadata_handler.get_api_metadata(api_name, STAGE)
 
-            # verify that the delivery streams are in place
-            es_indexer.configure_search_flow(endpoints=api_metadata.get("SearchConfig").get("DeliveryStreams"),
-                                             es_domain_name=event.get(params.ES_DOMAIN),
-                                             firehose_delivery_role_arn=event.get(
-                                                 params.FIREHOSE_DELIVERY_ROLE_ARN),
-                                             failure_record_bucket=event.get(
-                                                 params.DELIVERY_STREAM_FAILURE_BUCKET),
-                                             kms_key_arn=event.get(params.KMS_KEY_ARN)
-                                             )
-            es_indexer = StreamsIntegration(STAGE, api_metadata.get("SearchConfig"))
-            search_flow_verified = True
+# consume the change feed of an RDBMS namespace, indexing batches of changes in process with the same indexer as the
+# update streams, as they are in the same form as DynamoDB stream events. Batches are only removed from the feed once
+# they have been indexed
+def _drain_change_feed(api_name: str, remaining_millis, batch_size: int = params.DEFAULT_CHANGE_FEED_BATCH_SIZE) -> int:
+    global es_indexer
 
-        output = es_indexer.forward_to_es_firehose(records=event['Records'])
+    if es_indexer is None:
+        es_indexer = StreamsIntegration(STAGE)
+
+    def _deliver(records):
+        # partially delivered batches are left in the feed, and will be redelivered in full
+        failures = es_indexer.forward(records=records).get('batchItemFailures')
+        if failures is not None and len(failures) > 0:
+            raise DetailedException(f"Unable to deliver {len(failures)} Changes for API {api_name}", detail=failures)
+
+    api = api_cache.get(api_name)
+    delivered = 0
+
+    # drain the feed while full batches are returned, leaving time for the last batch to be delivered
+    while remaining_millis() > 30000:
+        count = api.process_changes(processor=_deliver, batch_size=batch_size)
+        delivered += count
+
+        if count < batch_size:
+            break
+
+    log.info(f"Delivered {delivered} Changes for API {api_name}")
+    return delivered
+
+
+# lambda function which consumes the change feed of a single RDBMS namespace, when invoked with the API name
+@app.lambda_function(params.CHANGE_FEED_NAME)
+def change_feed_lambda(event, context):
+    delivered = _drain_change_feed(api_name=event.get(params.API_NAME_PARAM),
+                                   remaining_millis=context.get_remaining_time_in_millis,
+                                   batch_size=int(event.get("BatchSize", params.DEFAULT_CHANGE_FEED_BATCH_SIZE)))
+
+    return {"Delivered": delivered}
+
+
+# scheduled function which consumes the change feeds of every RDBMS namespace in the stage which has one. Concurrent
+# runs skip the changes which are locked by another, so overlapping schedules don't deliver a change twice
+@app.schedule(Rate(params.DEFAULT_CHANGE_FEED_SCHEDULE_MINUTES, unit=Rate.MINUTES),
+              name=params.CHANGE_FEED_SCHEDULER_NAME)
+def change_feed_schedule(event):
+    api_metadata_handler = ApiMetadata(REGION, log)
+
+    for api_name in dapi.get_registry(REGION, STAGE, log):
+        api_metadata = api_metadata_handler.get_api_metadata(api_name, STAGE,
+                                                             attribute_filters=[params.RDBMS_CHANGE_FEED])
+
+        if api_metadata is not None and utils.strtobool(api_metadata.get(params.RDBMS_CHANGE_FEED, False)) is True:
+            try:
+                _drain_change_feed(api_name=api_name, remaining_millis=event.context.get_remaining_time_in_millis)
+            except Exception as e:
+                # a namespace which can't be delivered doesn't hold up the others
+                log.error(f"Unable to consume Change Feed for API {api_name}: {e}")
+
+
+# lambda function which scans a segment of a namespace table into the new index of a reindex. Segments which don't
+# complete within the invocation are continued from their checkpoint by a new invocation
+@app.lambda_function(params.REINDEXER_NAME)
+def reindexing_lambda(event, context):
+    api_name = event.get(params.API_NAME_PARAM)
+    search_type = event.get(params.SEARCH_TYPE)
+    segment = int(event.get(params.QUERY_PARAM_SEGMENT))
+
+    complete = api_cache.get(api_name).reindex_segment(search_type=search_type, segment=segment,
+                                                       remaining_millis=context.get_remaining_time_in_millis)
+
+    if complete is not True:
+        boto3.client('lambda', region_name=REGION).invoke(FunctionName=context.function_name, InvocationType='Event',
+                                                          Payload=json.dumps(event))
+        log.info(f"Continuing Reindex of {api_name} {search_type} Segment {segment}")
+    else:
+        log.info(f"Completed Reindex of {api_name} {search_type} Segment {segment}")
+
+    return {"Complete": complete}
 
 
 @app.lambda_function(params.PROVISIONER_NAME)
@@ -572,6 +697,10 @@ def provisioning_lambda(event, context):
     # setup the search flow
     search_config = None
     if params.ES_DOMAIN in event:
+        global es_indexer
+        if es_indexer is None:
+            es_indexer = StreamsIntegration(STAGE)
+
         try:
             search_config = es_indexer.configure_search_flow(endpoints=api.get_endpoints(),
                                                              es_domain_name=event.get(params.ES_DOMAIN),
@@ -579,16 +708,35 @@ def provisioning_lambda(event, context):
                                                                  params.FIREHOSE_DELIVERY_ROLE_ARN),
                                                              failure_record_bucket=event.get(
                                                                  params.DELIVERY_STREAM_FAILURE_BUCKET),
-                                                             kms_key_arn=event.get(params.KMS_KEY_ARN)
+                                                             kms_key_arn=event.get(params.KMS_KEY_ARN),
+                                                             table_name=table_name,
+                                                             indexer_mode=event.get(
+                                                                 params.SEARCH_INDEXER_MODE,
+                                                                 params.DEFAULT_SEARCH_INDEXER_MODE),
+                                                             buffer_interval_seconds=event.get(
+                                                                 params.DELIVERY_BUFFER_INTERVAL,
+                                                                 DELIVERY_BUFFER_INTERVAL_SECONDS),
+                                                             buffer_size_mb=event.get(
+                                                                 params.DELIVERY_BUFFER_SIZE, DELIVERY_BUFFER_SIZE_MB),
+                                                             bulk_flush_size=event.get(
+                                                                 params.BULK_FLUSH_SIZE, BULK_FLUSH_SIZE),
+                                                             bulk_concurrency=event.get(
+                                                                 params.BULK_CONCURRENCY, BULK_CONCURRENCY),
+                                                             schemas={t: api_metadata_handler.get_schema(
+                                                                 api_name=api_name, stage=STAGE, schema_type=t) for t
+                                                                 in [params.RESOURCE, params.METADATA]},
+                                                             refresh_interval=event.get(
+                                                                 params.SEARCH_REFRESH_INTERVAL,
+                                                                 params.DEFAULT_SEARCH_REFRESH_INTERVAL)
                                                              )
         except KeyError:
             raise BadRequestError(
                 f"Unable to provision search configuration without {params.ES_DOMAIN}, {params.FIREHOSE_DELIVERY_ROLE_ARN}, and {params.DELIVERY_STREAM_FAILURE_BUCKET}")
 
-    # add the search config to metadata
+    # add the search config to metadata, where it is read by the api and by the indexer's routing table
     if search_config is not None:
         api_metadata_handler.update_metadata(api_name=api_name, stage=STAGE,
-                                             updates=search_config, caller_identity='System')
+                                             updates={params.SEARCH_CONFIG: search_config}, caller_identity='System')
 
     # destroy the cache reference to cause a reload on next invoke
     if api_cache.contains(api_name):
@@ -600,6 +748,15 @@ def provisioning_lambda(event, context):
                                          updates={"Status": params.STATUS_ACTIVE}, caller_identity='System')
     log.info(f"Provisioning complete. API {api_name} online in Stage {STAGE}")
 
+    # bring tables created by earlier versions up to date, and then build indexes once the namespace is online, as
+    # concurrent builds on existing tables may take some time
+    migrated = api.migrate_boolean_columns()
+    if migrated is not None and len(migrated) > 0:
+        log.info(f"Converted Boolean Columns {migrated} for API {api_name} in Stage {STAGE}")
+
+    api.build_indexes()
+    log.info(f"Index build complete for API {api_name} in Stage {STAGE}")
+
 
 @app.lambda_function(params.UNDERSTANDER_NAME)
 def understander_lambda(event, context):
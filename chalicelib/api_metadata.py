@@ -69,6 +69,10 @@ class ApiMetadata:
         self._dynamo_helper.control_table_delete(control_hash=table_name,
                                                  control_sort=params.CONTROL_TYPE_META)
 
+        # delete the status of any search reindex
+        self._dynamo_helper.control_table_delete(control_hash=table_name,
+                                                 control_sort=params.CONTROL_TYPE_REINDEX)
+
     # public method to return a data API's json schema
     def get_schema(self, api_name, stage, schema_type):
         if api_name is None or stage is None:
@@ -5,16 +5,32 @@ from chalicelib.utils import identity_trace
 import logging
 from chalicelib.api_metadata import ApiMetadata
 from chalicelib.gremlin_handler import GremlinHandler
+from chalicelib.streams_integration import StreamsIntegration
 import sys
 import os
 import urllib.parse as parser
 import json
+import base64
+import uuid
 import boto3
 from elasticsearch import Elasticsearch
+from elasticsearch.exceptions import TransportError
 from aws_xray_sdk.core import patch
 
 __version__ = "0.9.0b1"
 
+# search pagination token fields
+TOKEN_SEARCH_TYPE = 't'
+TOKEN_PIT = 'pit'
+TOKEN_SEARCH_AFTER = 'after'
+TOKEN_SCROLL = 'scroll'
+TOKEN_FROM = 'from'
+TOKEN_SIZE = 'size'
+
+# search exports are read in pages of this many hits, and written to S3 in parts of at least this size
+SEARCH_EXPORT_PAGE_SIZE = 1000
+SEARCH_EXPORT_PART_BYTES = 8 * 1024 * 1024
+
 # patch boto3 with xray instrumentation if the environment is configured
 if utils.strtobool(os.getenv(params.XRAY_ENABLED, 'false')) is True:
     patch(['boto3'])
@@ -38,6 +54,7 @@ def get_api_status(api_name: str, stage: str, region: str, logger: logging.Logge
     :param region: The AWS Region in which the Stage is provisioned
     :return: dict:
         Status: The Status of the API Namespace in the stage
+        IndexStatus: The Status of each requested index by table and attribute, where indexes are built asynchronously
     """
     global log
     if logger is None:
@@ -47,7 +64,14 @@ def get_api_status(api_name: str, stage: str, region: str, logger: logging.Logge
 
     api_metadata_handler = ApiMetadata(region, log)
     s = "Status"
-    return {s: api_metadata_handler.get_api_metadata(api_name=api_name, stage=stage).get(s)}
+    api_metadata = api_metadata_handler.get_api_metadata(api_name=api_name, stage=stage)
+    status = {s: api_metadata.get(s)}
+
+    # index builds run after the namespace is online, so their progress is reported separately
+    if params.INDEX_STATUS in api_metadata:
+        status[params.INDEX_STATUS] = api_metadata.get(params.INDEX_STATUS)
+
+    return status
 
 
 # non-class method to get all registered api endpoints
@@ -147,6 +171,9 @@ class AwsDataAPI:
     _gremlin_address = None
     _gremlin_endpoint = None
     _es_client = None
+    _es_indexer = None
+    _pit_supported = None
+    _s3_client = None
     _search_config = None
     _storage_handler = None
     _catalog_database = None
@@ -298,6 +325,29 @@ class AwsDataAPI:
         storage_class = getattr(storage_module, "DataAPIStorageHandler")
         return storage_class(**kwargs)
 
+    # convert the boolean attributes of tables created by earlier versions to the storage handler's native type. This
+    # rewrites the tables, and so is run by the provisioning function before indexes are built
+    def migrate_boolean_columns(self):
+        return self._storage_handler.migrate_boolean_columns()
+
+    # build any missing indexes for the namespace, recording their status in the API metadata as they are built
+    def build_indexes(self):
+        status = self._storage_handler.get_index_status()
+
+        if status is not None and len(status) > 0:
+            pending = {t: {c: params.STATUS_CREATING if s != params.STATUS_ACTIVE else s for c, s in cols.items()} for
+                       t, cols in status.items()}
+            self._api_metadata_handler.update_metadata(api_name=self._api_name, stage=self._deployment_stage,
+                                                       updates={params.INDEX_STATUS: pending},
+                                                       caller_identity='System')
+
+            status = self._storage_handler.build_indexes()
+            self._api_metadata_handler.update_metadata(api_name=self._api_name, stage=self._deployment_stage,
+                                                       updates={params.INDEX_STATUS: status},
+                                                       caller_identity='System')
+
+        return status
+
     # simple accessor method for the pk_name attribute, which is required in some cases for API integration
     def get_primary_key(self):
         return self._pk_name
@@ -305,8 +355,8 @@ class AwsDataAPI:
     # access method that returns a boolean outcome based upon if the provided ID is valid
     # @evented(api_operation="Check")
     @identity_trace
-    def check(self, id):
-        return self._storage_handler.check(id=id)
+    def check(self, id, consistent_read: bool = False):
+        return self._storage_handler.check(id=id, consistent_read=consistent_read)
 
     # return a paginated list of elements from the API
     # @evented(api_operation="List")
@@ -317,9 +367,9 @@ class AwsDataAPI:
     # return information about storage usage for this API namespace
     # @evented(api_operation="Usage")
     @identity_trace
-    def get_usage(self):
-        resources = self._storage_handler.get_usage(table_name=self._table_name)
-        metadata = self._storage_handler.get_usage(table_name=utils.get_metaname(self._table_name))
+    def get_usage(self, **kwargs):
+        resources = self._storage_handler.get_usage(table_name=self._table_name, **kwargs)
+        metadata = self._storage_handler.get_usage(table_name=utils.get_metaname(self._table_name), **kwargs)
 
         references = None
         # TODO figure out why the gremlin connection is failing
@@ -424,11 +474,12 @@ class AwsDataAPI:
     # @evented(api_operation="GetResource")
     @identity_trace
     def get(self, id, master_option, suppress_meta_fetch: bool = False, only_attributes: list = None,
-            not_attributes: list = None):
+            not_attributes: list = None, consistent_read: bool = False):
         fetch_id = self._validate_arn_id(id)
         response = {}
         item = self._storage_handler.get(id=fetch_id, suppress_meta_fetch=suppress_meta_fetch,
-                                         only_attributes=only_attributes, not_attributes=not_attributes)
+                                         only_attributes=only_attributes, not_attributes=not_attributes,
+                                         consistent_read=consistent_read)
 
         # set the 'Item' in the response unless master_option = prefer
         if params.ITEM_MASTER_ID not in item[params.RESOURCE] or \
@@ -441,7 +492,8 @@ class AwsDataAPI:
         if params.ITEM_MASTER_ID in item[params.RESOURCE] and master_option is not None and master_option.lower() in [
             params.ITEM_MASTER_INCLUDE.lower(),
             params.ITEM_MASTER_PREFER.lower()]:
-            master = self._storage_handler.get(id=item[params.RESOURCE][params.ITEM_MASTER_ID])
+            master = self._storage_handler.get(id=item[params.RESOURCE][params.ITEM_MASTER_ID],
+                                               consistent_read=consistent_read)
             response["Master"] = master
 
         return response
@@ -452,15 +504,16 @@ class AwsDataAPI:
     def restore(self, id):
         fetch_id = self._validate_arn_id(id)
 
-        return self._storage_handler.restore(id=fetch_id, caller_identity=self._simple_identity)
+        with self._storage_handler.transaction():
+            return self._storage_handler.restore(id=fetch_id, caller_identity=self._simple_identity)
 
     # get the Metadata for a Resource
     # @evented(api_operation="GetMetadata")
     @identity_trace
-    def get_metadata(self, id):
+    def get_metadata(self, id, consistent_read: bool = False):
         fetch_id = self._validate_arn_id(id)
 
-        return self._storage_handler.get_metadata(id=fetch_id)
+        return self._storage_handler.get_metadata(id=fetch_id, consistent_read=consistent_read)
 
     # Delete a Resource and Metadata based upon the specified deletion mode of the system or in the request
     # @evented(api_operation="Delete")
@@ -468,7 +521,8 @@ class AwsDataAPI:
     def delete(self, id, **kwargs):
         fetch_id = self._validate_arn_id(id)
 
-        return self._storage_handler.delete(id=fetch_id, caller_identity=self._simple_identity, **kwargs)
+        with self._storage_handler.transaction():
+            return self._storage_handler.delete(id=fetch_id, caller_identity=self._simple_identity, **kwargs)
 
     # Update a Data API Resource
     # @evented(api_operation="Update")
@@ -490,9 +544,10 @@ class AwsDataAPI:
             log.debug("Creating Reference Links")
             _wrap_response(params.REFERENCES, self._put_references(id, kwargs.get(params.REFERENCES)))
 
-        # update the item, which may update metadata and resources
-        item_response = self._storage_handler.update_item(caller_identity=self._simple_identity, id=fetch_id,
-                                                          **kwargs)
+        # update the item, which may update metadata and resources, which are committed together
+        with self._storage_handler.transaction():
+            item_response = self._storage_handler.update_item(caller_identity=self._simple_identity, id=fetch_id,
+                                                              **kwargs)
         _wrap_response(params.METADATA, item_response.get(params.METADATA))
         _wrap_response(params.RESOURCE, item_response.get(params.RESOURCE))
 
@@ -526,30 +581,423 @@ class AwsDataAPI:
 
         return self._es_client
 
-    # Perform a search request against the configured ES endpoint
+    @staticmethod
+    def _get_hit_id(hit: dict, search_type: str) -> str:
+        # the item id of a search hit, which is indexed as document_id, and is the metadata id in the Metadata index
+        doc_id = str(hit.get("_source", {}).get("document_id", hit.get("_id")))
+
+        return utils.get_id_from_metaid(doc_id) if search_type == params.METADATA else doc_id
+
+    @staticmethod
+    def _merge_search_results(responses: dict) -> dict:
+        '''Merge Resource and Metadata search responses into a single ranked response, joined on the item id. Each
+        hit carries the Resource and Metadata hits which matched, and is scored by the sum of their scores, so that
+        items which match in both rank first. Items can match in both indexes, so unless every hit of both was returned,
+        the merged total is only known to be at least the larger of their totals
+        '''
+        merged = {}
+        totals = []
+
+        for search_type in [params.RESOURCE, params.METADATA]:
+            if search_type in responses:
+                total = responses.get(search_type).get("hits", {}).get("total", {})
+                total = total if isinstance(total, dict) else {"value": total, "relation": "eq"}
+                totals.append(dict(total, returned=len(responses.get(search_type).get("hits", {}).get("hits", []))))
+
+            for hit in responses.get(search_type, {}).get("hits", {}).get("hits", []):
+                doc_id = AwsDataAPI._get_hit_id(hit, search_type)
+
+                if doc_id not in merged:
+                    merged[doc_id] = {"_id": doc_id, "_score": 0, params.RESOURCE: None, params.METADATA: None}
+
+                merged[doc_id]["_score"] += hit.get("_score") if hit.get("_score") is not None else 0
+                merged[doc_id][search_type] = hit
+
+        # python's sort is stable, so equally scored items keep resource ranking before metadata ranking
+        hits = sorted(merged.values(), key=lambda h: h.get("_score"), reverse=True)
+
+        if all([t.get("relation") == "eq" and t.get("value") == t.get("returned") for t in totals]):
+            total = {"value": len(hits), "relation": "eq"}
+        elif len(totals) == 1:
+            total = {"value": totals[0].get("value"), "relation": totals[0].get("relation")}
+        else:
+            total = {"value": max([t.get("value", 0) for t in totals] + [len(hits)]), "relation": "gte"}
+
+        return {
+            "took": max([r.get("took", 0) for r in responses.values()]),
+            "hits": {
+                "total": total,
+                "max_score": hits[0].get("_score") if len(hits) > 0 else None,
+                "hits": hits
+            }
+        }
+
+    def _hydrate_search_results(self, response: dict, search_type: str = None) -> dict:
+        '''Replace the hits of a search response with the current Items from storage, fetched with a single batched
+        read and in ranking order. Hits for Items which are no longer found, or are deleted, are dropped
+        '''
+        hits = response.get("hits", {}).get("hits", [])
+        ids = [str(h.get("_id")) if search_type is None else self._get_hit_id(h, search_type) for h in hits]
+
+        fetched = self._storage_handler.batch_get(ids=ids).get(params.ITEMS)
+        items = {str(i.get(params.RESOURCE).get(self._pk_name)): i for i in fetched}
+
+        hydrated = []
+        for doc_id, hit in zip(ids, hits):
+            if doc_id in items:
+                h = {k: v for k, v in hit.items() if k not in ["_source", params.RESOURCE, params.METADATA]}
+                h["_id"] = doc_id
+                h[params.ITEM] = items.get(doc_id)
+                hydrated.append(h)
+
+        output = response.copy()
+        output["hits"] = dict(response.get("hits"), hits=hydrated)
+
+        return output
+
+    # Fetch many Items by ID in a single batched read, in the order requested. Items which are not found or are deleted
+    # are returned as NotFound
+    # @evented(api_operation="BatchGet")
+    @identity_trace
+    def batch_get(self, ids: list, suppress_meta_fetch: bool = False, consistent_read: bool = False):
+        return self._storage_handler.batch_get(ids=ids, suppress_meta_fetch=suppress_meta_fetch,
+                                               consistent_read=consistent_read)
+
+    @staticmethod
+    def _encode_search_token(cursor: dict) -> str:
+        return base64.urlsafe_b64encode(json.dumps(cursor).encode("utf-8")).decode("utf-8")
+
+    @staticmethod
+    def _decode_search_token(token: str, search_type: str) -> dict:
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(str(token).encode("utf-8")))
+        except ValueError:
+            raise InvalidArgumentsException("Invalid Search Pagination Token")
+
+        if not isinstance(cursor, dict) or cursor.get(TOKEN_SEARCH_TYPE) != search_type:
+            raise InvalidArgumentsException(f"Search Pagination Token is not valid for {search_type} Search")
+
+        return cursor
+
+    def _open_point_in_time(self, index_name: str, keep_alive: str):
+        '''Open a point in time against an index, or return None if the cluster does not support them, in which case
+        searches are paged with a scroll
+        '''
+        if self._pit_supported is not False:
+            try:
+                response = self._get_es_client().transport.perform_request("POST", f"/{index_name}/_pit",
+                                                                           params={"keep_alive": keep_alive})
+                self._pit_supported = True
+
+                return response.get("id")
+            except TransportError as e:
+                if self._pit_supported is True or e.status_code not in [400, 404, 405]:
+                    raise DetailedException("Unable to open Search Point in Time", detail=str(e))
+
+                self._pit_supported = False
+
+        return None
+
+    def _close_search_cursor(self, cursor: dict):
+        # release the search context of an exhausted cursor, which would otherwise be held until its keep alive expires
+        try:
+            if cursor.get(TOKEN_PIT) is not None:
+                self._get_es_client().transport.perform_request("DELETE", "/_pit", body={"id": cursor.get(TOKEN_PIT)})
+            elif cursor.get(TOKEN_SCROLL) is not None:
+                self._get_es_client().clear_scroll(scroll_id=cursor.get(TOKEN_SCROLL))
+        except TransportError as e:
+            self._logger.warning(f"Unable to release Search context: {e}")
+
+    def _search_page(self, search_type: str, query: dict, start_token: str = None,
+                     keep_alive: str = params.DEFAULT_SEARCH_KEEP_ALIVE) -> dict:
+        '''Fetch a page of search hits, continuing from the page described by the start token. ElasticSearch is paged
+        with search_after against a point in time, or with a scroll where points in time are not supported, and the
+        RDBMS search is paged by offset. The response carries a LastEvaluatedKey token for the next page, which is
+        None when there are no further hits
+        '''
+        body = dict(query if query is not None else {})
+        cursor = self._decode_search_token(start_token, search_type) if start_token is not None else {
+            TOKEN_SEARCH_TYPE: search_type}
+
+        try:
+            size = int(cursor.get(TOKEN_SIZE, body.get("size", 10)))
+        except (TypeError, ValueError):
+            raise InvalidArgumentsException("Search size must be an Integer")
+
+        if self._full_config.get(params.STORAGE_HANDLER) == params.RDBMS_STORAGE_HANDLER:
+            offset = int(cursor.get(TOKEN_FROM, body.get("from", 0)))
+            body["from"] = offset
+            response = self._storage_handler.search(search_type=search_type, body=body)
+            cursor[TOKEN_FROM] = offset + size
+        elif self._search_config is None:
+            raise UnimplementedFeatureException("No ElasticSearch Endpoint Configured")
+        else:
+            # pages are positioned by the cursor, so offsets are not used
+            body.pop("from", None)
+            es = self._get_es_client()
+            index_name = utils.get_es_index_name(self._table_name, search_type)
+
+            if cursor.get(TOKEN_SCROLL) is not None:
+                response = es.scroll(scroll_id=cursor.get(TOKEN_SCROLL), scroll=keep_alive)
+            else:
+                pit_id = cursor.get(TOKEN_PIT) if start_token is not None else self._open_point_in_time(index_name,
+                                                                                                        keep_alive)
+                if pit_id is None:
+                    response = es.search(index=index_name, body=body, scroll=keep_alive)
+                else:
+                    # a point in time search is not addressed to an index, and hits are sorted by score unless the
+                    # query sorts them, with the shard document as an implicit tiebreaker
+                    body["pit"] = {"id": pit_id, "keep_alive": keep_alive}
+                    body["sort"] = body.get("sort", [{"_score": "desc"}])
+                    if cursor.get(TOKEN_SEARCH_AFTER) is not None:
+                        body["search_after"] = cursor.get(TOKEN_SEARCH_AFTER)
+
+                    response = es.search(body=body)
+
+            # search contexts are renewed by each request, and are carried in the token rather than the response
+            scroll_id = response.pop("_scroll_id", None)
+            pit_id = response.pop("pit_id", None)
+            hits = response.get("hits", {}).get("hits", [])
+
+            if scroll_id is not None:
+                cursor[TOKEN_SCROLL] = scroll_id
+                cursor[TOKEN_SIZE] = size
+            elif pit_id is not None:
+                cursor[TOKEN_PIT] = pit_id
+                cursor[TOKEN_SEARCH_AFTER] = hits[-1].get("sort") if len(hits) > 0 else None
+
+        if size > 0 and len(response.get("hits", {}).get("hits", [])) == size:
+            response[params.LAST_EVALUATED_KEY] = self._encode_search_token(cursor)
+        else:
+            self._close_search_cursor(cursor)
+            response[params.LAST_EVALUATED_KEY] = None
+
+        return response
+
+    def _get_s3_client(self):
+        if self._s3_client is None:
+            self._s3_client = boto3.client("s3", region_name=self._region)
+
+        return self._s3_client
+
+    # Export all the hits of a search to S3 as newline delimited JSON, streaming pages of hits into a multipart upload
+    # so that result sets of any size can be exported. With Hydrate=true, the current Items are exported
+    # @evented(api_operation="SearchExport")
+    @identity_trace
+    def search_export(self, search_type, **kwargs):
+        export_path = kwargs.get(params.EXPORT_S3_PATH)
+        if export_path is None:
+            raise InvalidArgumentsException("Cannot export without S3 Export Path")
+
+        location = parser.urlparse(export_path)
+        if location.scheme != "s3" or location.netloc == "":
+            raise InvalidArgumentsException("S3 Export Path must be an s3://bucket/prefix URI")
+
+        prefix = location.path.strip("/")
+        key = f"{prefix + '/' if prefix != '' else ''}{self._api_name}-{search_type}-{uuid.uuid4()}.json"
+        hydrate = utils.strtobool(kwargs.get(params.SEARCH_HYDRATE, False))
+        keep_alive = kwargs.get(params.SEARCH_KEEP_ALIVE, params.DEFAULT_SEARCH_KEEP_ALIVE)
+
+        query = dict(kwargs.get("query") if kwargs.get("query") is not None else {})
+        query["size"] = query.get("size", SEARCH_EXPORT_PAGE_SIZE)
+        if hydrate is True:
+            query["_source"] = ["document_id"]
+
+        s3 = self._get_s3_client()
+        upload_id = None
+        parts = []
+        buffer = bytearray()
+        count = 0
+
+        def _flush():
+            part = s3.upload_part(Bucket=location.netloc, Key=key, UploadId=upload_id, PartNumber=len(parts) + 1,
+                                  Body=bytes(buffer))
+            parts.append({"ETag": part.get("ETag"), "PartNumber": len(parts) + 1})
+            buffer.clear()
+
+        try:
+            token = None
+            while True:
+                page = self._search_page(search_type, query, start_token=token, keep_alive=keep_alive)
+                if hydrate is True:
+                    page = self._hydrate_search_results(page, search_type)
+
+                for hit in page.get("hits", {}).get("hits", []):
+                    document = hit.get(params.ITEM) if hydrate is True else hit.get("_source")
+                    buffer.extend(json.dumps(document, cls=utils.DataApiEncoder).encode("utf-8"))
+                    buffer.extend(b"\n")
+                    count += 1
+
+                if len(buffer) >= SEARCH_EXPORT_PART_BYTES:
+                    if upload_id is None:
+                        upload_id = s3.create_multipart_upload(Bucket=location.netloc, Key=key).get("UploadId")
+                    _flush()
+
+                token = page.get(params.LAST_EVALUATED_KEY)
+                if token is None:
+                    break
+
+            if upload_id is None:
+                s3.put_object(Bucket=location.netloc, Key=key, Body=bytes(buffer))
+            else:
+                if len(buffer) > 0:
+                    _flush()
+                s3.complete_multipart_upload(Bucket=location.netloc, Key=key, UploadId=upload_id,
+                                             MultipartUpload={"Parts": parts})
+        except Exception:
+            if upload_id is not None:
+                s3.abort_multipart_upload(Bucket=location.netloc, Key=key, UploadId=upload_id)
+            raise
+
+        return {params.EXPORT_S3_PATH: f"s3://{location.netloc}/{key}", "Count": count}
+
+    def _get_es_indexer(self):
+        if self._es_indexer is None:
+            self._es_indexer = StreamsIntegration(self._deployment_stage)
+
+        return self._es_indexer
+
+    # Reindex the namespace's search indexes from its DynamoDB tables, into new versioned indexes which the search
+    # aliases are flipped to once complete. Resume=true restarts the incomplete segments of a running reindex from their
+    # checkpoints
+    # @evented(api_operation="Reindex")
+    @identity_trace
+    def reindex(self, **kwargs):
+        if self._full_config.get(params.STORAGE_HANDLER) == params.RDBMS_STORAGE_HANDLER:
+            raise UnimplementedFeatureException("Reindex is only supported for DynamoDB Namespaces")
+        elif self._search_config is None:
+            raise UnimplementedFeatureException("No ElasticSearch Endpoint Configured")
+
+        try:
+            concurrency = int(kwargs.get(params.REINDEX_CONCURRENCY, params.DEFAULT_REINDEX_CONCURRENCY))
+            read_capacity = kwargs.get(params.REINDEX_READ_CAPACITY)
+            read_capacity = int(read_capacity) if read_capacity is not None else None
+        except (TypeError, ValueError):
+            raise InvalidArgumentsException(
+                f"{params.REINDEX_CONCURRENCY} and {params.REINDEX_READ_CAPACITY} must be Integers")
+
+        if concurrency < 1 or (read_capacity is not None and read_capacity < 1):
+            raise InvalidArgumentsException(
+                f"{params.REINDEX_CONCURRENCY} and {params.REINDEX_READ_CAPACITY} must be greater than 0")
+
+        indexer = self._get_es_indexer()
+        job = indexer.get_reindex_job(self._table_name)
+
+        if job is not None and job.get("Status") == params.STATUS_CREATING:
+            if utils.strtobool(kwargs.get(params.REINDEX_RESUME, False)) is not True:
+                raise InvalidArgumentsException(f"Reindex {job.get('Version')} is running. Set "
+                                                f"{params.REINDEX_RESUME}=true to resume it from its checkpoints")
+        else:
+            schemas = {t: self.get_schema(schema_type=t) for t in [params.RESOURCE, params.METADATA]}
+            job = indexer.start_reindex(self._table_name, self._search_config, total_segments=concurrency,
+                                        read_capacity=read_capacity, schemas=schemas)
+
+        if self._lambda_client is None:
+            self._lambda_client = boto3.client("lambda", region_name=self._region)
+
+        # each incomplete segment is scanned by its own async invocation of the reindexer
+        f = f"{params.AWS_DATA_API_NAME}-{self._deployment_stage}-{params.REINDEXER_NAME}"
+        for segment_key, checkpoint in job.get("Segments").items():
+            if checkpoint.get("Status") != params.STATUS_ACTIVE:
+                search_type, segment = segment_key.split("-")
+                args = {
+                    params.API_NAME_PARAM: self._api_name,
+                    params.SEARCH_TYPE: search_type,
+                    params.QUERY_PARAM_SEGMENT: int(segment)
+                }
+                response = self._lambda_client.invoke(FunctionName=f, InvocationType='Event', Payload=json.dumps(args))
+
+                if "FunctionError" in response:
+                    raise DetailedException(f"Unable to start Reindex of {segment_key}",
+                                            detail=response.get("Payload"))
+
+        return self.get_reindex_status()
+
+    # Return the status of the last reindex of the namespace, with the progress of each scan segment
+    # @evented(api_operation="GetReindexStatus")
+    @identity_trace
+    def get_reindex_status(self):
+        job = self._get_es_indexer().get_reindex_job(self._table_name)
+
+        if job is None:
+            raise ResourceNotFoundException(f"No Reindex found for {self._api_name}")
+
+        return {k: job.get(k) for k in ["Version", "Status", "StartTime", "EndTime", "Indexes", "TotalSegments",
+                                        "ReadCapacity", "Remaining", "Segments"] if k in job}
+
+    # Scan a segment of the namespace's table into the new index of the running reindex, until it is complete or the
+    # remaining time of the invocation runs low. Returns True when the segment is complete
+    def reindex_segment(self, search_type: str, segment: int, remaining_millis=None) -> bool:
+        indexer = self._get_es_indexer()
+        job = indexer.get_reindex_job(self._table_name)
+
+        if job is None or job.get("Status") != params.STATUS_CREATING:
+            self._logger.info(f"No Reindex running for {self._api_name}")
+            return True
+
+        return indexer.reindex_segment(job, self._table_name, search_type, segment,
+                                       schema=self.get_schema(schema_type=search_type),
+                                       remaining_millis=remaining_millis)
+
+    # Perform a search request against the configured ES endpoint, or against the RDBMS full text search. Searches
+    # without a search type run against both Resource and Metadata, and with Merge=true return a single ranked and
+    # id joined result set. With Hydrate=true, ES returns only document ids, and hits carry the current Item from storage.
+    # With Paginate=true, or an ExclusiveStartKey, a page of hits is returned with a LastEvaluatedKey for the next page
     # @evented(api_operation="Search")
     @identity_trace
     def search(self, search_type, **kwargs):
-        if self._es_client is None:
+        response = {}
+        search_types = [search_type] if search_type is not None else [params.RESOURCE, params.METADATA]
+
+        start_token = kwargs.get(params.EXCLUSIVE_START_KEY)
+        paginate = start_token is not None or utils.strtobool(kwargs.get(params.SEARCH_PAGINATE, False)) is True
+        if paginate is True and search_type is None:
+            raise InvalidArgumentsException("Paginated Search requires a Search Type")
+
+        hydrate = utils.strtobool(kwargs.get(params.SEARCH_HYDRATE, False))
+        if hydrate is True:
+            # items are read from storage, so only the document id is needed from the index
+            kwargs["query"] = dict(kwargs.get("query") if kwargs.get("query") is not None else {},
+                                   _source=["document_id"])
+
+        if paginate is True:
+            response[search_type] = self._search_page(search_type, kwargs.get("query"), start_token=start_token,
+                                                      keep_alive=kwargs.get(params.SEARCH_KEEP_ALIVE,
+                                                                            params.DEFAULT_SEARCH_KEEP_ALIVE))
+        elif self._full_config.get(params.STORAGE_HANDLER) == params.RDBMS_STORAGE_HANDLER:
+            # rdbms namespaces are searched in the database, with responses structured as from ElasticSearch
+            for t in search_types:
+                response[t] = self._storage_handler.search(search_type=t, body=kwargs.get("query"))
+        elif self._search_config is None:
             raise UnimplementedFeatureException("No ElasticSearch Endpoint Configured")
+        elif search_type is not None:
+            index_name = utils.get_es_index_name(self._table_name, search_type)
+            doc = utils.get_es_type_name(self._table_name, search_type),
+
+            response[search_type] = self._get_es_client().search(index=index_name, doc_type=doc,
+                                                                 body=kwargs.get("query"))
         else:
-            response = {}
+            # search across both Resource and Metadata indexes in a single round trip
+            searches = []
+            for t in search_types:
+                searches.append({"index": utils.get_es_index_name(self._table_name, t)})
+                searches.append(kwargs.get("query") if kwargs.get("query") is not None else {})
 
-            def _add_results(result_type):
-                index_name = utils.get_es_index_name(self._table_name, result_type)
-                doc = utils.get_es_type_name(self._table_name, result_type),
+            responses = self._get_es_client().msearch(body=searches).get("responses")
 
-                response[result_type] = self._get_es_client().search(index=index_name, doc_type=doc,
-                                                                     body=kwargs.get("query"))
+            for t, r in zip(search_types, responses):
+                if "error" in r:
+                    raise DetailedException(f"Unable to perform {t} Search", detail=r.get("error"))
+                else:
+                    response[t] = r
 
-            if search_type is not None:
-                # perform a search just for the specified type of data
-                _add_results(search_type)
-            else:
-                # perform a search across both Resource and Metadata indexes
-                _add_results(params.RESOURCE)
-                _add_results(params.METADATA)
+        if search_type is None and utils.strtobool(kwargs.get(params.SEARCH_MERGE, False)) is True:
+            merged = self._merge_search_results(response)
 
+            return self._hydrate_search_results(merged) if hydrate is True else merged
+        elif hydrate is True:
+            return {t: self._hydrate_search_results(r, t) for t, r in response.items()}
+        else:
             return response
 
     # Return the API's underlying storage implementations, including tables in use, Dynamo Streams that can be processed
@@ -567,6 +1015,10 @@ class AwsDataAPI:
 
         return endpoints
 
+    # Forward a batch of changes from the namespace change feed to a processor of stream records
+    def process_changes(self, processor, batch_size: int = params.DEFAULT_CHANGE_FEED_BATCH_SIZE):
+        return self._storage_handler.process_changes(processor=processor, batch_size=batch_size)
+
     # Return the JSON schema for an API Namespace
     # @evented(api_operation="GetSchema")
     @identity_trace
@@ -578,10 +1030,19 @@ class AwsDataAPI:
     # @evented(api_operation="PutSchema")
     @identity_trace
     def put_schema(self, schema_type, schema):
-        return self._api_metadata_handler.put_schema(api_name=self._api_name, stage=self._deployment_stage,
-                                                     schema_type=schema_type,
-                                                     caller_identity=self._simple_identity, schema=schema).get(
+        modified = self._api_metadata_handler.put_schema(api_name=self._api_name, stage=self._deployment_stage,
+                                                         schema_type=schema_type,
+                                                         caller_identity=self._simple_identity, schema=schema).get(
             params.DATA_MODIFIED)
+        self._update_search_mappings(schema_type, schema)
+
+        return modified
+
+    # regenerate the search index template of a schema type when its schema changes, and apply it to the current index
+    def _update_search_mappings(self, schema_type, schema):
+        if self._search_config is not None:
+            search_type = params.RESOURCE if schema_type.lower() == params.RESOURCE.lower() else params.METADATA
+            self._get_es_indexer().apply_index_template(self._table_name, self._search_config, search_type, schema)
 
     # Remove the JSON Schema from the Namespace for Resources or Metadata
     # @evented(api_operation="DeleteSchema")
@@ -595,15 +1056,19 @@ class AwsDataAPI:
             raise InvalidArgumentsException(
                 f"Schema Type {schema_type} invalid. Use {params.CONTROL_TYPE_METADATA_SCHEMA} or {params.CONTROL_TYPE_RESOURCE_SCHEMA}")
 
-        return self._api_metadata_handler.delete_metadata(api_name=self._api_name, stage=self._deployment_stage,
-                                                          metadata_type=set_schema_type,
-                                                          caller_identity=self._simple_identity)
+        deleted = self._api_metadata_handler.delete_metadata(api_name=self._api_name, stage=self._deployment_stage,
+                                                             metadata_type=set_schema_type,
+                                                             caller_identity=self._simple_identity)
+        self._update_search_mappings(schema_type, None)
+
+        return deleted
 
     # Setup the Item Master for a given Resource
     # @evented(api_operation="SetItemMaster")
     @identity_trace
     def item_master_update(self, **kwargs):
-        return self._storage_handler.item_master_update(caller_identity=self._simple_identity, **kwargs)
+        with self._storage_handler.transaction():
+            return self._storage_handler.item_master_update(caller_identity=self._simple_identity, **kwargs)
 
     # Remote the specified Item Master for a given Resource
     # @evented(api_operation="RemoveItemMaster")
@@ -614,19 +1079,22 @@ class AwsDataAPI:
         if item_id is None:
             raise ResourceNotFoundException
         else:
-            # validate that this item actually has the correct item master set
-            current = self._storage_handler.get(id=item_id)
-            assert_item_master = kwargs.get(params.ITEM_MASTER_ID)
-            current_master = current.get(params.RESOURCE).get(params.ITEM_MASTER_ID, None)
-            if current_master is None:
-                return True
-            elif current_master != assert_item_master:
-                raise InvalidArgumentsException("Item Master {assert_item_master} does not match actual Item Master")
-            else:
-                # TODO migrate this to use item_master_update with None target ID
-                return self._storage_handler.remove_resource_attributes(id=item_id,
-                                                                        resource_attributes=[params.ITEM_MASTER_ID],
-                                                                        caller_identity=self._simple_identity)
+            # the item master is validated and removed in one transaction
+            with self._storage_handler.transaction():
+                # validate that this item actually has the correct item master set
+                current = self._storage_handler.get(id=item_id, consistent_read=True)
+                assert_item_master = kwargs.get(params.ITEM_MASTER_ID)
+                current_master = current.get(params.RESOURCE).get(params.ITEM_MASTER_ID, None)
+                if current_master is None:
+                    return True
+                elif current_master != assert_item_master:
+                    raise InvalidArgumentsException(
+                        "Item Master {assert_item_master} does not match actual Item Master")
+                else:
+                    # TODO migrate this to use item_master_update with None target ID
+                    return self._storage_handler.remove_resource_attributes(id=item_id,
+                                                                            resource_attributes=[params.ITEM_MASTER_ID],
+                                                                            caller_identity=self._simple_identity)
 
     # Extract the Metadata for the API itself
     # @evented(api_operation="GetApiMetadata")
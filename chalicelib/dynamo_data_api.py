@@ -6,6 +6,7 @@ import botocore
 from botocore.exceptions import ClientError
 import json
 import time
+import contextlib
 from decimal import Decimal
 from chalicelib.exceptions import *
 from chalicelib.dynamo_expression_handler import DynamoUpdateExpressionHandler
@@ -17,6 +18,9 @@ from chalicelib.schema_cache_entry import SchemaCacheEntry
 
 log = None
 
+# maximum number of keys in a BatchGetItem request
+BATCH_GET_LIMIT = 100
+
 def validate_params(**kwargs):
     pass
 
@@ -366,8 +370,8 @@ class DataAPIStorageHandler:
         return this_table
 
     # public interface method to verify that an object exists in the data API
-    def check(self, id):
-        item = self._fetch_item(self._resource_table, id)
+    def check(self, id, consistent_read: bool = False):
+        item = self._fetch_item(self._resource_table, id, consistent_read=consistent_read)
 
         if item is not None:
             return {"Exists": True}
@@ -375,12 +379,15 @@ class DataAPIStorageHandler:
             raise ResourceNotFoundException()
 
     # method to fetch an item by ID from the data or metadata API tables
-    def _fetch_item(self, table, id, force=False, only_attributes: list = None):
+    def _fetch_item(self, table, id, force=False, only_attributes: list = None, consistent_read: bool = False):
         args = {'Key': {
             self._pk_name: id
         }
         }
 
+        if utils.strtobool(consistent_read) is True:
+            args['ConsistentRead'] = True
+
         if only_attributes is not None:
             set_whitelist = only_attributes.copy()
             # add the primary key, as the response will be nonsensical without it
@@ -400,10 +407,11 @@ class DataAPIStorageHandler:
 
     # public method to retrieve a data or metadata Item from its respective table
     def get(self, id, suppress_meta_fetch: bool = False, only_attributes: list = None,
-            not_attributes: list = None):
+            not_attributes: list = None, consistent_read: bool = False):
         log.debug(f"Storage Handler GET of Item {id}")
 
-        item = self._fetch_item(table=self._resource_table, id=id, only_attributes=only_attributes)
+        item = self._fetch_item(table=self._resource_table, id=id, only_attributes=only_attributes,
+                                consistent_read=consistent_read)
 
         if item is None:
             raise ResourceNotFoundException(f"Invalid ID {id}")
@@ -419,14 +427,14 @@ class DataAPIStorageHandler:
                 log.debug("Suppressing Item Metadata Retrieval")
                 return self._structure_item(id, item, None)
             else:
-                meta = self._fetch_meta(id)
+                meta = self._fetch_meta(id, consistent_read=consistent_read)
 
                 return self._structure_item(id, item, meta)
 
     # method to fetch metadata for a given item by ID
-    def _fetch_meta(self, id):
+    def _fetch_meta(self, id, consistent_read: bool = False):
         # just fetch the metadata
-        meta = self._fetch_item(self._metadata_table, utils.get_metaid(id))
+        meta = self._fetch_item(self._metadata_table, utils.get_metaid(id), consistent_read=consistent_read)
         if meta is not None:
             del meta[self._pk_name]
 
@@ -448,12 +456,76 @@ class DataAPIStorageHandler:
             return None
 
     # public method for extracting metadata given an ID
-    def get_metadata(self, id):
+    def get_metadata(self, id, consistent_read: bool = False):
         # validate if the item is deleted - will throw ResourceNotFoundException if deleted
-        val = self.check(id)
-        meta = self._fetch_meta(id)
+        val = self.check(id, consistent_read=consistent_read)
+        meta = self._fetch_meta(id, consistent_read=consistent_read)
         return meta
 
+    # public method to fetch many items with chunked BatchGetItem requests, returning them in the order of the requested
+    # ids. Ids which are not found, or are deleted, are returned as NotFound
+    def batch_get(self, ids: list, suppress_meta_fetch: bool = False, consistent_read: bool = False) -> dict:
+        if ids is None or len(ids) == 0:
+            return {params.ITEMS: [], params.NOT_FOUND: []}
+
+        # remove duplicate ids, preserving the order they were supplied in
+        request_ids = list(dict.fromkeys([str(x) for x in ids]))
+        resource_table = self._resource_table.name
+        metadata_table = self._metadata_table.name
+        with_meta = suppress_meta_fetch is not True
+        consistent = utils.strtobool(consistent_read) is True
+
+        # each id reads both its resource and its metadata, within the limit of keys per request
+        chunk_size = BATCH_GET_LIMIT // 2 if with_meta else BATCH_GET_LIMIT
+        resources = {}
+        metadata = {}
+
+        for i in range(0, len(request_ids), chunk_size):
+            chunk = request_ids[i:i + chunk_size]
+            request_items = {resource_table: {'Keys': [{self._pk_name: x} for x in chunk],
+                                              'ConsistentRead': consistent}}
+            if with_meta:
+                request_items[metadata_table] = {'Keys': [{self._pk_name: utils.get_metaid(x)} for x in chunk],
+                                                 'ConsistentRead': consistent}
+
+            # unprocessed keys are retried with backoff, as they are returned when the tables are throttled
+            attempt = 0
+            while len(request_items) > 0:
+                if attempt == params.DEFAULT_RETRY_COUNT:
+                    unprocessed = sum([len(v.get('Keys')) for v in request_items.values()])
+                    raise DetailedException("Unable to perform Batch Get", detail=f"{unprocessed} Keys Unprocessed")
+                elif attempt > 0:
+                    time.sleep(min(0.05 * (2 ** attempt), 2))
+
+                response = self._dynamo_resource.batch_get_item(RequestItems=request_items)
+
+                for item in response.get('Responses', {}).get(resource_table, []):
+                    resources[item.get(self._pk_name)] = item
+                for item in response.get('Responses', {}).get(metadata_table, []):
+                    metadata[utils.get_id_from_metaid(item.get(self._pk_name))] = item
+
+                request_items = response.get('UnprocessedKeys', {})
+                attempt += 1
+
+        items = []
+        not_found = []
+        for x in request_ids:
+            resource = resources.get(x)
+
+            if resource is None or (params.DELETED in resource and resource[params.DELETED] != 0):
+                not_found.append(x)
+            else:
+                meta = metadata.get(x)
+                if meta is not None:
+                    del meta[self._pk_name]
+
+                items.append(self._structure_item(x, resource, meta))
+
+        return {
+            params.ITEMS: items,
+            params.NOT_FOUND: not_found
+        }
+
     # internal method for performing an update to a dynamoDB table
     def _simple_update(self, id, update_table, update_expression, caller_identity, update_action):
         args = {
@@ -1167,6 +1239,28 @@ class DataAPIStorageHandler:
             return self._perform_scan(table=search_table, last_key=last_key, scan_filters=search_doc,
                                       do_limit_in_scan=False, **kwargs)
 
+    # public method to return the status of the global secondary indexes on the data and metadata tables
+    def get_index_status(self):
+        status = {}
+        for t in [self._resource_table, self._metadata_table]:
+            indexes = t.global_secondary_indexes if t.global_secondary_indexes is not None else []
+            status[t.name] = {i.get('IndexName'): i.get('IndexStatus') for i in indexes}
+
+        return status
+
+    # DynamoDB items store booleans natively, so there are no columns to migrate
+    def migrate_boolean_columns(self):
+        return {}
+
+    # global secondary indexes are created along with the tables, so there is nothing further to build
+    def build_indexes(self):
+        return self.get_index_status()
+
+    # DynamoDB writes are applied per item with conditional expressions, so there is no transaction to demarcate
+    @contextlib.contextmanager
+    def transaction(self):
+        yield
+
     # public method to return stream information for the data and metadata tables
     def get_streams(self):
         resource_table = self._resource_table.table_arn
@@ -1181,7 +1275,7 @@ class DataAPIStorageHandler:
             params.METADATA_STREAM_ARN: metadata_stream
         }
 
-    def get_usage(self, table_name):
+    def get_usage(self, table_name, **kwargs):
         try:
             table_desc = self._dynamo_client.describe_table(TableName=table_name)
             if table_desc is not None and 'Table' in table_desc:
@@ -190,7 +190,7 @@ class DynamoTableUtils:
                                          caller_identity=caller_identity, **kwargs)
 
     # method to delete a control table item
-    def control_table_delete(self, control_hash, control_sort, caller_identity):
+    def control_table_delete(self, control_hash, control_sort, caller_identity="System"):
         args = {
             "Key": {
                 params.CONTROL_HASH: control_hash,
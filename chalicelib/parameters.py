@@ -21,17 +21,22 @@ AUTHORIZER_IAM = 'IAM'
 AUTHORIZER_COGNITO = 'Cognito'
 AUTHORIZER_CUSTOM = 'Custom'
 BLACKLIST_ATTRIBUTES = 'FilterAttributes'
+BULK_CONCURRENCY = 'BulkConcurrency'
+BULK_FLUSH_SIZE = 'BulkFlushSize'
 CLUSTER_ADDRESS = 'ClusterAddress'
 CLUSTER_PORT = 'ClusterPort'
 COGNITO_POOL_NAME_PARAM = 'COGNITO_AUTHORIZER_USER_POOL'
 COGNITO_PROVIDER_ARNS = 'COGNITO_AUTHORIZER_PROVIDER_ARNS'
 CATALOG_DATABASE = 'CatalogDatabase'
+CHANGE_FEED_NAME = "ChangeFeed"
+CHANGE_FEED_SCHEDULER_NAME = "ChangeFeedScheduler"
 CONSTRAINTS = 'Constraints'
 CONTROL_HASH = 'api'
 CONTROL_SORT = 'type'
 CONTROL_TABLE = "AwsDataApi"
 CONTROL_TYPE_META = 'ApiMetadata'
 CONTROL_TYPE_METADATA_SCHEMA = "JsonSchema-Metadata"
+CONTROL_TYPE_REINDEX = 'Reindex'
 CONTROL_TYPE_RESOURCE_SCHEMA = "JsonSchema-Resource"
 CRAWLER_ROLENAME = 'CrawlerRolename'
 DATA_TYPE = 'DataType'
@@ -41,19 +46,33 @@ DB_NAME = "DbName"
 DB_USERNAME_PSTORE_ARN = "DbPasswordSsmParameterStoreArn"
 DB_USE_SSL = "DatabaseUseSSLBool"
 DEFAULT_ALLOW_RUNTIME_DELETE_MODE_CHANGE = False
+DEFAULT_ASYNC_POOL_SIZE = 4
+DEFAULT_BATCH_GET_CHUNK_SIZE = 1000
+DEFAULT_BULK_LOAD_BATCH_SIZE = 10000
 DEFAULT_CATALOG_DATABASE = 'data-api'
+DEFAULT_CHANGE_FEED_BATCH_SIZE = 500
+DEFAULT_CHANGE_FEED_SCHEDULE_MINUTES = 1
 DEFAULT_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+DEFAULT_EXACT_USAGE_CACHE_SECONDS = 300
+DEFAULT_EXACT_USAGE_TIMEOUT_MILLIS = 20000
 DEFAULT_EXPORT_DPU = 5
 DEFAULT_LOG_LEVEL = 'INFO'
 DEFAULT_MAX_RESPONSE_SIZE = 1000
 DEFAULT_NON_ITEM_MASTER_WRITE_ALLOWED = False
+DEFAULT_PARAMETER_CACHE_SECONDS = 900
+DEFAULT_PARTITION_COUNT = 8
+DEFAULT_PARTITION_INTERVAL = 'month'
 DEFAULT_PITR_ENABLED = False
+DEFAULT_REINDEX_CONCURRENCY = 4
 DEFAULT_RETRY_COUNT = 5
 DEFAULT_SCHEMA_VALIDATION_REFRESH_HITCOUNT = 1000
+DEFAULT_SEARCH_KEEP_ALIVE = '1m'
+DEFAULT_SEARCH_REFRESH_INTERVAL = '30s'
 DYNAMO_STORAGE_HANDLER = 'dynamo_data_api'
 DEFAULT_STORAGE_HANDLER = DYNAMO_STORAGE_HANDLER
 DEFAULT_STORAGE_LOCATION_ATTRIBUTE = "StorageLocation"
 DEFAULT_STRICT_OCCV = False
+DEFAULT_TEXT_SEARCH_CONFIGURATION = 'english'
 DELETE_MODE = 'DeleteMode'
 DELETE_MODE_HARD = 'Hard'
 DELETE_MODE_LABEL = "label"
@@ -62,6 +81,8 @@ DEFAULT_DELETE_MODE = DELETE_MODE_SOFT
 DELETE_MODE_TOMBSTONE = "tombstone"
 DELETED = 'deleted'
 DELIVERY_STREAM_FAILURE_BUCKET = 'FailedIndexRecordBucket'
+DELIVERY_BUFFER_INTERVAL = 'DeliveryBufferIntervalSeconds'
+DELIVERY_BUFFER_SIZE = 'DeliveryBufferSizeMB'
 DEPLOYED_ACCOUNT = 'DeployedAccount'
 ES_DOMAIN = 'ElasticSearchDomain'
 EXCLUSIVE_START_KEY = 'ExclusiveStartKey'
@@ -77,8 +98,10 @@ FLUSH_LOG_LIMIT_COUNT = 50
 FLUSH_LOG_LIMIT_SECONDS = 10
 GREMLIN_ADDRESS = 'GremlinAddress'
 INDEXER_NAME = "EsIndexer"
+INDEX_STATUS = "IndexStatus"
 ITEM = 'Item'
 ITEM_ARN = "Arn"
+ITEMS = 'Items'
 ITEM_MASTER_ID = "ItemMasterID"
 ITEM_MASTER_INCLUDE = 'include'
 ITEM_MASTER_PREFER = 'prefer'
@@ -97,18 +120,46 @@ METADATA_TABLE_ARN = 'MetadataTableARN'
 METADATA_STREAM_ARN = 'MetadataStreamARN'
 METADATA_INDEXES = 'MetadataIndexes'
 NON_ITEM_MASTER_WRITES_ALLOWED = 'NonItemMasterWritesAllowed'
+NOT_FOUND = 'NotFound'
+OPERATOR_BEGINS_WITH = 'BEGINS_WITH'
+OPERATOR_BETWEEN = 'BETWEEN'
+OPERATOR_CONTAINS = 'CONTAINS'
+OPERATOR_EQ = 'EQ'
+OPERATOR_GE = 'GE'
+OPERATOR_GT = 'GT'
+OPERATOR_IN = 'IN'
+OPERATOR_LE = 'LE'
+OPERATOR_LT = 'LT'
+OPERATOR_NE = 'NE'
 OVERRIDE_METADATA_TABLENAME = 'OverrideMetadataTableName'
+PARTITION_ATTRIBUTE = 'PartitionAttribute'
+PARTITION_COUNT = 'PartitionCount'
+PARTITION_INTERVAL = 'PartitionInterval'
+PARTITION_START = 'PartitionStart'
+PARTITION_TYPE = 'PartitionType'
 PAY_PER_REQUEST = 'PAY_PER_REQUEST'
 PITR_ENABLED = "PointInTimeRecoveryEnabled"
 PRIMARY_KEY = 'PrimaryKey'
 PROVISIONER_NAME = "Provisioning"
+QUERY_PLAN = 'QueryPlan'
 QUERY_PARAM_CONSISTENT = 'Consistent'
+QUERY_PARAM_EXACT = 'Exact'
+QUERY_PARAM_EXPLAIN = 'Explain'
 QUERY_PARAM_LIMIT = 'Limit'
 QUERY_PARAM_SEGMENT = 'Segment'
 QUERY_PARAM_TOTAL_SEGMENTS = 'TotalSegments'
+RDBMS_ASYNC_ENGINE = "RdbmsAsyncEngineBool"
+RDBMS_CHANGE_FEED = "RdbmsChangeFeedBool"
 RDBMS_DIALECT = "RdbmsDialect"
 RDBMS_STORAGE_HANDLER = 'rdbms_storage_handler'
+RDBMS_SYNCHRONOUS_COMMIT = "RdbmsSynchronousCommitBool"
+RDBMS_TEXT_SEARCH = "RdbmsTextSearchBool"
+READER_CLUSTER_ADDRESS = 'ReaderClusterAddress'
 REFERENCES = 'References'
+REINDEX_CONCURRENCY = 'ReindexConcurrency'
+REINDEX_READ_CAPACITY = 'ReindexReadCapacity'
+REINDEX_RESUME = 'Resume'
+REINDEXER_NAME = "Reindexer"
 REGION = 'region'
 REMOVE = 'REMOVE'
 RESOURCE = 'Resource'
@@ -116,13 +167,29 @@ RESOURCE_TABLE_ARN = 'ResourceTableARN'
 RESOURCE_STREAM_ARN = 'ResourceStreamARN'
 RESPONSE_BODY = 'Body'
 ROTATE_LOG_INTERVAL_SECONDS = 300
+SCHEMA_SEARCH_MAPPING = 'searchMapping'
 SCHEMA_VALIDATION_REFRESH_HITCOUNT = 'SchemaValidationRefreshHitcount'
 SEARCH_CONFIG = 'SearchConfig'
+SEARCH_INDEXER_MODE = 'SearchIndexerMode'
+SEARCH_INDEXER_MODE_BULK = 'Bulk'
+SEARCH_INDEXER_MODE_FIREHOSE = 'Firehose'
+DEFAULT_SEARCH_INDEXER_MODE = SEARCH_INDEXER_MODE_FIREHOSE
+SEARCH_HYDRATE = 'Hydrate'
+SEARCH_KEEP_ALIVE = 'KeepAlive'
+SEARCH_MAPPING_DISABLED = 'disabled'
+SEARCH_MAPPING_KEYWORD = 'keyword'
+SEARCH_MAPPING_TEXT = 'text'
+SEARCH_MERGE = 'Merge'
+SEARCH_PAGINATE = 'Paginate'
+SEARCH_REFRESH_INTERVAL = 'SearchRefreshInterval'
+SEARCH_TYPE = 'SearchType'
 SECURITY_GROUPS = 'SecurityGroups'
 SET = 'SET'
 STAGE = 'Stage'
 STATUS_ACTIVE = "ACTIVE"
 STATUS_CREATING = "CREATING"
+STATUS_FAILED = "FAILED"
+STATUS_MISSING = "MISSING"
 STORAGE_CRYPTO_KEY_ARN = "StorageEncryptionKMSKeyARN"
 STORAGE_HANDLER = 'StorageHandler'
 STORAGE_LOCATION_ATTRIBUTE = "StorageAttribute"
@@ -132,6 +199,7 @@ STRICT_SCHEMA_VALIDATION = 'StrictSchemaValidation'
 SUBNETS = 'Subnets'
 SUPPRESS_ITEM_METADATA_FETCH = "SuppressItemMetadataFetch"
 TABLE_INDEXES = 'TableIndexes'
+TEXT_SEARCH_CONFIGURATION = 'TextSearchConfiguration'
 TOMBSTONED = "tombstoned"
 UNDERSTANDER_NAME = "Understander"
 WARNING = 'Warning'
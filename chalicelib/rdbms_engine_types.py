@@ -5,11 +5,14 @@ import chalicelib.utils as utils
 import chalicelib.parameters as params
 import chalicelib.exceptions as exceptions
 import pg8000
-import ssl
+import asyncpg
+import ssl as ssl_lib
 import json
 import socket
 import os
 import traceback
+import re
+import datetime
 from pg8000.dbapi import ProgrammingError
 
 _who_type_map = {
@@ -34,6 +37,22 @@ _who_col_map = {
     }
 }
 
+# keys of nested document paths are rendered into statements and index definitions, so are restricted to safe names
+_path_key = re.compile(r'^[A-Za-z0-9_\-]+$')
+
+# index specs may request a GIN index on a document column or path with this suffix
+INDEX_TYPE_GIN = 'gin'
+
+# generated column holding the full text search document of a table, which is indexed with an index spec of
+# 'search_vector:gin'
+SEARCH_VECTOR_COLUMN = 'search_vector'
+_search_weights = ['A', 'B', 'C', 'D']
+
+# tables may be hash partitioned on the primary key, or range partitioned on a date or date-time attribute
+PARTITION_HASH = 'hash'
+PARTITION_RANGE = 'range'
+_partition_intervals = ['day', 'month', 'year']
+
 _who_invert = {}
 _who_invert[DIALECT_PG] = {v: k for k, v in _who_col_map.get(DIALECT_PG).items()}
 
@@ -66,7 +85,7 @@ class RdbmsEngineType:
             conn = pg8000.connect(user=cluster_user, host=cluster_address, port=int(cluster_port),
                                   database=database,
                                   password=pwd,
-                                  ssl_context=ssl.create_default_context() if ssl is True else None,
+                                  ssl_context=ssl_lib.create_default_context() if ssl is True else None,
                                   timeout=None, tcp_keepalive=True, application_name=params.AWS_DATA_API_NAME)
 
             # Enable keepalives manually until pg8000 supports it
@@ -79,6 +98,18 @@ class RdbmsEngineType:
         else:
             raise exceptions.UnimplementedFeatureException()
 
+    def is_authentication_failure(self, e: Exception) -> bool:
+        '''Determine if an error raised on connection was an authentication failure, such as after a password has been
+        rotated, where SQLSTATE class 28 is invalid authorization specification
+        '''
+        # pg8000 supplies the server error fields as a dict, and asyncpg as attributes of the exception
+        if len(e.args) > 0 and isinstance(e.args[0], dict):
+            code = e.args[0].get('C')
+        else:
+            code = getattr(e, 'sqlstate', None)
+
+        return code is not None and code.startswith('28')
+
     def get_who_col_map(self) -> dict:
         return _who_col_map.get(self._dialect)
 
@@ -106,8 +137,10 @@ class RdbmsEngineType:
         else:
             return value
 
-    def who_column_update(self, caller_identity: str, version_increment: bool = True):
+    def who_column_update(self, caller_identity: str, version_increment: bool = True, prefix: str = None):
         map = self.get_who_col_map()
+        # qualify the current item version where the statement can see more than one table, such as on conflict
+        version_ref = map.get(params.ITEM_VERSION) if prefix is None else f"{prefix}.{map.get(params.ITEM_VERSION)}"
         clauses = [
             f"{map.get(params.LAST_UPDATE_ACTION)} = '{params.ACTION_UPDATE}'",
             f"{map.get(params.LAST_UPDATE_DATE)} = CURRENT_TIMESTAMP",
@@ -116,7 +149,7 @@ class RdbmsEngineType:
 
         if version_increment is True:
             clauses.append(
-                f"{map.get(params.ITEM_VERSION)} = {map.get(params.ITEM_VERSION)}+1")
+                f"{map.get(params.ITEM_VERSION)} = {version_ref}+1")
 
         return clauses
 
@@ -142,7 +175,9 @@ class RdbmsEngineType:
 
     def run_commands(self, conn, commands: list) -> list:
         '''Function to run one or more commands that will return at most one record. For statements that return
-        multiple records, use underlying cursor directly.
+        multiple records, use underlying cursor directly. Commands may be a SQL string, or a tuple of SQL with format
+        style placeholders and the list of arguments to bind to them. Errors are returned in the output rows, other than
+        within an explicit transaction, where they are raised so the transaction can be rolled back.
         '''
         cursor = conn.cursor()
         counts = []
@@ -169,7 +204,12 @@ class RdbmsEngineType:
         for c in commands:
             if c is not None:
                 try:
-                    if c.count(';') > 1:
+                    # parameterised statements are supplied as a (statement, args) tuple
+                    if isinstance(c, tuple):
+                        self._logger.debug(c)
+                        cursor.execute(c[0], c[1])
+                        _add_output()
+                    elif c.count(';') > 1:
                         subcommands = c.split(';')
 
                         for s in subcommands:
@@ -181,8 +221,19 @@ class RdbmsEngineType:
                         cursor.execute(c)
                         _add_output()
                 except pg8000.dbapi.IntegrityError as ie:
-                    pass
+                    # errors abort an enclosing transaction, which must then be rolled back by its owner
+                    if conn.in_transaction:
+                        cursor.close()
+                        raise ie
+
+                    # the statement modified no records, so report it as such rather than omitting its output
+                    counts.append(0)
+                    rows.append(ie)
                 except Exception as e:
+                    if conn.in_transaction:
+                        cursor.close()
+                        raise e
+
                     # cowardly bail on errors
                     conn.rollback()
                     print(traceback.format_exc())
@@ -195,7 +246,73 @@ class RdbmsEngineType:
         cursor.close()
         return counts, rows
 
-    def verify_table(self, conn, table_ref: str, table_schema: dict, pk_name: str) -> None:
+    def batch_statement(self, commands: list) -> tuple:
+        '''Combine a list of insert, update or delete commands into a single statement of data modifying common table
+        expressions, which returns one row with the number of records affected by each command. The combined statement
+        is sent in one network exchange and runs as one transaction. Commands take the same forms as for run_commands,
+        must not include a returning clause, and should not modify the same record more than once.
+        '''
+        ctes = []
+        counters = []
+        args = []
+        for i, c in enumerate(commands):
+            statement, bind = c if isinstance(c, tuple) else (c, None)
+            ctes.append(f"s{i} as ({statement.strip().rstrip(';')} returning 1)")
+            counters.append(f"(select count(9) from s{i})")
+
+            if bind is not None:
+                args.extend(bind)
+
+        return f"with {','.join(ctes)} select {','.join(counters)}", args
+
+    def run_batch(self, conn, commands: list) -> list:
+        '''Function to run a list of insert, update or delete commands in a single round trip and transaction,
+        returning the number of records affected by each command in order. If the batch fails then no command is
+        applied, and all counts are 0, unless the batch is part of an enclosing transaction in which case the error is
+        raised
+        '''
+        if commands is None or len(commands) == 0:
+            return []
+
+        statement, args = self.batch_statement(commands)
+        self._logger.debug(statement)
+
+        cursor = conn.cursor()
+        try:
+            cursor.execute(statement, args if len(args) > 0 else None)
+            return list(cursor.fetchone())
+        except Exception as e:
+            if conn.in_transaction:
+                raise e
+
+            conn.rollback()
+            print(traceback.format_exc())
+            return [0] * len(commands)
+        finally:
+            cursor.close()
+
+    def create_staging_table(self, cursor, table_ref: str, staging_ref: str, columns: list) -> None:
+        '''Create a temporary table with the supplied columns of the target table, without its constraints. Must be
+        called inside a transaction, as the staging table is dropped on commit
+        '''
+        if self._dialect == DIALECT_PG:
+            cursor.execute(
+                f"create temporary table {staging_ref} on commit drop as select {','.join(columns)} from {table_ref} with no data")
+            cursor.execute(f"alter table {staging_ref} add column load_seq bigserial")
+        else:
+            raise exceptions.UnimplementedFeatureException()
+
+    def copy_csv(self, cursor, table_ref: str, columns: list, stream) -> int:
+        '''Stream a CSV encoded binary file-like object into the table with COPY FROM STDIN. Unquoted empty values are
+        loaded as NULL
+        '''
+        if self._dialect == DIALECT_PG:
+            cursor.execute(f"copy {table_ref} ({','.join(columns)}) from stdin with (format csv)", stream=stream)
+            return cursor.rowcount
+        else:
+            raise exceptions.UnimplementedFeatureException()
+
+    def verify_table(self, conn, table_ref: str, table_schema: dict, pk_name: str, partitioning: dict = None) -> None:
         if self._dialect == DIALECT_PG:
             try:
                 cursor = conn.cursor()
@@ -207,48 +324,416 @@ class RdbmsEngineType:
             except ProgrammingError as pe:
                 if "not exist" in str(pe):
                     # table doesn't exist so create it based on the current schema
-                    self.create_table_from_schema(conn, table_ref, table_schema, pk_name)
+                    self.create_table_from_schema(conn, table_ref, table_schema, pk_name, partitioning)
                 else:
                     self._logger.error(pe)
                     raise exceptions.DetailedException(pe)
         else:
             raise exceptions.UnimplementedFeatureException()
 
-    def create_index(self, conn, table_ref: str, column_name: str) -> None:
-        index_name = f"{table_ref}_{column_name}"
-        statement = f"create index {index_name} on {table_ref} ({column_name})"
+    def json_path_expression(self, column: str, path: list, as_text: bool = True) -> str:
+        '''Render an expression which extracts a nested path from a document column, as text or as a document'''
+        if self._dialect == DIALECT_PG:
+            expression = column
+            for i, key in enumerate(path):
+                if _path_key.match(key) is None:
+                    raise exceptions.InvalidArgumentsException(f"Invalid Document Path element {key}")
+
+                # array elements are addressed by position, and object attributes by name
+                element = key if key.isdigit() else f"'{key}'"
+                operator = "->>" if as_text is True and i == len(path) - 1 else "->"
+                expression = f"{expression}{operator}{element}"
 
-        self.run_commands(conn, [statement])
+            return expression
+        else:
+            raise exceptions.UnimplementedFeatureException()
+
+    def parse_index_spec(self, table_ref: str, index_spec: str) -> tuple:
+        '''Resolve an index spec into its index name, the plain column it covers (if any), and its definition. Specs are
+        a column name such as 'attr2', a nested document path such as 'address.city' for an expression index, and
+        either of these with a ':gin' suffix for a GIN index supporting containment (@>) queries
+        '''
+        if ':' in index_spec:
+            target, index_type = index_spec.split(':', 1)
+            if index_type.lower() != INDEX_TYPE_GIN:
+                raise exceptions.InvalidArgumentsException(f"Unknown Index Type {index_type}")
+        else:
+            target, index_type = index_spec, None
+
+        tokens = target.split('.')
+        if _path_key.match(tokens[0]) is None:
+            raise exceptions.InvalidArgumentsException(f"Invalid Index Column {tokens[0]}")
+
+        name = f"{table_ref}_{'_'.join(tokens)}".replace('-', '_')
+        if index_type is not None and target == SEARCH_VECTOR_COLUMN:
+            return f"{name}_{INDEX_TYPE_GIN}", None, f"using gin ({SEARCH_VECTOR_COLUMN})"
+        elif index_type is not None:
+            expression = self.json_path_expression(tokens[0], tokens[1:], as_text=False)
+            expression = expression if len(tokens) == 1 else f"({expression})"
+            return f"{name}_{INDEX_TYPE_GIN}", None, f"using gin ({expression} jsonb_path_ops)"
+        elif len(tokens) > 1:
+            return name, None, f"(({self.json_path_expression(tokens[0], tokens[1:], as_text=True)}))"
+        else:
+            return name, tokens[0], f"({tokens[0]})"
+
+    def create_index(self, conn, table_ref: str, index_spec: str, concurrently: bool = True) -> None:
+        '''Create an index from an index spec. Concurrent builds don't block writes to the table, but can't run inside a
+        transaction, and leave an invalid index behind if they fail, which is dropped before retrying. Partitioned
+        tables are indexed one partition at a time
+        '''
+        index_name, column, definition = self.parse_index_spec(table_ref, index_spec)
+        concurrent = " concurrently" if concurrently is True else ""
+        partitions = self.get_partitions(conn, table_ref)
+
+        cursor = conn.cursor()
+        try:
+            if len(partitions) == 0:
+                cursor.execute(f"drop index{concurrent} if exists {index_name}")
+                cursor.execute(f"create index{concurrent} {index_name} on {table_ref} {definition}")
+            else:
+                # partitioned tables can't be indexed concurrently, so the index is created on the parent only, and
+                # then built on each partition and attached. The parent index becomes valid once all are attached
+                cursor.execute(f"drop index if exists {index_name}")
+                cursor.execute(f"create index {index_name} on only {table_ref} {definition}")
+
+                for p in partitions:
+                    partition_index = f"{p}{index_name[len(table_ref):]}"
+                    cursor.execute(f"drop index{concurrent} if exists {partition_index}")
+                    cursor.execute(f"create index{concurrent} {partition_index} on {p} {definition}")
+                    cursor.execute(f"alter index {index_name} attach partition {partition_index}")
+        except Exception as e:
+            self._logger.error(e)
+            raise exceptions.DetailedException(f"Unable to create Index {index_name}", detail=str(e))
+        finally:
+            cursor.close()
 
         self._logger.info(f"Created new Index {index_name}")
 
-    def verify_indexes(self, conn, table_ref: str, indexes: list) -> None:
-        if indexes is not None:
-            process_indexes = []
-            process_indexes.append(indexes)
+    def get_char_flag_columns(self, conn, table_columns: dict) -> dict:
+        '''Resolve the boolean attributes which are still stored in char(1) flag columns, as created by earlier versions.
+        Table columns is a dict of table name to the columns which the schema declares as boolean, and the flag columns
+        are returned in the same form
+        '''
+        tables = list(table_columns.keys())
+
+        if len(tables) == 0:
+            return {}
+
+        counts, rows = self.run_commands(conn, [(self.get_sql("CharFlagColumns"), [tables])])
+
+        if len(rows) > 0 and isinstance(rows[0], Exception):
+            raise exceptions.DetailedException("Unable to resolve Boolean Column Types", detail=str(rows[0]))
+
+        flags = {}
+        for r in rows:
+            if r is not None and r[1] in table_columns.get(r[0], []):
+                flags.setdefault(r[0], []).append(r[1])
+
+        return flags
+
+    def migrate_boolean_columns(self, conn, table_columns: dict) -> dict:
+        '''Convert boolean attributes which are stored in char(1) flag columns to native boolean columns. Table columns
+        is a dict of table name to the columns which the schema declares as boolean, and the columns which were
+        converted are returned in the same form. Converting a column rewrites the table, and so this should be run from
+        the provisioning function rather than on the request path
+        '''
+        migrate = self.get_char_flag_columns(conn=conn, table_columns=table_columns)
+
+        cursor = conn.cursor()
+        try:
+            for table_ref, columns in migrate.items():
+                # the '0' default can't be cast, so it is dropped before the type is changed
+                alters = [f"alter column {c} drop default, alter column {c} type boolean using {c} = '1'" for c in
+                          columns]
+                statement = f"alter table {table_ref} {','.join(alters)}"
+                self._logger.debug(statement)
+                cursor.execute(statement)
+                self._logger.info(f"Converted {','.join(columns)} on {table_ref} to boolean")
+        except Exception as e:
+            self._logger.error(e)
+            raise exceptions.DetailedException("Unable to convert Boolean Columns", detail=str(e))
+        finally:
+            cursor.close()
+
+        return migrate
+
+    def search_vector_expression(self, columns: list, config: str) -> str:
+        # attributes are weighted in the order they are supplied, so that matches on earlier attributes rank higher
+        if _path_key.match(config) is None:
+            raise exceptions.InvalidArgumentsException(f"Invalid Text Search Configuration {config}")
+
+        return " || ".join(
+            [f"setweight(to_tsvector('{config}'::regconfig, coalesce({c}, '')), '{_search_weights[min(i, len(_search_weights) - 1)]}')"
+             for i, c in enumerate(columns)])
+
+    def verify_search_column(self, conn, table_ref: str, columns: list, config: str) -> None:
+        '''Add the generated search vector column over the supplied text columns to a table, if it doesn't already
+        exist. The column is maintained by the database on every write, but adding it rewrites the table, so this
+        should be run from the provisioning function rather than on the request path
+        '''
+        statement = f"alter table {table_ref} add column if not exists {SEARCH_VECTOR_COLUMN} tsvector generated always as ({self.search_vector_expression(columns, config)}) stored"
+        self._logger.debug(statement)
+
+        cursor = conn.cursor()
+        try:
+            cursor.execute(statement)
+        except Exception as e:
+            self._logger.error(e)
+            raise exceptions.DetailedException(f"Unable to create Search Column on {table_ref}", detail=str(e))
+        finally:
+            cursor.close()
+
+    def verify_change_feed(self, conn, feed_ref: str, table_refs: list, pk_name: str) -> None:
+        '''Create the outbox table which records item level changes to the supplied tables with a sequence number, and
+        the triggers which maintain it, if they don't already exist. Changes are written by the transaction that makes
+        them, and so are only visible to consumers once committed. Inserts and updates record the new row image, and
+        deletes only the key
+        '''
+        triggers = {t: f"{t}_change_feed" for t in table_refs}
+        counts, rows = self.run_commands(conn, [(self.get_sql("TriggerNames"), [list(triggers.values())])])
+
+        if len(rows) > 0 and isinstance(rows[0], Exception):
+            raise exceptions.DetailedException("Unable to resolve Change Feed Triggers", detail=str(rows[0]))
+
+        existing = [r[0] for r in rows if r is not None]
+        missing = [t for t, trigger in triggers.items() if trigger not in existing]
+
+        if len(missing) == 0:
+            return
+
+        # the capture function receives the parent table name as an argument, as TG_TABLE_NAME is the partition name
+        # for partitioned tables
+        statements = [
+            f"create table if not exists {feed_ref}(sequence_number bigserial primary key, table_name varchar not null, item_id varchar not null, event_name varchar(6) not null, new_image jsonb null, change_date timestamp with time zone not null default CURRENT_TIMESTAMP)",
+            f"create or replace function {feed_ref}_capture() returns trigger as $$ begin "
+            f"if TG_OP = 'DELETE' then "
+            f"insert into {feed_ref}(table_name, item_id, event_name) values (TG_ARGV[0], OLD.{pk_name}, 'REMOVE'); "
+            f"return OLD; "
+            f"else "
+            f"insert into {feed_ref}(table_name, item_id, event_name, new_image) values (TG_ARGV[0], NEW.{pk_name}, case when TG_OP = 'INSERT' then 'INSERT' else 'MODIFY' end, to_jsonb(NEW) - '{SEARCH_VECTOR_COLUMN}'); "
+            f"return NEW; "
+            f"end if; end $$ language plpgsql"
+        ]
+        statements.extend(
+            [f"create trigger {triggers.get(t)} after insert or update or delete on {t} for each row execute function {feed_ref}_capture('{t}')"
+             for t in missing])
+
+        # the function body contains statement separators, so the statements are run directly rather than with
+        # run_commands
+        cursor = conn.cursor()
+        try:
+            cursor.execute("begin")
+            for statement in statements:
+                self._logger.debug(statement)
+                cursor.execute(statement)
+            cursor.execute("commit")
+        except Exception as e:
+            cursor.execute("rollback")
+            self._logger.error(e)
+            raise exceptions.DetailedException(f"Unable to create Change Feed {feed_ref}", detail=str(e))
+        finally:
+            cursor.close()
+
+        self._logger.info(f"Created Change Feed {feed_ref} for {','.join(missing)}")
+
+    def get_index_status(self, conn, table_indexes: dict) -> dict:
+        '''Resolve the status of the indexes in the supplied dict of table name to index spec list, with a single
+        catalog query. Indexes are ACTIVE when valid, CREATING when being built (or a concurrent build has failed), and
+        MISSING otherwise. Plain column specs are satisfied by any index on the column, and path or GIN specs by the
+        index of the name that create_index would give them
+        '''
+        tables = list(table_indexes.keys())
+
+        if len(tables) == 0:
+            return {}
+
+        counts, rows = self.run_commands(conn, [(self.get_sql("IndexStatus"), [tables])])
 
-            for i in process_indexes:
-                sql = self.get_sql("VerifyIndexOnColumn") % (table_ref, i)
+        if len(rows) > 0 and isinstance(rows[0], Exception):
+            raise exceptions.DetailedException("Unable to resolve Index Status", detail=str(rows[0]))
 
-                counts, index_exists = self.run_commands(conn, [sql])
+        by_column = {}
+        by_name = {}
+        for r in rows:
+            if r is not None:
+                table_name, index_name, column_name, is_valid = r
+                by_name[index_name] = is_valid
+                if column_name is not None:
+                    by_column[(table_name, column_name)] = by_column.get((table_name, column_name), False) or is_valid
 
-                if index_exists[0] == () or index_exists[0] is None:
-                    self.create_index(conn, table_ref, i)
+        status = {}
+        for table_ref, specs in table_indexes.items():
+            status[table_ref] = {}
+            for spec in specs:
+                index_name, column, definition = self.parse_index_spec(table_ref, spec)
+
+                if column is not None:
+                    found = by_column.get((table_ref, column))
+                else:
+                    found = by_name.get(index_name)
+
+                if found is None:
+                    status[table_ref][spec] = params.STATUS_MISSING
+                elif found is True:
+                    status[table_ref][spec] = params.STATUS_ACTIVE
+                else:
+                    status[table_ref][spec] = params.STATUS_CREATING
+
+        return status
+
+    def get_table_usage(self, conn, table_ref: str) -> dict:
+        '''Return estimated row count and storage size for a table from the catalog and statistics collector, which
+        is O(1) regardless of table size. Estimates are as current as the last analyze of the table, and are summed
+        over the partitions of partitioned tables.
+        '''
+        counts, rows = self.run_commands(conn, [(self.get_sql("TableUsage"), [table_ref, table_ref])])
 
-    def create_table_from_schema(self, conn, table_ref: str, table_schema: dict, pk_name: str) -> bool:
+        if rows[0] is None:
+            raise exceptions.ResourceNotFoundException(f"Unable to resolve Table {table_ref}")
+        elif isinstance(rows[0], Exception):
+            raise exceptions.DetailedException(f"Unable to resolve Usage for Table {table_ref}", detail=str(rows[0]))
+        else:
+            estimated_rows, size_bytes, live_rows, dead_rows, last_analyzed = rows[0]
+
+            # reltuples is negative (or zero) for tables which have never been vacuumed or analyzed, in which case the
+            # live tuple count from the statistics collector is the better estimate
+            if (estimated_rows is None or estimated_rows <= 0) and live_rows is not None:
+                estimated_rows = live_rows
+
+            usage = {
+                "SizeBytes": size_bytes,
+                "Count": max(estimated_rows, 0) if estimated_rows is not None else 0,
+                "CountIsEstimate": True,
+                "DeadRows": dead_rows
+            }
+
+            if last_analyzed is not None:
+                usage["LastAnalyzed"] = last_analyzed.strftime(params.DEFAULT_DATE_FORMAT)
+
+            return usage
+
+    def _range_bounds(self, start: str, interval: str, count: int) -> list:
+        # consecutive date ranges of the interval, beginning with the interval that contains the start date
+        if interval not in _partition_intervals:
+            raise exceptions.InvalidArgumentsException(
+                f"Partition Interval must be one of {','.join(_partition_intervals)}")
+
+        try:
+            lower = datetime.date.fromisoformat(start[:10]) if start is not None else datetime.date.today()
+        except ValueError:
+            raise exceptions.InvalidArgumentsException(f"Partition Start {start} is not an ISO 8601 Date")
+
+        if interval == 'month':
+            lower = lower.replace(day=1)
+        elif interval == 'year':
+            lower = lower.replace(month=1, day=1)
+
+        bounds = []
+        for i in range(count):
+            if interval == 'day':
+                upper = lower + datetime.timedelta(days=1)
+            elif interval == 'month':
+                upper = (lower + datetime.timedelta(days=32)).replace(day=1)
+            else:
+                upper = lower.replace(year=lower.year + 1)
+
+            bounds.append((lower, upper))
+            lower = upper
+
+        return bounds
+
+    def partition_statements(self, table_ref: str, table_schema: dict, pk_name: str, partitioning: dict) -> tuple:
+        '''Resolve a partitioning spec into the partition clause for the table, its primary key columns, and the
+        statements which create each partition. Hash partitioning is on the primary key. Range partitioning is on a
+        date or date-time string attribute, which must then be part of the primary key, and so should not change once
+        an item is created. Range partitions are created for consecutive intervals from the partition start, with
+        items outside of them held in a default partition
+        '''
+        partition_type = str(partitioning.get(params.PARTITION_TYPE)).lower()
+        count = int(partitioning.get(params.PARTITION_COUNT, params.DEFAULT_PARTITION_COUNT))
+
+        if count < 1:
+            raise exceptions.InvalidArgumentsException(f"{params.PARTITION_COUNT} must be a positive Integer")
+
+        if partition_type == PARTITION_HASH:
+            statements = [
+                f"create table if not exists {table_ref}_p{i} partition of {table_ref} for values with (modulus {count}, remainder {i})"
+                for i in range(count)]
+
+            return f" partition by hash ({pk_name})", [pk_name], statements
+        elif partition_type == PARTITION_RANGE:
+            attribute = partitioning.get(params.PARTITION_ATTRIBUTE)
+            spec = table_schema.get('properties').get(attribute) if attribute is not None else None
+
+            if spec is None or spec.get('type') != 'string' or spec.get('format') not in ['date', 'date-time']:
+                raise exceptions.InvalidArgumentsException(
+                    f"{params.PARTITION_ATTRIBUTE} must be a date or date-time string in the Schema")
+
+            # bounds are ISO 8601 dates, which order correctly against date-time strings stored in ISO 8601 format
+            statements = []
+            for lower, upper in self._range_bounds(start=partitioning.get(params.PARTITION_START),
+                                                   interval=partitioning.get(params.PARTITION_INTERVAL,
+                                                                             params.DEFAULT_PARTITION_INTERVAL),
+                                                   count=count):
+                statements.append(
+                    f"create table if not exists {table_ref}_{lower.strftime('%Y%m%d')} partition of {table_ref} for values from ('{lower.isoformat()}') to ('{upper.isoformat()}')")
+            statements.append(f"create table if not exists {table_ref}_default partition of {table_ref} default")
+
+            return f" partition by range ({attribute})", [pk_name, attribute], statements
+        else:
+            raise exceptions.InvalidArgumentsException(
+                f"{params.PARTITION_TYPE} must be one of {PARTITION_HASH},{PARTITION_RANGE}")
+
+    def get_partitions(self, conn, table_ref: str) -> list:
+        counts, rows = self.run_commands(conn, [(self.get_sql("TablePartitions"), [table_ref])])
+
+        if len(rows) > 0 and isinstance(rows[0], Exception):
+            raise exceptions.DetailedException(f"Unable to resolve Partitions of {table_ref}", detail=str(rows[0]))
+
+        return [r[0] for r in rows if r is not None]
+
+    def create_table_from_schema(self, conn, table_ref: str, table_schema: dict, pk_name: str,
+                                 partitioning: dict = None) -> bool:
         column_spec = []
         prop = table_schema.get('properties')
+        partition_clause = ""
+        key_columns = [pk_name]
+        partitions = []
+
+        if partitioning is not None:
+            partition_clause, key_columns, partitions = self.partition_statements(table_ref, table_schema, pk_name,
+                                                                                  partitioning)
 
         for p in prop.keys():
             column_spec.append(
-                f"{p} {utils.json_to_pg(p_name=p, p_spec=prop.get(p), p_required=table_schema.get('required'), pk_name=pk_name)}")
+                f"{p} {utils.json_to_pg(p_name=p, p_spec=prop.get(p), p_required=table_schema.get('required'), pk_name=pk_name, inline_pk=len(key_columns) == 1)}")
 
         column_spec.extend(self.generate_who_cols())
 
+        if len(key_columns) > 1:
+            column_spec.append(f"primary key ({','.join(key_columns)})")
+
         # synthesize the create table statement
-        statement = f"create table if not exists {table_ref}({','.join(column_spec)})"
+        statement = f"create table if not exists {table_ref}({','.join(column_spec)}){partition_clause}"
 
-        self.run_commands(conn, [statement])
+        if len(partitions) == 0:
+            self.run_commands(conn, [statement])
+        else:
+            # create the table and all of its partitions together
+            cursor = conn.cursor()
+            try:
+                cursor.execute("begin")
+                for s in [statement] + partitions:
+                    self._logger.debug(s)
+                    cursor.execute(s)
+                cursor.execute("commit")
+                self._logger.info(f"Created {len(partitions)} Partitions of {table_ref}")
+            except Exception as e:
+                cursor.execute("rollback")
+                self._logger.error(e)
+                raise exceptions.DetailedException(f"Unable to create Partitioned Table {table_ref}", detail=str(e))
+            finally:
+                cursor.close()
 
         self._logger.info(f"Created new Table {table_ref}")
 
@@ -260,3 +745,81 @@ class RdbmsEngineType:
             raise exceptions.InvalidArgumentsException(f"Unable to look up SQL {name}")
         else:
             return sql
+
+
+class AsyncRdbmsEngineType(RdbmsEngineType):
+    '''Asyncio implementation of the engine using asyncpg. Statement generation is shared with the synchronous engine,
+    but connections are pools and run_commands is a coroutine, so that independent statements can be issued
+    concurrently with asyncio.gather. Statements use the same format style placeholders as the synchronous engine.
+    '''
+
+    async def get_connection(self, cluster_user: str, cluster_address: str, cluster_port: int, database: str,
+                             pwd: str, ssl: bool, pool_size: int = params.DEFAULT_ASYNC_POOL_SIZE):
+        self._logger.debug("Creating new Database Connection Pool")
+
+        if self._dialect == DIALECT_PG:
+            # statements are autocommitted, as with the synchronous engine
+            return await asyncpg.create_pool(user=cluster_user, host=cluster_address, port=int(cluster_port),
+                                             database=database, password=pwd,
+                                             ssl=ssl_lib.create_default_context() if utils.strtobool(
+                                                 ssl) is True else False,
+                                             min_size=1, max_size=pool_size,
+                                             server_settings={'application_name': params.AWS_DATA_API_NAME})
+        else:
+            raise exceptions.UnimplementedFeatureException()
+
+    def _to_native_paramstyle(self, statement: str) -> str:
+        # asyncpg uses numbered placeholders rather than format style
+        parts = statement.split("%s")
+        return parts[0] + "".join([f"${i}{p}" for i, p in enumerate(parts[1:], start=1)])
+
+    async def run_commands(self, conn, commands: list) -> list:
+        '''Coroutine version of RdbmsEngineType.run_commands, with the same command types and output. Commands are run
+        in order on a single connection acquired from the pool.
+        '''
+        counts = []
+        rows = []
+
+        async def _execute(statement: str, args: list = None):
+            if args is not None and len(args) > 0:
+                prepared = await db.prepare(self._to_native_paramstyle(statement))
+                r = await prepared.fetch(*args)
+            else:
+                prepared = await db.prepare(statement)
+                r = await prepared.fetch()
+
+            # status is of the form 'UPDATE 1', 'INSERT 0 1' or 'CREATE TABLE'
+            status = prepared.get_statusmsg().split(' ')
+            counts.append(int(status[-1]) if status[-1].isdigit() else 0)
+
+            if r is not None and len(r) > 0:
+                rows.extend([tuple(x) for x in r])
+            else:
+                rows.append(None)
+
+        async with conn.acquire() as db:
+            for c in commands:
+                if c is not None:
+                    try:
+                        if isinstance(c, tuple):
+                            self._logger.debug(c)
+                            await _execute(c[0], c[1])
+                        elif c.count(';') > 1:
+                            for s in c.split(';'):
+                                if s is not None and s != '':
+                                    self._logger.debug(s)
+                                    await _execute(s.replace("\n", ""))
+                        else:
+                            await _execute(c)
+                    except asyncpg.exceptions.IntegrityConstraintViolationError as ie:
+                        counts.append(0)
+                        rows.append(ie)
+                    except Exception as e:
+                        print(traceback.format_exc())
+                        counts.append(0)
+                        rows.append(e)
+                else:
+                    counts.append(0)
+                    rows.append(None)
+
+        return counts, rows
@@ -2,10 +2,25 @@ import chalicelib.utils as utils
 import chalicelib.parameters as params
 import chalicelib.exceptions as exceptions
 import chalicelib.rdbms_engine_types as engine_types
-from chalicelib.rdbms_engine_types import RdbmsEngineType
+from chalicelib.rdbms_engine_types import RdbmsEngineType, AsyncRdbmsEngineType
 import os
+import asyncio
+import contextlib
+import io
 import json
+import time
 import fastjsonschema
+from decimal import Decimal
+from boto3.dynamodb.types import TypeSerializer
+
+_comparison_operators = {
+    params.OPERATOR_EQ: "=",
+    params.OPERATOR_NE: "<>",
+    params.OPERATOR_GT: ">",
+    params.OPERATOR_GE: ">=",
+    params.OPERATOR_LT: "<",
+    params.OPERATOR_LE: "<="
+}
 
 
 def validate_params(**kwargs):
@@ -31,6 +46,11 @@ def validate_params(**kwargs):
     if kwargs.get(params.RDBMS_DIALECT) not in [engine_types.DIALECT_PG, engine_types.DIALECT_MYSQL]:
         raise exceptions.InvalidArgumentsException(f"Invalid Engine Dialect {kwargs.get(params.RDBMS_DIALECT)}")
 
+    if str(kwargs.get(params.PARTITION_TYPE)).lower() == engine_types.PARTITION_RANGE and kwargs.get(
+            params.PARTITION_ATTRIBUTE) is None:
+        raise exceptions.InvalidArgumentsException(
+            f"Range Partitioning requires a {params.PARTITION_ATTRIBUTE} from the Resource Schema")
+
 
 class DataAPIStorageHandler:
     _region = None
@@ -56,15 +76,31 @@ class DataAPIStorageHandler:
     _gremlin_endpoint = None
     _deployed_account = None
     _cluster_address = None
+    _reader_address = None
     _cluster_port = None
     _cluster_user = None
     _cluster_db = None
     _db_conn = None
+    _read_conn = None
     _ssl = False
+    _synchronous_commit = True
+    _partitioning = None
+    _key_columns = None
+    _text_search = False
+    _text_search_config = None
+    _change_feed_name = None
+    _char_flag_columns = {}
+    _transaction_depth = 0
     _sql_helper = None
     _engine_type = None
+    _async_engine = None
+    _async_pool = None
+    _async_read_pool = None
+    _loop = None
     _resource_validator = None
+    _row_converters = None
     _metadata_validator = None
+    _exact_usage = None
 
     def _verify_catalog(self, table_ref: str, **kwargs) -> None:
         # setup a glue connection and crawler for this database and table
@@ -89,10 +125,9 @@ class DataAPIStorageHandler:
         if type(input) == str:
             set_val = f"'{input}'"
         elif type(input) == bool:
-            if input is True:
-                set_val = 1
-            else:
-                set_val = 0
+            set_val = 'TRUE' if input is True else 'FALSE'
+        elif isinstance(input, (dict, list)):
+            set_val = "'" + json.dumps(input).replace("'", "''") + "'::jsonb"
         else:
             set_val = input
 
@@ -122,6 +157,7 @@ class DataAPIStorageHandler:
     def _create_update_statement(self, table_ref: str, pk_name: str, input: dict, item_id: str,
                                  caller_identity: str, version_increment: bool = True,
                                  check_delete: bool = True) -> str:
+        self._verify_boolean_columns(table_ref, input)
         updates = ",".join(self._json_to_column_list(input, caller_identity, version_increment))
         statement = f"update {table_ref} set {updates} where {pk_name} = '{item_id}'"
 
@@ -152,6 +188,7 @@ class DataAPIStorageHandler:
 
     def _create_insert_statement(self, table_ref: str, pk_name: str, pk_value: str, input: dict,
                                  caller_identity: str) -> str:
+        self._verify_boolean_columns(table_ref, input)
         insert = self._synthesize_insert(pk_name=pk_name, pk_value=pk_value, input=input,
                                          caller_identity=caller_identity)
         columns = ",".join(insert[0])
@@ -200,14 +237,45 @@ class DataAPIStorageHandler:
         self._catalog_database = catalog_database
         self._delete_mode = delete_mode
 
+        # index configuration may be supplied as a list or as a comma separated string
+        self._table_indexes = table_indexes.split(',') if isinstance(table_indexes, str) else table_indexes
+        self._meta_indexes = metadata_indexes.split(',') if isinstance(metadata_indexes, str) else metadata_indexes
+
+        # result set converters, compiled once per column spec and type map
+        self._row_converters = {}
+
+        # cache of exact row counts, which are a full scan
+        self._exact_usage = {}
+
         # resolve connection details
         self._cluster_address = kwargs.get(params.CLUSTER_ADDRESS)
+        self._reader_address = kwargs.get(params.READER_CLUSTER_ADDRESS)
         self._cluster_port = kwargs.get(params.CLUSTER_PORT)
         self._cluster_user = kwargs.get(params.DB_USERNAME)
         self._cluster_db = kwargs.get(params.DB_NAME)
         self._cluster_pstore = kwargs.get(params.DB_USERNAME_PSTORE_ARN)
         self._ssl = kwargs.get(params.DB_USE_SSL)
 
+        # namespaces which can tolerate the loss of the most recent writes on a crash may commit without waiting for
+        # the WAL flush
+        self._synchronous_commit = utils.strtobool(kwargs.get(params.RDBMS_SYNCHRONOUS_COMMIT, True))
+
+        # full text search is served from a generated search vector column over the text attributes of each table
+        self._text_search = utils.strtobool(kwargs.get(params.RDBMS_TEXT_SEARCH, False))
+        self._text_search_config = kwargs.get(params.TEXT_SEARCH_CONFIGURATION,
+                                              params.DEFAULT_TEXT_SEARCH_CONFIGURATION)
+
+        # large namespaces may have their tables partitioned when they are created. range partitioned tables include the
+        # partition attribute in their primary key
+        self._key_columns = [self._pk_name]
+        if kwargs.get(params.PARTITION_TYPE) is not None:
+            self._partitioning = {k: kwargs.get(k) for k in
+                                  [params.PARTITION_TYPE, params.PARTITION_COUNT, params.PARTITION_ATTRIBUTE,
+                                   params.PARTITION_INTERVAL, params.PARTITION_START] if kwargs.get(k) is not None}
+
+            if str(self._partitioning.get(params.PARTITION_TYPE)).lower() == engine_types.PARTITION_RANGE:
+                self._key_columns.append(self._partitioning.get(params.PARTITION_ATTRIBUTE))
+
         # pick up schemas to push table structure
         self._resource_schema = kwargs.get(params.CONTROL_TYPE_RESOURCE_SCHEMA)
         self._metadata_schema = kwargs.get(params.CONTROL_TYPE_METADATA_SCHEMA)
@@ -226,39 +294,157 @@ class DataAPIStorageHandler:
             raise exceptions.InvalidArgumentsException(
                 "Unable to connect to Target Cluster Database without SSM Parameter Store Password ARN")
 
-        # extract the password from ssm
-        _pwd = utils.get_encrypted_parameter(parameter_name=self._cluster_pstore,
-                                             region=self._region)
-
         # connect to the database
-        self._db_conn = self._engine_type.get_connection(cluster_user=self._cluster_user,
-                                                         cluster_address=self._cluster_address,
-                                                         cluster_port=self._cluster_port,
-                                                         database=self._cluster_db,
-                                                         pwd=_pwd, ssl=self._ssl)
+        self._db_conn = self._connect()
+
+        if self._synchronous_commit is False:
+            self._engine_type.run_commands(self._db_conn, ["set synchronous_commit = off"])
 
         self._logger.info(f"Connected to {self._cluster_address}:{self._cluster_port} as {self._cluster_user}")
 
-        # verify the resource table, indexes, and catalog registry exists
+        # read only operations are routed to the reader endpoint when one is configured
+        if self._reader_address is not None and self._reader_address != self._cluster_address:
+            self._read_conn = self._connect(cluster_address=self._reader_address)
+            self._logger.info(f"Connected to Reader {self._reader_address}:{self._cluster_port}")
+        else:
+            self._read_conn = self._db_conn
+
+        # the asyncio engine is used alongside the synchronous connections to issue independent statements concurrently
+        if utils.strtobool(kwargs.get(params.RDBMS_ASYNC_ENGINE, False)) is True:
+            self._async_engine = AsyncRdbmsEngineType(kwargs.get(params.RDBMS_DIALECT))
+            self._loop = asyncio.new_event_loop()
+            self._async_pool = self._run_async(self._connect_async())[0]
+
+            if self._read_conn is not self._db_conn:
+                self._async_read_pool = self._run_async(self._connect_async(cluster_address=self._reader_address))[0]
+            else:
+                self._async_read_pool = self._async_pool
+
+        # verify the resource table and catalog registry exists. indexes are built outside of the request path with
+        # build_indexes
         self._engine_type.verify_table(conn=self._db_conn, table_ref=self._resource_table_name,
-                                       table_schema=self._resource_schema, pk_name=self._pk_name)
-        self._engine_type.verify_indexes(self._db_conn, self._resource_table_name, table_indexes)
+                                       table_schema=self._resource_schema, pk_name=self._pk_name,
+                                       partitioning=self._partitioning)
         self._verify_catalog(self._resource_table_name, **kwargs)
 
-        # verify the metadata table, indexes, and catalog registry exists
+        # verify the metadata table and catalog registry exists
         if self._metadata_validator is not None:
             self._logger.debug(f"Metadata Table {self._metadata_table_name}")
+            # metadata is only partitioned by hash, as the range partition attribute is part of the resource
             self._engine_type.verify_table(conn=self._db_conn, table_ref=self._metadata_table_name,
-                                           table_schema=self._metadata_schema, pk_name=self._pk_name)
-            self._engine_type.verify_indexes(self._db_conn, self._metadata_table_name, metadata_indexes)
+                                           table_schema=self._metadata_schema, pk_name=self._pk_name,
+                                           partitioning=self._partitioning if len(self._key_columns) == 1 else None)
+
+        # tables created by earlier versions store boolean attributes as char(1) flags until migrate_boolean_columns
+        # converts them, and booleans can't be written to them until then
+        self._char_flag_columns = self._engine_type.get_char_flag_columns(conn=self._db_conn,
+                                                                          table_columns=self._boolean_columns())
+
+        # changes to the resource and metadata are recorded in an outbox table, which is consumed by process_changes
+        if utils.strtobool(kwargs.get(params.RDBMS_CHANGE_FEED, False)) is True:
+            self._change_feed_name = f"{self._resource_table_name}_changes"
+            tables = [self._resource_table_name]
+            if self._metadata_validator is not None:
+                tables.append(self._metadata_table_name)
+
+            self._engine_type.verify_change_feed(conn=self._db_conn, feed_ref=self._change_feed_name,
+                                                 table_refs=tables, pk_name=self._pk_name)
+
+    def _connect(self, cluster_address: str = None):
+        connect_args = {
+            "cluster_user": self._cluster_user,
+            "cluster_address": self._cluster_address if cluster_address is None else cluster_address,
+            "cluster_port": self._cluster_port,
+            "database": self._cluster_db,
+            "ssl": self._ssl
+        }
+
+        # extract the password from ssm, which is cached for the process
+        _pwd = utils.get_encrypted_parameter(parameter_name=self._cluster_pstore,
+                                             region=self._region)
+
+        try:
+            return self._engine_type.get_connection(pwd=_pwd, **connect_args)
+        except Exception as e:
+            if self._engine_type.is_authentication_failure(e):
+                # the password may have been rotated since it was cached
+                self._logger.info("Authentication failed with cached credentials. Refreshing from SSM")
+                _pwd = utils.get_encrypted_parameter(parameter_name=self._cluster_pstore,
+                                                     region=self._region, refresh=True)
+                return self._engine_type.get_connection(pwd=_pwd, **connect_args)
+            else:
+                raise e
+
+    async def _connect_async(self, cluster_address: str = None):
+        connect_args = {
+            "cluster_user": self._cluster_user,
+            "cluster_address": self._cluster_address if cluster_address is None else cluster_address,
+            "cluster_port": self._cluster_port,
+            "database": self._cluster_db,
+            "ssl": self._ssl
+        }
+
+        _pwd = utils.get_encrypted_parameter(parameter_name=self._cluster_pstore,
+                                             region=self._region)
+
+        try:
+            return await self._async_engine.get_connection(pwd=_pwd, **connect_args)
+        except Exception as e:
+            if self._async_engine.is_authentication_failure(e):
+                self._logger.info("Authentication failed with cached credentials. Refreshing from SSM")
+                _pwd = utils.get_encrypted_parameter(parameter_name=self._cluster_pstore,
+                                                     region=self._region, refresh=True)
+                return await self._async_engine.get_connection(pwd=_pwd, **connect_args)
+            else:
+                raise e
+
+    def _run_async(self, *coroutines) -> list:
+        # run the coroutines concurrently on the handler's event loop, returning their results in order
+        async def _gather():
+            return await asyncio.gather(*coroutines)
+
+        return self._loop.run_until_complete(_gather())
+
+    def _reader(self, consistent_read: bool = False):
+        # pin the read to the writer when the caller must see their own writes, as the reader may lag
+        if utils.strtobool(consistent_read) is True or self._read_conn is None:
+            return self._db_conn
+        else:
+            return self._read_conn
+
+    @contextlib.contextmanager
+    def transaction(self):
+        '''Context manager which runs all statements issued on the writer connection as a single transaction, which is
+        committed on exit or rolled back if an error is raised. Nested transactions join the outermost transaction
+        '''
+        if self._transaction_depth > 0:
+            self._transaction_depth += 1
+            try:
+                yield
+            finally:
+                self._transaction_depth -= 1
+        else:
+            cursor = self._db_conn.cursor()
+            cursor.execute("begin")
+            self._transaction_depth = 1
+
+            try:
+                yield
+                cursor.execute("commit")
+            except Exception as e:
+                cursor.execute("rollback")
+                raise e
+            finally:
+                self._transaction_depth = 0
+                cursor.close()
 
     def run_commands(self, commands: list):
         return self._engine_type.run_commands(conn=self._db_conn, commands=commands)
 
-    def check(self, id: str) -> bool:
+    def check(self, id: str, consistent_read: bool = False) -> bool:
         statement = f"select count(9) from {self._resource_table_name} where {self._pk_name} = '{id}' and {self._engine_type.get_who(params.DELETED)} = FALSE"
 
-        counts, rows = self._engine_type.run_commands(self._db_conn, [statement])
+        counts, rows = self._engine_type.run_commands(self._reader(consistent_read), [statement])
 
         record = rows[0]
         if record is not None and record != () and record[0] != 0:
@@ -271,10 +457,170 @@ class DataAPIStorageHandler:
 
         pass
 
-    def get_usage(self, table_name: str):
-        pass
+    def _requested_indexes(self) -> dict:
+        requested = {}
+        if self._table_indexes is not None and len(self._table_indexes) > 0:
+            requested[self._resource_table_name] = list(self._table_indexes)
+
+        if self._metadata_validator is not None and self._meta_indexes is not None and len(self._meta_indexes) > 0:
+            requested[self._metadata_table_name] = list(self._meta_indexes)
+
+        # searchable tables have a GIN index on their search vector
+        for table_ref in self._search_columns().keys():
+            requested.setdefault(table_ref, []).append(
+                f"{engine_types.SEARCH_VECTOR_COLUMN}:{engine_types.INDEX_TYPE_GIN}")
+
+        return requested
+
+    def _search_columns(self) -> dict:
+        # the text attributes of each table, in schema order, which are string properties other than dates
+        tables = {}
+        if self._text_search is True:
+            for table_ref, schema in [(self._resource_table_name, self._resource_schema),
+                                      (self._metadata_table_name, self._metadata_schema)]:
+                if schema is not None:
+                    columns = [k for k, v in schema.get("properties").items() if
+                               k != self._pk_name and v.get("type") == "string" and
+                               v.get("format") not in ["date", "date-time"]]
+
+                    if len(columns) > 0:
+                        tables[table_ref] = columns
+
+        return tables
+
+    def _boolean_columns(self) -> dict:
+        # the boolean attributes of each table
+        tables = {}
+        for table_ref, schema in [(self._resource_table_name, self._resource_schema),
+                                  (self._metadata_table_name, self._metadata_schema)]:
+            if schema is not None:
+                columns = [k for k, v in schema.get("properties").items() if v.get("type") == "boolean"]
+
+                if len(columns) > 0:
+                    tables[table_ref] = columns
+
+        return tables
+
+    def get_index_status(self) -> dict:
+        return self._engine_type.get_index_status(conn=self._db_conn, table_indexes=self._requested_indexes())
+
+    def _verify_boolean_columns(self, table_ref: str, attributes) -> None:
+        # boolean values can't be written to the char(1) flag columns of tables created by earlier versions
+        flags = [c for c in self._char_flag_columns.get(table_ref, []) if c in attributes]
+
+        if len(flags) > 0:
+            raise exceptions.DetailedException(
+                f"Unable to write Boolean Attributes {','.join(flags)}, which are stored as char(1) flags",
+                detail="Reprovision the Namespace to convert them to native booleans")
+
+    def migrate_boolean_columns(self) -> dict:
+        '''Convert the boolean attributes of tables created by earlier versions, which are stored as char(1) flags, to
+        native boolean columns. This rewrites the tables, and so should be run from the provisioning function rather
+        than on the request path
+        '''
+        migrated = self._engine_type.migrate_boolean_columns(conn=self._db_conn, table_columns=self._boolean_columns())
+        self._char_flag_columns = {}
+
+        return migrated
 
-    def get_resource(self, id: str, only_attributes: list = None, not_attributes: list = None):
+    def build_indexes(self) -> dict:
+        '''Create any requested indexes which are not yet valid, without blocking writes to the tables. This can take a
+        long time on large tables, and so should be run from the provisioning function rather than on the request path
+        '''
+        # the search vector column must exist before it can be indexed
+        for table_ref, columns in self._search_columns().items():
+            try:
+                self._engine_type.verify_search_column(conn=self._db_conn, table_ref=table_ref, columns=columns,
+                                                       config=self._text_search_config)
+            except exceptions.DetailedException as e:
+                # the search index will then fail to build and be reported as failed
+                self._logger.error(e)
+
+        status = self.get_index_status()
+
+        for table_ref, columns in status.items():
+            for c, s in columns.items():
+                if s != params.STATUS_ACTIVE:
+                    try:
+                        self._engine_type.create_index(conn=self._db_conn, table_ref=table_ref, index_spec=c,
+                                                       concurrently=True)
+                        columns[c] = params.STATUS_ACTIVE
+                    except exceptions.DetailedException as e:
+                        self._logger.error(e)
+                        columns[c] = params.STATUS_FAILED
+
+        return status
+
+    def _resolve_table_ref(self, table_name: str) -> str:
+        # the API layer addresses metadata using the DynamoDB naming convention
+        if table_name is None or table_name.lower() == self._resource_table_name:
+            return self._resource_table_name
+        elif table_name.lower() in [utils.get_metaname(self._resource_table_name).lower(),
+                                    self._metadata_table_name]:
+            return self._metadata_table_name
+        else:
+            raise exceptions.ResourceNotFoundException("Invalid Table Name")
+
+    def _count_exact(self, table_ref: str):
+        # the full scan is served by the reader where there is one, and is bounded by a statement timeout so that it
+        # completes within the request
+        counts, rows = self._engine_type.run_commands(self._reader(False), [
+            f"set statement_timeout = {params.DEFAULT_EXACT_USAGE_TIMEOUT_MILLIS}",
+            f"select count(*) from {table_ref}",
+            "reset statement_timeout"
+        ])
+
+        if rows[1] is not None and not isinstance(rows[1], Exception):
+            self._exact_usage[table_ref] = {
+                "ExactCount": rows[1][0],
+                "ExactCountDate": utils.get_date_now(),
+                "_counted_at": utils.get_time_now()
+            }
+            return self._exact_usage[table_ref]
+        else:
+            self._logger.error(f"Unable to count {table_ref}: {rows[1]}")
+            return None
+
+    def get_usage(self, table_name: str, exact: bool = False):
+        table_ref = self._resolve_table_ref(table_name)
+
+        if table_ref == self._metadata_table_name and self._metadata_validator is None:
+            return None
+
+        usage = self._engine_type.get_table_usage(conn=self._db_conn, table_ref=table_ref)
+
+        if utils.strtobool(exact) is True:
+            # exact counts are a full scan, so they are served from cache for a time. counts which time out fall back to
+            # the last count taken, if there is one
+            cached = self._exact_usage.get(table_ref)
+            fresh = cached is not None and \
+                    utils.get_time_now() - cached.get("_counted_at") < params.DEFAULT_EXACT_USAGE_CACHE_SECONDS
+
+            if fresh is False:
+                counted = self._count_exact(table_ref)
+                usage["ExactCountStatus"] = "COMPLETE" if counted is not None else params.STATUS_FAILED
+                cached = counted if counted is not None else cached
+            else:
+                usage["ExactCountStatus"] = "COMPLETE"
+
+            if cached is not None:
+                usage["ExactCount"] = cached.get("ExactCount")
+                usage["ExactCountDate"] = cached.get("ExactCountDate")
+
+        return usage
+
+    def _get_row_converter(self, column_spec: list, type_map: dict):
+        key = tuple((c, type_map.get(c)) for c in column_spec)
+        converter = self._row_converters.get(key)
+
+        if converter is None:
+            converter = utils.compile_row_converter(column_spec=column_spec, type_map=type_map)
+            self._row_converters[key] = converter
+
+        return converter
+
+    def get_resource(self, id: str, only_attributes: list = None, not_attributes: list = None,
+                     consistent_read: bool = False):
         schema = self._resource_schema.get("properties")
 
         # only add the attributes needed, or the schema keys
@@ -289,13 +635,14 @@ class DataAPIStorageHandler:
                 del columns[n]
 
         statement = f"select {','.join(columns)} from {self._resource_table_name} where {self._pk_name} = '{id}' and {self._engine_type.get_who(params.DELETED)} = FALSE"
-        counts, records = self._engine_type.run_commands(self._db_conn, [statement])
+        counts, records = self._engine_type.run_commands(self._reader(consistent_read), [statement])
 
-        if records is not None and len(records) == 1:
-            return utils.pivot_resultset_into_json(rows=records, column_spec=columns, type_map=schema)
+        if records is not None and len(records) == 1 and records[0] is not None:
+            type_map = {k: v.get("type") for k, v in schema.items()}
+            return self._get_row_converter(column_spec=columns, type_map=type_map)(records)[0]
         elif records is not None and len(records) > 1:
             raise exceptions.DetailedException("O(1) lookup of Resource returned multiple rows")
-        elif records is None:
+        elif records is None or records[0] is None:
             raise exceptions.ResourceNotFoundException()
 
     def _generate_column_list(self, base_columns: list, prefix: str = None) -> dict:
@@ -320,12 +667,12 @@ class DataAPIStorageHandler:
         return out
 
     def get(self, id: str, suppress_meta_fetch: bool = False, only_attributes: list = None,
-            not_attributes: list = None):
-        output = {params.RESOURCE: self.get_resource(id, only_attributes, not_attributes)}
+            not_attributes: list = None, consistent_read: bool = False):
+        output = {params.RESOURCE: self.get_resource(id, only_attributes, not_attributes, consistent_read)}
 
         if suppress_meta_fetch is False:
             try:
-                meta = self.get_metadata(id=id)
+                meta = self.get_metadata(id=id, consistent_read=consistent_read)
 
                 if meta is not None:
                     output[params.METADATA] = meta
@@ -335,14 +682,91 @@ class DataAPIStorageHandler:
 
         return output
 
-    def get_metadata(self, id: str):
+    def batch_get(self, ids: list, suppress_meta_fetch: bool = False, consistent_read: bool = False) -> dict:
+        '''Fetch many Items with a single statement, returning them in the order of the requested ids. Ids which are
+        not found, or are deleted, are returned as NotFound
+
+        :param ids: list of primary key values
+        :param suppress_meta_fetch: don't join to the metadata table
+        :param consistent_read: read from the writer rather than the reader endpoint
+        :return: dict of Items and NotFound ids
+        '''
+        if ids is None or len(ids) == 0:
+            return {params.ITEMS: [], params.NOT_FOUND: []}
+
+        # remove duplicate ids, preserving the order they were supplied in
+        request_ids = list(dict.fromkeys([str(x) for x in ids]))
+
+        resource_schema = self._resource_schema.get("properties")
+        resource_columns = list(resource_schema.keys())
+        if self._pk_name not in resource_columns:
+            resource_columns.insert(0, self._pk_name)
+        resource_types = {k: v.get("type") for k, v in resource_schema.items()}
+
+        select_columns = [f"a.{c}" for c in resource_columns]
+        from_clause = f"{self._resource_table_name} a"
+
+        with_meta = suppress_meta_fetch is False and self._metadata_schema is not None
+        if with_meta:
+            meta_schema = self._metadata_schema.get("properties")
+            meta_types = self._engine_type.get_who_type_map().copy()
+            meta_types.update({k: v.get("type") for k, v in meta_schema.items()})
+            meta_cols = self._generate_column_list(base_columns=list(meta_schema.keys()), prefix='b')
+            meta_columns = list(meta_cols.keys())
+
+            # the metadata primary key tells us if there was a metadata row to join to
+            select_columns.append(f"b.{self._pk_name}")
+            select_columns.extend([f"b.{self._engine_type.get_who(c)}" for c in meta_columns])
+            from_clause = f"{from_clause} left join {self._metadata_table_name} b on b.{self._pk_name} = a.{self._pk_name}"
+
+        statement = f"select {','.join(select_columns)} from {from_clause} where a.{self._pk_name} = ANY(%s) and a.{self._engine_type.get_who(params.DELETED)} = FALSE"
+        chunk_size = params.DEFAULT_BATCH_GET_CHUNK_SIZE
+        if self._async_engine is not None and len(request_ids) > chunk_size:
+            # fetch chunks of the id list concurrently over the connection pool
+            pool = self._async_pool if utils.strtobool(consistent_read) is True else self._async_read_pool
+            results = self._run_async(
+                *[self._async_engine.run_commands(pool, [(statement, [request_ids[i:i + chunk_size]])]) for i in
+                  range(0, len(request_ids), chunk_size)])
+            rows = [r for counts, chunk_rows in results for r in chunk_rows]
+        else:
+            counts, rows = self._engine_type.run_commands(self._reader(consistent_read), [(statement, [request_ids])])
+
+        errors = [r for r in rows if isinstance(r, Exception)]
+        if len(errors) > 0:
+            raise exceptions.DetailedException("Unable to perform Batch Get", detail=str(errors[0]))
+
+        # pivot each row into its item, keyed by id so we can return them in request order
+        pk_index = resource_columns.index(self._pk_name)
+        meta_start = len(resource_columns)
+        rows = [r for r in rows if r is not None]
+
+        resources = self._get_row_converter(column_spec=resource_columns, type_map=resource_types)(
+            [r[:meta_start] for r in rows])
+        if with_meta:
+            to_metadata = self._get_row_converter(column_spec=meta_columns, type_map=meta_types)
+
+        found = {}
+        for r, resource in zip(rows, resources):
+            item = {params.RESOURCE: resource}
+
+            if with_meta and r[meta_start] is not None:
+                item[params.METADATA] = to_metadata([r[meta_start + 1:]])[0]
+
+            found[str(r[pk_index])] = item
+
+        return {
+            params.ITEMS: [found.get(x) for x in request_ids if x in found],
+            params.NOT_FOUND: [x for x in request_ids if x not in found]
+        }
+
+    def get_metadata(self, id: str, consistent_read: bool = False):
         # validate that the object isn't deleted
-        self.check(id)
+        self.check(id, consistent_read=consistent_read)
 
         schema = self._metadata_schema.get("properties")
 
         # create the type map for what will be returned
-        type_map = self._engine_type.get_who_type_map()
+        type_map = self._engine_type.get_who_type_map().copy()
 
         for k, v in schema.items():
             type_map[k] = v.get("type")
@@ -351,10 +775,10 @@ class DataAPIStorageHandler:
 
         # implement delete check by joining to the resource table on the primary key
         statement = f"select {','.join(cols.values())} from {self._metadata_table_name} a, {self._resource_table_name} b where a.{self._pk_name} = '{id}' and a.{self._pk_name} = b.{self._pk_name} and b.{self._engine_type.get_who(params.DELETED)} = FALSE"
-        counts, records = self._engine_type.run_commands(self._db_conn, [statement])
+        counts, records = self._engine_type.run_commands(self._reader(consistent_read), [statement])
 
         if records is not None and len(records) == 1 and records[0] is not None:
-            return utils.pivot_resultset_into_json(rows=records, column_spec=list(cols.keys()), type_map=type_map)
+            return self._get_row_converter(column_spec=list(cols.keys()), type_map=type_map)(records)[0]
         elif records is not None and len(records) > 1:
             raise exceptions.DetailedException("O(1) lookup of Metadata returned multiple rows")
         elif records is None or records[0] is None:
@@ -372,70 +796,53 @@ class DataAPIStorageHandler:
 
         return True if counts is not None and counts[0] > 0 else False
 
-    def _delete_record(self, table_name: str, item_id: str):
-        delete_stmt = f"delete from {table_name} where {self._pk_name} = '{item_id}'"
-
-        counts, records = self._engine_type.run_commands(self._db_conn, [delete_stmt])
-
-        return True if counts is not None and counts[0] > 0 else False
-
-    def _delete_metadata(self, id: str):
-        return self._delete_record(table_name=self._metadata_table_name, item_id=id)
+    def _delete_statement(self, table_name: str, item_id: str) -> str:
+        return f"delete from {table_name} where {self._pk_name} = '{item_id}'"
 
     def delete(self, id: str, caller_identity: str, **kwargs):
-        response = {}
+        # statements for each part of the item are keyed by the response section, and then run as a single batch
+        statements = {}
 
         if params.METADATA in kwargs:
             if len(kwargs.get(params.METADATA)) == 0:
                 # hard delete the metadata record - there is no soft delete
-                response[params.METADATA] = {
-                    params.DATA_MODIFIED: self._delete_metadata(id)
-                }
+                statements[params.METADATA] = self._delete_statement(table_name=self._metadata_table_name, item_id=id)
             else:
                 # just delete the specified attributes
-                response[params.METADATA] = {
-                    params.DATA_MODIFIED: self.remove_metadata_attributes(id=id,
-                                                                          metadata_attributes=kwargs.get(
-                                                                              params.METADATA),
-                                                                          caller_identity=caller_identity)
-                }
+                statements[params.METADATA] = self._remove_attributes_statement(
+                    item_id=id, attribute_list=kwargs.get(params.METADATA), table_name=self._metadata_table_name,
+                    caller_identity=caller_identity)
 
         if kwargs is None or kwargs == {} or params.RESOURCE in kwargs:
             if params.RESOURCE not in kwargs or len(kwargs.get(params.RESOURCE)) == 0:
                 if self._delete_mode == params.DELETE_MODE_SOFT:
-                    # perform a soft delete and reflect that only the resource will have been deleted in the response§
-                    update = self._create_update_statement(table_ref=self._resource_table_name, pk_name=self._pk_name,
-                                                           input={self._engine_type.get_who(params.DELETED): True},
-                                                           item_id=id, caller_identity=caller_identity)
-                    counts, records = self._engine_type.run_commands(self._db_conn, [update])
-
-                    if counts is not None and counts[0] > 0:
-                        response[params.RESOURCE] = {
-                            params.DATA_MODIFIED: True
-                        }
-                    else:
-                        response[params.RESOURCE] = {
-                            params.DATA_MODIFIED: False
-                        }
+                    # perform a soft delete and reflect that only the resource will have been deleted in the response
+                    statements[params.RESOURCE] = self._create_update_statement(
+                        table_ref=self._resource_table_name, pk_name=self._pk_name,
+                        input={self._engine_type.get_who(params.DELETED): True}, item_id=id,
+                        caller_identity=caller_identity)
                 elif self._delete_mode == params.DELETE_MODE_HARD:
-                    # remove the metadata
-                    response[params.METADATA] = {
-                        params.DATA_MODIFIED: self._delete_metadata(id)
-                    }
-
-                    # delete the database record
-                    response[params.RESOURCE] = {
-                        params.DATA_MODIFIED: self._delete_record(table_name=self._resource_table_name, item_id=id)
-                    }
+                    # remove the metadata and the database record
+                    statements[params.METADATA] = self._delete_statement(table_name=self._metadata_table_name,
+                                                                         item_id=id)
+                    statements[params.RESOURCE] = self._delete_statement(table_name=self._resource_table_name,
+                                                                         item_id=id)
                 else:
                     # tombstone deletions not supported in rdbms due to nullability constraints
                     raise exceptions.UnimplementedFeatureException("Cannot Tombstone Delete in RDBMS")
             else:
                 # remove resource attributes only
-                response[params.RESOURCE] = {
-                    params.DATA_MODIFIED: self.remove_resource_attributes(id=id, resource_attributes=kwargs.get(
-                        params.RESOURCE), caller_identity=caller_identity)
-                }
+                statements[params.RESOURCE] = self._remove_attributes_statement(
+                    item_id=id, attribute_list=kwargs.get(params.RESOURCE), table_name=self._resource_table_name,
+                    caller_identity=caller_identity)
+
+        counts = self._engine_type.run_batch(self._db_conn, list(statements.values()))
+
+        response = {}
+        for section, count in zip(statements.keys(), counts):
+            response[section] = {
+                params.DATA_MODIFIED: True if count is not None and count > 0 else False
+            }
 
         return response
 
@@ -448,14 +855,14 @@ class DataAPIStorageHandler:
                                                item_id=id, caller_identity=caller_identity)
         counts, records = self._engine_type.run_commands(self._db_conn, [update])
 
-        if counts[0] == 0:
+        if len(counts) == 0 or counts[0] == 0:
             # update statement didn't work, so insert the value
             insert = self._create_insert_statement(table_ref=table_ref, pk_name=pk_name,
                                                    pk_value=id, input=kwargs, caller_identity=caller_identity)
 
             counts, records = self._engine_type.run_commands(self._db_conn, [insert])
 
-            if counts[0] == 1:
+            if len(counts) > 0 and counts[0] == 1:
                 return {
                     params.DATA_MODIFIED: True
                 }
@@ -477,6 +884,8 @@ class DataAPIStorageHandler:
         '''
         response = {}
 
+        # resource and metadata are merged on the writer connection, so that they are committed in the caller's
+        # transaction rather than concurrently on pooled connections
         if params.METADATA in kwargs:
             metadata = kwargs.get(params.METADATA)
 
@@ -487,8 +896,8 @@ class DataAPIStorageHandler:
                     raise exceptions.SchemaViolationException(e)
 
             response[params.METADATA] = self._execute_merge(table_ref=self._metadata_table_name, id=id,
-                                                            pk_name=self._pk_name,
-                                                            caller_identity=caller_identity, **metadata)
+                                                            pk_name=self._pk_name, caller_identity=caller_identity,
+                                                            **metadata)
 
         if params.RESOURCE in kwargs:
             resource = kwargs.get(params.RESOURCE)
@@ -496,22 +905,158 @@ class DataAPIStorageHandler:
                 self._resource_validator(resource)
 
             response[params.RESOURCE] = self._execute_merge(table_ref=self._resource_table_name, id=id,
-                                                            pk_name=self._pk_name,
-                                                            caller_identity=caller_identity, **resource)
+                                                            pk_name=self._pk_name, caller_identity=caller_identity,
+                                                            **resource)
 
         return response
 
+    def _resolve_find_column(self, attribute: str, schema_properties: dict) -> str:
+        # only allow filters on columns that are known to the schema or are exposed who columns, as column names can't
+        # be bound as parameters
+        if attribute in schema_properties or attribute == self._pk_name:
+            return attribute
+        elif attribute in self._engine_type.get_who_column_keys() and attribute != params.DELETED:
+            return self._engine_type.get_who(attribute)
+        else:
+            raise exceptions.InvalidArgumentsException(f"Unable to Find on unknown Attribute {attribute}")
+
+    def _document_cast(self, operand) -> str:
+        # nested values are extracted as text, so cast them to compare against non-string operands
+        value = operand[0] if isinstance(operand, list) and len(operand) > 0 else operand
+
+        if type(value) == bool:
+            return "::boolean"
+        elif type(value) in [int, float]:
+            return "::numeric"
+        else:
+            return ""
+
+    def _create_find_predicates(self, filters: dict, schema_properties: dict, prefix: str) -> tuple:
+        '''Generate a list of parameterised where clauses and their arguments from a find request. Filter values may
+        be a scalar for equality, or a single operator document such as {"GT": 5}, {"BETWEEN": [1, 10]},
+        {"IN": ["a", "b"]}, {"BEGINS_WITH": "abc"}, or {"CONTAINS": {"a": 1}} for document attributes. Attributes of
+        object and array typed properties may be addressed by a dotted path, such as "address.city"
+
+        :param filters:
+        :return: tuple of clause list and argument list
+        '''
+        clauses = []
+        args = []
+
+        for attribute, condition in filters.items():
+            # split nested document paths from the attribute which holds the document
+            if attribute in schema_properties or '.' not in attribute:
+                root, path = attribute, []
+            else:
+                tokens = attribute.split('.')
+                root, path = tokens[0], tokens[1:]
+
+            column = f"{prefix}.{self._resolve_find_column(root, schema_properties)}"
+            is_document = schema_properties.get(root, {}).get("type") in ['object', 'array']
+
+            if len(path) > 0 and is_document is False:
+                raise exceptions.InvalidArgumentsException(f"{root} is not a Document Attribute")
+
+            if isinstance(condition, dict):
+                if len(condition) != 1:
+                    raise exceptions.InvalidArgumentsException(
+                        f"Filter for {attribute} must contain exactly one operator")
+
+                operator, operand = list(condition.items())[0]
+                operator = operator.upper()
+            else:
+                operator = params.OPERATOR_EQ
+                operand = condition
+
+            if operator == params.OPERATOR_CONTAINS:
+                if is_document is False:
+                    raise exceptions.InvalidArgumentsException(
+                        f"{params.OPERATOR_CONTAINS} filter requires a Document Attribute")
+
+                clauses.append(f"{self._engine_type.json_path_expression(column, path, as_text=False)} @> %s::jsonb")
+                args.append(json.dumps(operand))
+                continue
+            elif len(path) > 0:
+                column = f"({self._engine_type.json_path_expression(column, path, as_text=True)}){self._document_cast(operand)}"
+            elif is_document is True and isinstance(operand, (dict, list)) and operator in [params.OPERATOR_EQ,
+                                                                                            params.OPERATOR_NE]:
+                # whole document comparison
+                clauses.append(f"{column} {_comparison_operators.get(operator)} %s::jsonb")
+                args.append(json.dumps(operand))
+                continue
+
+            if operator in _comparison_operators:
+                if operand is None and operator in [params.OPERATOR_EQ, params.OPERATOR_NE]:
+                    clauses.append(f"{column} is {'' if operator == params.OPERATOR_EQ else 'not '}null")
+                else:
+                    clauses.append(f"{column} {_comparison_operators.get(operator)} %s")
+                    args.append(operand)
+            elif operator == params.OPERATOR_BETWEEN:
+                if not isinstance(operand, list) or len(operand) != 2:
+                    raise exceptions.InvalidArgumentsException(
+                        f"{params.OPERATOR_BETWEEN} filter for {attribute} requires a list of two values")
+
+                clauses.append(f"{column} between %s and %s")
+                args.extend(operand)
+            elif operator == params.OPERATOR_IN:
+                if not isinstance(operand, list) or len(operand) == 0:
+                    raise exceptions.InvalidArgumentsException(
+                        f"{params.OPERATOR_IN} filter for {attribute} requires a list of values")
+
+                clauses.append(f"{column} in ({','.join(['%s'] * len(operand))})")
+                args.extend(operand)
+            elif operator == params.OPERATOR_BEGINS_WITH:
+                # escape like wildcards so the prefix is matched literally
+                escaped = str(operand).replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+                clauses.append(f"{column} like %s")
+                args.append(f"{escaped}%")
+            else:
+                raise exceptions.InvalidArgumentsException(f"Unknown Find Operator {operator}")
+
+        return clauses, args
+
+    def _create_find_statement(self, query_table: str, filters: dict, schema_properties: dict, column_list: list,
+                               limit: int, last_key=None) -> tuple:
+        clauses, args = self._create_find_predicates(filters=filters, schema_properties=schema_properties,
+                                                     prefix='a')
+
+        # implement delete check against the resource table, joining to it on the primary key for metadata
+        deleted = self._engine_type.get_who(params.DELETED)
+        if query_table == self._resource_table_name:
+            from_clause = f"{query_table} a"
+            clauses.insert(0, f"a.{deleted} = FALSE")
+        else:
+            from_clause = f"{query_table} a, {self._resource_table_name} b"
+            clauses.insert(0, f"b.{deleted} = FALSE")
+            clauses.insert(0, f"a.{self._pk_name} = b.{self._pk_name}")
+
+        # keyset continuation on the primary key
+        if last_key is not None:
+            clauses.append(f"a.{self._pk_name} > %s")
+            args.append(last_key)
+
+        columns = ",".join([f"a.{c}" for c in column_list])
+        statement = f"select {columns} from {from_clause} where {' and '.join(clauses)} order by a.{self._pk_name} limit %s"
+        args.append(limit)
+
+        return statement, args
+
     def find(self, **kwargs):
         query_table = None
         filters = None
         column_list = None
 
         # determine if we are performing a resource or metadata search
-        if params.RESOURCE in kwargs and len(params.RESOURCE) > 0:
+        if kwargs.get(params.RESOURCE) is not None and kwargs.get(params.METADATA) is not None:
+            raise exceptions.InvalidArgumentsException("Find only supports Resource or Metadata search, not both")
+        elif kwargs.get(params.RESOURCE) is not None and len(kwargs.get(params.RESOURCE)) > 0:
             query_table = self._resource_table_name
             filters = kwargs.get(params.RESOURCE)
             source_schema_properties = self._resource_schema.get("properties")
-        elif params.METADATA in kwargs and len(params.METADATA) > 0:
+        elif kwargs.get(params.METADATA) is not None and len(kwargs.get(params.METADATA)) > 0:
+            if self._metadata_schema is None:
+                raise exceptions.InvalidArgumentsException("Namespace has no Metadata Schema to Find against")
+
             query_table = self._metadata_table_name
             filters = kwargs.get(params.METADATA)
             source_schema_properties = self._metadata_schema.get("properties")
@@ -519,20 +1064,422 @@ class DataAPIStorageHandler:
             raise exceptions.InvalidArgumentsException("Malformed Find Request")
 
         column_list = list(source_schema_properties.keys())
+        if self._pk_name not in column_list:
+            column_list.insert(0, self._pk_name)
+
+        limit = int(kwargs.get(params.QUERY_PARAM_LIMIT, params.DEFAULT_MAX_RESPONSE_SIZE))
+        if limit < 1:
+            raise exceptions.InvalidArgumentsException(f"{params.QUERY_PARAM_LIMIT} must be a positive Integer")
+
+        # accept the last evaluated key either as a raw value or as a key document
+        last_key = kwargs.get(params.EXCLUSIVE_START_KEY)
+        if isinstance(last_key, dict):
+            last_key = last_key.get(self._pk_name)
 
-        # transform column filters
-        column_filters = self._json_to_column_list(input=filters, version_increment=False, add_who=False)
+        # fetch one more row than the limit so we know if there is another page
+        statement, args = self._create_find_statement(query_table=query_table, filters=filters,
+                                                      schema_properties=source_schema_properties,
+                                                      column_list=column_list, limit=limit + 1, last_key=last_key)
+        self._logger.debug(statement)
 
-        # generate select statement
-        query = f"select * from {query_table} where {','.join(column_filters)}"
-        self._logger.debug(query)
+        commands = [(statement, args)]
 
-        # return resultset
-        count, rows = self._engine_type.run_commands(conn=self._db_conn, commands=[query])
-        return utils.pivot_resultset_into_json(rows=rows, column_spec=column_list, type_map=source_schema_properties)
+        explain = utils.strtobool(kwargs.get(params.QUERY_PARAM_EXPLAIN, False))
+        if explain is True:
+            commands.append((f"explain (format json) {statement}", args))
+
+        counts, rows = self._engine_type.run_commands(conn=self._reader(kwargs.get(params.QUERY_PARAM_CONSISTENT, False)),
+                                                      commands=commands)
+
+        for r in rows:
+            if isinstance(r, Exception):
+                raise exceptions.DetailedException("Unable to perform Find", detail=str(r))
+
+        # the explain output is a single row appended after the query results
+        plan = None
+        if explain is True:
+            plan = rows.pop()[0]
+
+        records = [r for r in rows if r is not None]
+
+        last_evaluated_key = None
+        if len(records) > limit:
+            records = records[:limit]
+            last_evaluated_key = records[-1][column_list.index(self._pk_name)]
+
+        items = []
+        if len(records) > 0:
+            type_map = {k: v.get("type") for k, v in source_schema_properties.items()}
+            items = self._get_row_converter(column_spec=column_list, type_map=type_map)(records)
+
+        response = {
+            params.LAST_EVALUATED_KEY: last_evaluated_key,
+            'Items': items
+        }
+
+        if plan is not None:
+            response[params.QUERY_PLAN] = plan
+
+        return response
+
+    def _to_csv_value(self, value) -> str:
+        if value is None:
+            return ''
+        elif type(value) == bool:
+            return 'true' if value is True else 'false'
+        elif type(value) in [int, float]:
+            return str(value)
+        else:
+            if isinstance(value, (dict, list)):
+                value = json.dumps(value)
+
+            return '"' + str(value).replace('"', '""') + '"'
+
+    def _read_bulk_items(self, items):
+        '''Generate (line number, item, error) tuples from an iterable of items, or from NDJSON text, bytes, or a
+        file-like object
+        '''
+        if isinstance(items, (str, bytes)):
+            items = items.splitlines()
+        elif hasattr(items, "iter_lines"):
+            # botocore streaming bodies, such as an S3 object
+            items = items.iter_lines()
+
+        for i, item in enumerate(items):
+            if isinstance(item, (str, bytes)):
+                if len(item.strip()) == 0:
+                    continue
+
+                try:
+                    yield i + 1, json.loads(item), None
+                except ValueError as e:
+                    yield i + 1, None, f"Invalid JSON: {e}"
+            else:
+                yield i + 1, item, None
+
+    def bulk_load(self, items, caller_identity: str, batch_size: int = params.DEFAULT_BULK_LOAD_BATCH_SIZE) -> dict:
+        '''Load a large number of Resources in a single transaction. Items are validated against the Resource schema,
+        copied into a staging table with COPY FROM STDIN in batches, and then merged into the Resource table with a
+        single insert ... on conflict statement. Items which fail validation are not loaded and are returned in the
+        response. Deleted items are not updated.
+
+        :param items: iterable of Resource dicts which include the primary key, or an NDJSON string or stream
+        :param caller_identity:
+        :param batch_size: number of rows to buffer for each COPY
+        :return: dict of loaded count and failures
+        '''
+        schema = self._resource_schema.get("properties")
+        columns = list(schema.keys())
+        if self._pk_name not in columns:
+            columns.insert(0, self._pk_name)
+
+        self._verify_boolean_columns(self._resource_table_name, columns)
+
+        staging_table = f"{self._resource_table_name}_stage"
+        failures = []
+        staged = 0
+
+        def _fail(line, item, message):
+            failure = {"Line": line, "Message": message}
+            if isinstance(item, dict) and self._pk_name in item:
+                failure[self._pk_name] = item.get(self._pk_name)
+            failures.append(failure)
+
+        cursor = self._db_conn.cursor()
+
+        try:
+            cursor.execute("begin")
+            self._engine_type.create_staging_table(cursor=cursor, table_ref=self._resource_table_name,
+                                                   staging_ref=staging_table, columns=columns)
+
+            buffer = []
+
+            def _flush():
+                stream = io.BytesIO("".join(buffer).encode("utf-8"))
+                self._engine_type.copy_csv(cursor=cursor, table_ref=staging_table, columns=columns, stream=stream)
+                buffer.clear()
+
+            for line, item, error in self._read_bulk_items(items):
+                if error is not None:
+                    _fail(line, item, error)
+                    continue
+                elif not isinstance(item, dict) or item.get(self._pk_name) is None:
+                    _fail(line, item, f"Item must be an object which includes {self._pk_name}")
+                    continue
+
+                unknown = [k for k in item.keys() if k not in columns]
+                if len(unknown) > 0:
+                    _fail(line, item, f"Attributes not in Schema: {','.join(unknown)}")
+                    continue
+
+                try:
+                    self._resource_validator(item)
+                except fastjsonschema.exceptions.JsonSchemaException as e:
+                    _fail(line, item, str(e))
+                    continue
+
+                buffer.append(",".join([self._to_csv_value(item.get(c)) for c in columns]) + "\n")
+                staged += 1
+
+                if len(buffer) >= batch_size:
+                    _flush()
+
+            if len(buffer) > 0:
+                _flush()
+
+            # merge the staged rows into the resource table, keeping the last row supplied for each key
+            who_columns = self._engine_type.who_column_list()
+            who_values = self._engine_type.who_column_insert(caller_identity=caller_identity)
+            updates = [f"{c} = excluded.{c}" for c in columns if c not in self._key_columns]
+            updates.extend(self._engine_type.who_column_update(caller_identity=caller_identity,
+                                                                version_increment=True,
+                                                                prefix=self._resource_table_name))
+
+            merge = f"insert into {self._resource_table_name} ({','.join(columns + who_columns)}) " \
+                    f"select distinct on ({self._pk_name}) {','.join(columns + who_values)} from {staging_table} " \
+                    f"order by {self._pk_name}, load_seq desc " \
+                    f"on conflict ({','.join(self._key_columns)}) do update set {','.join(updates)} " \
+                    f"where {self._resource_table_name}.{self._engine_type.get_who(params.DELETED)} = FALSE"
+            self._logger.debug(merge)
+
+            loaded = 0
+            if staged > 0:
+                # range partitioned tables merge on the partition attribute as well as the primary key, so items whose
+                # partition attribute has changed are first moved to their new partition, rather than inserted again
+                if len(self._key_columns) > 1:
+                    attribute = self._key_columns[1]
+                    move = f"update {self._resource_table_name} t set {attribute} = s.{attribute} " \
+                           f"from (select distinct on ({self._pk_name}) {self._pk_name}, {attribute} " \
+                           f"from {staging_table} order by {self._pk_name}, load_seq desc) s " \
+                           f"where t.{self._pk_name} = s.{self._pk_name} " \
+                           f"and t.{attribute} is distinct from s.{attribute} " \
+                           f"and t.{self._engine_type.get_who(params.DELETED)} = FALSE"
+                    self._logger.debug(move)
+                    cursor.execute(move)
+
+                cursor.execute(merge)
+                loaded = cursor.rowcount
+
+            cursor.execute("commit")
+        except Exception as e:
+            cursor.execute("rollback")
+            self._logger.error(e)
+            raise exceptions.DetailedException("Unable to perform Bulk Load", detail=str(e))
+        finally:
+            cursor.close()
+
+        return {
+            "Staged": staged,
+            "Loaded": loaded,
+            "FailedCount": len(failures),
+            "Failures": failures
+        }
+
+    def _search_text(self, query: dict) -> str:
+        # resolve the search text from the query types which have an equivalent in websearch syntax
+        if query is None or len(query) != 1:
+            raise exceptions.InvalidArgumentsException(
+                "Search requires a single query_string, simple_query_string, multi_match or match query")
+
+        query_type, spec = next(iter(query.items()))
+        if query_type in ["query_string", "simple_query_string", "multi_match"] and isinstance(spec, dict):
+            text = spec.get("query")
+        elif query_type == "match" and isinstance(spec, dict) and len(spec) == 1:
+            # match queries name a field, but all of the text attributes are searched
+            value = next(iter(spec.values()))
+            text = value.get("query") if isinstance(value, dict) else value
+        else:
+            raise exceptions.InvalidArgumentsException(f"Unsupported Search Query {query_type}")
+
+        if text is None or str(text).strip() == '':
+            raise exceptions.InvalidArgumentsException("Search Query Text is required")
+
+        return str(text)
+
+    def search(self, search_type: str, body: dict) -> dict:
+        '''Full text search against the Resource or Metadata, with the same request and response structure as an
+        ElasticSearch search. The query may be a query_string, simple_query_string, multi_match or match query, whose
+        text is interpreted with websearch syntax (quoted phrases, 'or', and '-' to exclude). Results are ranked by
+        ts_rank_cd, and paged with 'from' and 'size'
+
+        :param search_type: Resource or Metadata
+        :param body: search request, such as {"query": {"match": {"attr1": "some text"}}, "from": 0, "size": 10}
+        :return: ElasticSearch style response with hits.total, hits.max_score, and hits.hits
+        '''
+        searchable = self._search_columns()
+
+        if search_type == params.RESOURCE:
+            table_ref = self._resource_table_name
+            schema = self._resource_schema
+        elif search_type == params.METADATA:
+            table_ref = self._metadata_table_name
+            schema = self._metadata_schema
+        else:
+            raise exceptions.InvalidArgumentsException(f"Invalid Search Type {search_type}")
+
+        if table_ref not in searchable:
+            raise exceptions.UnimplementedFeatureException(f"Full Text Search is not enabled for {search_type}")
+
+        body = {} if body is None else body
+        text = self._search_text(body.get("query"))
+
+        try:
+            offset = int(body.get("from", 0))
+            size = int(body.get("size", 10))
+        except (TypeError, ValueError):
+            raise exceptions.InvalidArgumentsException("Search from and size must be Integers")
+
+        if offset < 0 or size < 0 or size > params.DEFAULT_MAX_RESPONSE_SIZE:
+            raise exceptions.InvalidArgumentsException(
+                f"Search from must not be negative, and size must be between 0 and {params.DEFAULT_MAX_RESPONSE_SIZE}")
+
+        column_list = list(schema.get("properties").keys())
+        if self._pk_name not in column_list:
+            column_list.insert(0, self._pk_name)
+
+        # metadata rows are not soft deleted, so their deletion is checked on the resource row with the same key
+        vector = engine_types.SEARCH_VECTOR_COLUMN
+        deleted = self._engine_type.get_who(params.DELETED)
+        if search_type == params.RESOURCE:
+            from_clause = f"{table_ref} a"
+        else:
+            from_clause = f"{table_ref} a join {self._resource_table_name} b on b.{self._pk_name} = a.{self._pk_name}"
+        matches = f"from {from_clause}, websearch_to_tsquery(%s::regconfig, %s) q " \
+                  f"where a.{vector} @@ q and {'a' if search_type == params.RESOURCE else 'b'}.{deleted} = FALSE"
+
+        # the total is counted separately, so that it is reported for empty pages
+        total_statement = f"select count(9) {matches}"
+        statement = f"select {','.join([f'a.{c}' for c in column_list])}, ts_rank_cd(a.{vector}, q) as score " \
+                    f"{matches} order by score desc, a.{self._pk_name} limit %s offset %s"
+        self._logger.debug(statement)
+
+        start = time.time()
+        counts, rows = self._engine_type.run_commands(conn=self._reader(False), commands=[
+            (total_statement, [self._text_search_config, text]),
+            (statement, [self._text_search_config, text, size, offset])])
+
+        for r in rows:
+            if isinstance(r, Exception):
+                raise exceptions.DetailedException("Unable to perform Search", detail=str(r))
+
+        total = rows[0][0]
+        records = [r for r in rows[1:] if r is not None]
+        type_map = {k: v.get("type") for k, v in schema.get("properties").items()}
+        items = self._get_row_converter(column_spec=column_list, type_map=type_map)(
+            [r[:len(column_list)] for r in records])
+
+        hits = []
+        for item, r in zip(items, records):
+            hits.append({
+                "_index": table_ref,
+                "_id": item.get(self._pk_name),
+                "_score": r[len(column_list)],
+                "_source": item
+            })
+
+        return {
+            "took": int((time.time() - start) * 1000),
+            "timed_out": False,
+            "hits": {
+                "total": {
+                    "value": total,
+                    "relation": "eq"
+                },
+                "max_score": hits[0].get("_score") if len(hits) > 0 else None,
+                "hits": hits
+            }
+        }
+
+    def _get_stream_arn(self, table_ref: str) -> str:
+        # change feed sources are identified in the same way as DynamoDB streams, so consumers can route on them
+        return f"arn:aws:rds:{self._region}:{self._deployed_account}:table/{table_ref}/stream/{self._change_feed_name}"
 
     def get_streams(self):
-        raise exceptions.UnimplementedFeatureException()
+        if self._change_feed_name is None:
+            raise exceptions.UnimplementedFeatureException("Namespace does not have a Change Feed")
+
+        return {
+            params.RESOURCE_TABLE_ARN: f"arn:aws:rds:{self._region}:{self._deployed_account}:table/{self._resource_table_name}",
+            params.RESOURCE_STREAM_ARN: self._get_stream_arn(self._resource_table_name),
+            params.METADATA_TABLE_ARN: f"arn:aws:rds:{self._region}:{self._deployed_account}:table/{self._metadata_table_name}",
+            params.METADATA_STREAM_ARN: self._get_stream_arn(self._metadata_table_name)
+        }
+
+    def _to_stream_value(self, value):
+        # DynamoDB serialisation requires decimals rather than floats, including within documents
+        if isinstance(value, float):
+            return Decimal(str(value))
+        elif isinstance(value, dict):
+            return {k: self._to_stream_value(v) for k, v in value.items()}
+        elif isinstance(value, list):
+            return [self._to_stream_value(v) for v in value]
+        else:
+            return value
+
+    def _to_stream_record(self, serializer: TypeSerializer, sequence_number: int, table_name: str, item_id: str,
+                          event_name: str, new_image: dict, change_date) -> dict:
+        # generate a record in the form of a DynamoDB stream record, with who columns named as in DynamoDB
+        payload = {
+            "ApproximateCreationDateTime": int(change_date.timestamp()),
+            "Keys": {self._pk_name: serializer.serialize(item_id)},
+            "SequenceNumber": str(sequence_number),
+            "StreamViewType": "NEW_IMAGE"
+        }
+
+        if new_image is not None:
+            image = json.loads(new_image) if isinstance(new_image, str) else new_image
+            names = {v: k for k, v in self._engine_type.get_who_col_map().items()}
+
+            payload["NewImage"] = {names.get(k, k): serializer.serialize(self._to_stream_value(v)) for k, v in
+                                   image.items() if v is not None}
+
+        return {
+            "eventID": str(sequence_number),
+            "eventName": event_name,
+            "eventSource": "aws:rds",
+            "eventSourceARN": self._get_stream_arn(table_name),
+            "dynamodb": payload
+        }
+
+    def process_changes(self, processor, batch_size: int = params.DEFAULT_CHANGE_FEED_BATCH_SIZE) -> int:
+        '''Consume a batch of changes from the change feed in sequence number order. Changes are supplied to the
+        processor as a list of DynamoDB stream records for each source table, and are removed from the feed once the
+        processor returns. If the processor raises an error then the batch remains in the feed for the next call, so
+        delivery is at least once. Rows locked by a concurrent call are skipped
+
+        :param processor: function which accepts a list of stream records from a single table
+        :param batch_size: maximum number of changes to consume
+        :return: the number of changes consumed
+        '''
+        if self._change_feed_name is None:
+            raise exceptions.UnimplementedFeatureException("Namespace does not have a Change Feed")
+
+        serializer = TypeSerializer()
+
+        with self.transaction():
+            cursor = self._db_conn.cursor()
+            try:
+                cursor.execute(
+                    f"select sequence_number, table_name, item_id, event_name, new_image, change_date from {self._change_feed_name} order by sequence_number limit %s for update skip locked",
+                    [batch_size])
+                rows = cursor.fetchall()
+            finally:
+                cursor.close()
+
+            if rows is None or len(rows) == 0:
+                return 0
+
+            by_table = {}
+            for r in rows:
+                by_table.setdefault(r[1], []).append(self._to_stream_record(serializer, *r))
+
+            for table_name, records in by_table.items():
+                processor(records)
+
+            self._engine_type.run_batch(self._db_conn, [
+                (f"delete from {self._change_feed_name} where sequence_number = ANY(%s)", [[r[0] for r in rows]])])
+
+        return len(rows)
 
     def item_master_update(self, caller_identity: str, **kwargs):
         if self._pk_name not in kwargs or params.ITEM_MASTER_ID not in kwargs:
@@ -543,7 +1490,7 @@ class DataAPIStorageHandler:
             item_master_id = kwargs.get(params.ITEM_MASTER_ID)
             target_id = "null"
             if item_master_id is not None:
-                self.check(id=item_master_id)
+                self.check(id=item_master_id, consistent_read=True)
                 target_id = f"'{kwargs.get(params.ITEM_MASTER_ID)}'"
 
             pk = kwargs.get(self._pk_name)
@@ -568,7 +1515,8 @@ class DataAPIStorageHandler:
                 params.DATA_MODIFIED: True if counts[0] > 0 else False
             }
 
-    def _remove_attributes_from_table(self, item_id: str, attribute_list: list, table_name: str, caller_identity: str):
+    def _remove_attributes_statement(self, item_id: str, attribute_list: list, table_name: str,
+                                     caller_identity: str) -> str:
         # generate the update statement setting each attribute to NULL
         update_attribute_clauses = []
         for r in attribute_list:
@@ -578,10 +1526,12 @@ class DataAPIStorageHandler:
         update_attribute_clauses.extend(
             self._engine_type.who_column_update(caller_identity=caller_identity, version_increment=True))
 
-        # create the update statement
-        update_statement = f"update {table_name} set {','.join(update_attribute_clauses)} where {self._pk_name} = '{item_id}'"
+        return f"update {table_name} set {','.join(update_attribute_clauses)} where {self._pk_name} = '{item_id}'"
 
-        counts, rows = self._engine_type.run_commands(conn=self._db_conn, commands=[update_statement])
+    def _remove_attributes_from_table(self, item_id: str, attribute_list: list, table_name: str, caller_identity: str):
+        counts = self._engine_type.run_batch(self._db_conn, [
+            self._remove_attributes_statement(item_id=item_id, attribute_list=attribute_list, table_name=table_name,
+                                              caller_identity=caller_identity)])
 
         return True if counts is not None and counts[0] > 0 else False
 
@@ -600,4 +1550,13 @@ class DataAPIStorageHandler:
                                                   caller_identity=caller_identity)
 
     def disconnect(self):
+        if self._async_engine is not None:
+            pools = [self._async_pool] if self._async_read_pool is self._async_pool else [self._async_pool,
+                                                                                         self._async_read_pool]
+            self._run_async(*[p.close() for p in pools])
+            self._loop.close()
+
+        if self._read_conn is not None and self._read_conn is not self._db_conn:
+            self._read_conn.close()
+
         self._db_conn.close()
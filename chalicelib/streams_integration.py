@@ -1,8 +1,15 @@
 import json
 import os
+import time
+import random
 import boto3
 import botocore
 import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from elasticsearch import Elasticsearch
+from elasticsearch.exceptions import TransportError
+from boto3.dynamodb.conditions import Attr
 from chalicelib.exceptions import *
 import chalicelib.utils as utils
 import chalicelib.parameters as params
@@ -13,7 +20,26 @@ ES_DOMAIN = 'ElasticSearchDomain'
 ES_ENDPOINT = 'ElasticSearchEndpoint'
 DOMAIN_ID = 'DomainId'
 DELIVERY_BUFFER_INTERVAL_SECONDS = 300
+DELIVERY_BUFFER_SIZE_MB = 5
 DELIVERY_BUFFER_EVENTS = 1000
+FIREHOSE_MAX_BATCH_RECORDS = 500
+FIREHOSE_MAX_BATCH_BYTES = 4 * 1024 * 1024
+FIREHOSE_MAX_RECORD_BYTES = 1000 * 1024
+FIREHOSE_CONCURRENCY = 4
+BULK_FLUSH_SIZE = 500
+BULK_CONCURRENCY = 4
+BULK_MAX_BYTES = 10 * 1024 * 1024
+BULK_RETRY_STATUSES = (429, 502, 503, 504)
+BULK_CONFLICT_STATUS = 409
+RETRY_BACKOFF_SECONDS = 0.1
+RETRY_MAX_BACKOFF_SECONDS = 5
+ROUTE_REFRESH_SECONDS = 60
+ROUTE_MISS_REFRESH_SECONDS = 10
+REINDEX_INDEX_NAME = 'ReindexIndexName'
+REINDEX_MIN_REMAINING_MILLIS = 60000
+INDEX_ACTION = 'index'
+DELETE_ACTION = 'delete'
+DOCUMENT_ID = 'document_id'
 REGION = os.getenv('AWS_REGION')
 
 
@@ -21,11 +47,16 @@ class StreamsIntegration:
     _region = None
     _table_name = None
     _delivery_streams = {}
-    _dest_mapping = {}
+    _routes = None
+    _routes_miss_loaded = None
     _es_domain_name = None
     _es_domain = None
     _es_client = None
     _fh_client = None
+    _s3_client = None
+    _ddb_client = None
+    _lambda_client = None
+    _search_clients = None
     _api_control_table = None
     _logger = None
     _deployment_stage = None
@@ -34,23 +65,175 @@ class StreamsIntegration:
         if self._es_domain is not None:
             return self._es_domain
 
-    def __init__(self, deployment_stage, search_config):
+    def __init__(self, deployment_stage, search_config: dict = None, schemas: dict = None):
         streams_integration_logger = f'SearchIntegration-{deployment_stage}' if deployment_stage.lower() != 'prod' else 'SearchIntegration'
         self._logger = utils.setup_logging()
         self._deployment_stage = deployment_stage
+        self._routes = {}
+        self._search_clients = {}
 
         if self._es_client is None:
             self._logger.info("Setting up new ElasticSearch and Firehose clients")
             self._es_client = boto3.client('es', region_name=REGION)
             self._fh_client = boto3.client('firehose', region_name=REGION)
+            self._s3_client = boto3.client('s3', region_name=REGION)
+            self._ddb_client = boto3.client('dynamodb', region_name=REGION)
+            self._lambda_client = boto3.client('lambda', region_name=REGION)
 
-            # create a reference to the api control table in ddb so we can pull metadata
-            dynamo_helper, self._api_control_table = utils.get_api_control_table(REGION, self._logger)
+            # reference the api control table without describing it, as it's only read to load routes
+            self._api_control_table = boto3.resource('dynamodb', region_name=REGION).Table(params.CONTROL_TABLE)
 
-            # create the source/dest mapping table
-            for t in [params.RESOURCE, params.METADATA]:
-                config = search_config.get('DeliveryStreams')[t]
-                self._dest_mapping[config['SourceStreamARN']] = config['DestinationDeliveryStreamARN']
+        # routes for a single namespace can be supplied, and otherwise are loaded for the stage on first use
+        if search_config is not None:
+            self._add_routes(search_config, schemas)
+
+    def _add_routes(self, search_config: dict, schemas: dict = None, api_name: str = None):
+        '''Add a route for each of a namespace's source streams, with the destination, indexer settings and decoder
+        from its search config and schemas. Routes loaded from the control table carry the namespace's API name, so
+        that their reindex target can be refreshed
+        '''
+        for t in [params.RESOURCE, params.METADATA]:
+            config = search_config.get('DeliveryStreams', {}).get(t)
+
+            if config is not None:
+                delivery_stream = config.get('DestinationDeliveryStreamARN')
+                self._routes[config['SourceStreamARN']] = {
+                    'Type': t,
+                    'ApiName': api_name,
+                    'Refreshed': time.time(),
+                    # firehose is addressed by name rather than ARN
+                    DELIVERY_STREAM_NAME: delivery_stream.split('/')[-1] if delivery_stream is not None else None,
+                    'IndexName': config.get('IndexName'),
+                    REINDEX_INDEX_NAME: config.get(REINDEX_INDEX_NAME),
+                    ES_ENDPOINT: search_config.get(ES_DOMAIN, {}).get(ES_ENDPOINT),
+                    params.SEARCH_INDEXER_MODE: search_config.get(params.SEARCH_INDEXER_MODE,
+                                                                  params.DEFAULT_SEARCH_INDEXER_MODE),
+                    params.DELIVERY_STREAM_FAILURE_BUCKET: search_config.get(params.DELIVERY_STREAM_FAILURE_BUCKET),
+                    params.BULK_FLUSH_SIZE: int(search_config.get(params.BULK_FLUSH_SIZE, BULK_FLUSH_SIZE)),
+                    params.BULK_CONCURRENCY: int(search_config.get(params.BULK_CONCURRENCY, BULK_CONCURRENCY)),
+                    'Decoder': self._compile_decoder(None if schemas is None else schemas.get(t))
+                }
+
+    def load_routes(self):
+        '''Load the routing table for every namespace in the stage with search configured, from a single scan of the
+        control table for API metadata and schemas
+        '''
+        schema_types = {params.CONTROL_TYPE_RESOURCE_SCHEMA: params.RESOURCE,
+                        params.CONTROL_TYPE_METADATA_SCHEMA: params.METADATA}
+        args = {
+            'FilterExpression': Attr(params.CONTROL_SORT).is_in([params.CONTROL_TYPE_META] + list(schema_types.keys())),
+            'ProjectionExpression': '#api, #type, #stage, #search, #streams, #domain, #resource_schema, '
+                                    '#metadata_schema',
+            'ExpressionAttributeNames': {'#api': params.CONTROL_HASH, '#type': params.CONTROL_SORT,
+                                         '#stage': params.STAGE, '#search': params.SEARCH_CONFIG,
+                                         '#streams': 'DeliveryStreams', '#domain': ES_DOMAIN,
+                                         '#resource_schema': params.CONTROL_TYPE_RESOURCE_SCHEMA,
+                                         '#metadata_schema': params.CONTROL_TYPE_METADATA_SCHEMA}
+        }
+
+        items = []
+        while True:
+            response = self._api_control_table.scan(**args)
+            items.extend(response.get(params.ITEMS, []))
+
+            if params.LAST_EVALUATED_KEY in response:
+                args[params.EXCLUSIVE_START_KEY] = response.get(params.LAST_EVALUATED_KEY)
+            else:
+                break
+
+        search_configs = {}
+        schemas = {}
+        for i in items:
+            if i.get(params.CONTROL_SORT) == params.CONTROL_TYPE_META:
+                if i.get(params.STAGE) != self._deployment_stage:
+                    continue
+                elif i.get(params.SEARCH_CONFIG) is not None:
+                    search_configs[i.get(params.CONTROL_HASH)] = i.get(params.SEARCH_CONFIG)
+                elif i.get('DeliveryStreams') is not None:
+                    search_configs[i.get(params.CONTROL_HASH)] = self._migrate_search_config(i)
+            else:
+                control_type = i.get(params.CONTROL_SORT)
+                schemas.setdefault(i.get(params.CONTROL_HASH), {})[schema_types.get(control_type)] = i.get(control_type)
+
+        for api, search_config in search_configs.items():
+            self._add_routes(search_config, schemas.get(api), api)
+
+        self._logger.info(f"Loaded {len(self._routes)} Search Routes for {len(search_configs)} APIs")
+
+    def _migrate_search_config(self, item: dict) -> dict:
+        '''Move the search config of a namespace provisioned by earlier versions, which stored it at the top level of
+        its API metadata, into SearchConfig. The config is returned whether or not it could be moved, so that the
+        namespace is still routed
+        '''
+        search_config = {'DeliveryStreams': item.get('DeliveryStreams')}
+        if item.get(ES_DOMAIN) is not None:
+            search_config[ES_DOMAIN] = item.get(ES_DOMAIN)
+
+        try:
+            self._api_control_table.update_item(
+                Key={params.CONTROL_HASH: item.get(params.CONTROL_HASH), params.CONTROL_SORT: params.CONTROL_TYPE_META},
+                UpdateExpression='SET #search = :config REMOVE #streams, #domain',
+                ConditionExpression='attribute_not_exists(#search)',
+                ExpressionAttributeNames={'#search': params.SEARCH_CONFIG, '#streams': 'DeliveryStreams',
+                                          '#domain': ES_DOMAIN},
+                ExpressionAttributeValues={':config': search_config})
+            self._logger.info(f"Migrated Search Config for {item.get(params.CONTROL_HASH)}")
+        except botocore.exceptions.ClientError as e:
+            # a concurrent load has already moved it
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                self._logger.error(f"Unable to migrate Search Config for {item.get(params.CONTROL_HASH)}: {e}")
+
+        return search_config
+
+    def _refresh_reindex_target(self, route: dict) -> None:
+        # read the reindex target of a single route from its namespace's API metadata, rather than reloading every route
+        try:
+            item = self._api_control_table.get_item(
+                Key={params.CONTROL_HASH: route.get('ApiName'), params.CONTROL_SORT: params.CONTROL_TYPE_META},
+                ProjectionExpression='#search.#streams.#type.#target',
+                ExpressionAttributeNames={'#search': params.SEARCH_CONFIG, '#streams': 'DeliveryStreams',
+                                          '#type': route.get('Type'), '#target': REINDEX_INDEX_NAME}).get('Item', {})
+            route[REINDEX_INDEX_NAME] = item.get(params.SEARCH_CONFIG, {}).get('DeliveryStreams', {}).get(
+                route.get('Type'), {}).get(REINDEX_INDEX_NAME)
+        except botocore.exceptions.ClientError as e:
+            # the previous target is kept until it can be read
+            self._logger.error(f"Unable to refresh Reindex Target for {route.get('ApiName')}: {e}")
+
+        route['Refreshed'] = time.time()
+
+    def _get_route(self, records: list) -> tuple:
+        '''Resolve the route for a batch of records from its event source. The routing table is loaded from the control
+        table on a miss, at most once per ROUTE_MISS_REFRESH_SECONDS, so that namespaces provisioned since it was
+        loaded are found. The reindex target of a route is refreshed after ROUTE_REFRESH_SECONDS
+        '''
+        source_arn = records[0].get('eventSourceARN')
+
+        if source_arn is None:
+            raise ResourceNotFoundException("Record does not contain an eventSourceARN and so is unroutable")
+
+        route = self._routes.get(source_arn)
+        now = time.time()
+
+        if route is None:
+            if self._routes_miss_loaded is None or now - self._routes_miss_loaded > ROUTE_MISS_REFRESH_SECONDS:
+                self._routes_miss_loaded = now
+                self.load_routes()
+                route = self._routes.get(source_arn)
+        elif route.get('ApiName') is not None and now - route.get('Refreshed') > ROUTE_REFRESH_SECONDS:
+            self._refresh_reindex_target(route)
+
+        if route is None:
+            raise DetailedException(f"Unable to find Destination Route for Source {source_arn}")
+
+        return source_arn, route
+
+    @staticmethod
+    def _compile_decoder(schema: dict = None):
+        # the deleted flag is decoded as a boolean, as it is stored as a number in DynamoDB and as a boolean in RDBMS
+        properties = {} if schema is None else dict(schema.get("properties", {}))
+        properties[params.DELETED] = {"type": "boolean"}
+
+        return utils.compile_stream_decoder({"properties": properties})
 
     def _describe_delivery_stream(self, stream_name):
         try:
@@ -68,26 +251,53 @@ class StreamsIntegration:
             return None
 
     def _verify_event_source(self, stream_arn):
-        lambda_client = boto3.client('lambda', region_name=REGION)
+        # only DynamoDB streams can be mapped as event sources. RDBMS change feeds are delivered to the indexer by the
+        # change feed function
+        if stream_arn.split(":")[2] != 'dynamodb':
+            return
+
+        function_name = f'{params.AWS_DATA_API_NAME}-{self._deployment_stage}-{params.INDEXER_NAME}'
 
         # create the event source
         try:
-            lambda_client.create_event_source_mapping(
+            self._lambda_client.create_event_source_mapping(
                 EventSourceArn=stream_arn,
-                FunctionName=f'{params.AWS_DATA_API_NAME}-{self._deployment_stage}-{params.INDEXER_NAME}',
+                FunctionName=function_name,
                 Enabled=True,
                 BatchSize=DELIVERY_BUFFER_EVENTS,
-                StartingPosition='LATEST'
+                StartingPosition='LATEST',
+                FunctionResponseTypes=['ReportBatchItemFailures']
             )
         except botocore.exceptions.ClientError as e:
-            # resource conflict exception raised when the stream already exists
+            # resource conflict exception raised when the mapping already exists. Mappings created before the indexer
+            # reported partial failures must report them, or Lambda would treat failed batches as successful
             if e.response['Error']['Code'] == 'ResourceConflictException':
-                pass
+                self._verify_batch_item_failures(stream_arn, function_name)
             else:
                 raise e
 
+    def _verify_batch_item_failures(self, stream_arn: str, function_name: str):
+        # enable ReportBatchItemFailures on the existing event source mappings of a stream
+        args = {'EventSourceArn': stream_arn, 'FunctionName': function_name}
+
+        while True:
+            response = self._lambda_client.list_event_source_mappings(**args)
+
+            for mapping in response.get('EventSourceMappings', []):
+                if 'ReportBatchItemFailures' not in mapping.get('FunctionResponseTypes', []):
+                    self._lambda_client.update_event_source_mapping(UUID=mapping.get('UUID'),
+                                                                    FunctionResponseTypes=['ReportBatchItemFailures'])
+                    self._logger.info(f"Enabled ReportBatchItemFailures on Event Source Mapping {mapping.get('UUID')}")
+
+            if response.get('NextMarker') is not None:
+                args['Marker'] = response.get('NextMarker')
+            else:
+                break
+
     def _verify_es_delivery_stream(self, index_prefix=None, firehose_role_arn=None, failure_bucket=None,
-                                   kms_key_arn: str = None):
+                                   kms_key_arn: str = None,
+                                   buffer_interval_seconds: int = DELIVERY_BUFFER_INTERVAL_SECONDS,
+                                   buffer_size_mb: int = DELIVERY_BUFFER_SIZE_MB):
         if firehose_role_arn is not None and failure_bucket is not None:
             # create the delivery stream with routing to ElasticSearch
             name = f'{params.AWS_DATA_API_NAME}-{self._table_name}-ES-{index_prefix}'
@@ -102,7 +312,8 @@ class StreamsIntegration:
                     'TypeName': utils.get_es_type_name(self._table_name, index_prefix),
                     'IndexRotationPeriod': 'NoRotation',
                     'BufferingHints': {
-                        'IntervalInSeconds': DELIVERY_BUFFER_INTERVAL_SECONDS
+                        'IntervalInSeconds': buffer_interval_seconds,
+                        'SizeInMBs': buffer_size_mb
                     },
                     'S3BackupMode': 'FailedDocumentsOnly',
                     'S3Configuration': {
@@ -110,7 +321,8 @@ class StreamsIntegration:
                         'BucketARN': f'arn:aws:s3:::{failure_bucket}',
                         'Prefix': f'{params.AWS_DATA_API_NAME}/{self._table_name}/{index_prefix}/',
                         'BufferingHints': {
-                            'IntervalInSeconds': DELIVERY_BUFFER_INTERVAL_SECONDS
+                            'IntervalInSeconds': buffer_interval_seconds,
+                            'SizeInMBs': buffer_size_mb
                         },
                         'CompressionFormat': 'GZIP',
                         'EncryptionConfiguration': {
@@ -163,8 +375,72 @@ class StreamsIntegration:
         else:
             raise ResourceNotFoundException(f'ElasticSearch Domain {self._es_domain_name} Not Found')
 
+    def put_index_template(self, search_client, table_name: str, search_type: str, schema: dict = None,
+                           refresh_interval: str = params.DEFAULT_SEARCH_REFRESH_INTERVAL) -> dict:
+        '''Put the index template of a namespace search type, with mappings generated from its JSON schema. The template
+        applies to the index behind the search alias when it's created, and to the versioned indexes of a reindex
+
+        :return: the generated mappings
+        '''
+        alias = utils.get_es_index_name(table_name, search_type)
+        mappings = utils.generate_es_mapping(schema)
+
+        # the indexer adds the document id, and always decodes the deleted flag as a boolean
+        mappings["properties"][DOCUMENT_ID] = {"type": "keyword"}
+        mappings["properties"][params.DELETED] = {"type": "boolean"}
+
+        search_client.indices.put_template(name=alias, body={
+            "index_patterns": [alias, f"{alias}-*"],
+            "settings": {"index": {"refresh_interval": refresh_interval}},
+            "mappings": mappings
+        })
+
+        return mappings
+
+    def apply_index_template(self, table_name: str, search_config: dict, search_type: str, schema: dict = None) -> bool:
+        '''Put the index template of a namespace search type, and apply its mappings and refresh interval to the
+        current index. If there is no index yet, a versioned index is created behind the search alias. Changes to the
+        mapping of an existing attribute can't be applied to an index, and require a reindex
+
+        :return: True if the current index matches the template
+        '''
+        search_client = self._get_search_client(search_config.get(ES_DOMAIN, {}).get(ES_ENDPOINT))
+        alias = utils.get_es_index_name(table_name, search_type)
+        refresh_interval = search_config.get(params.SEARCH_REFRESH_INTERVAL, params.DEFAULT_SEARCH_REFRESH_INTERVAL)
+        mappings = self.put_index_template(search_client, table_name, search_type, schema, refresh_interval)
+
+        if not search_client.indices.exists(index=alias):
+            search_client.indices.create(index=f"{alias}-{utils.get_date_now('%Y%m%d%H%M%S')}",
+                                         body={"aliases": {alias: {}}})
+            return True
+
+        try:
+            search_client.indices.put_settings(index=alias, body={"index": {"refresh_interval": refresh_interval}})
+            search_client.indices.put_mapping(index=alias, body=mappings)
+            return True
+        except TransportError as e:
+            if e.status_code == 400:
+                self._logger.warning(f"Unable to apply the mappings of {alias} to its current index, which must be "
+                                     f"reindexed: {e}")
+                return False
+            else:
+                raise DetailedException(f"Unable to apply the mappings of {alias}", detail=str(e))
+
     def configure_search_flow(self, endpoints, es_domain_name, firehose_delivery_role_arn, failure_record_bucket,
-                              kms_key_arn: str = None):
+                              kms_key_arn: str = None, table_name: str = None,
+                              indexer_mode: str = params.DEFAULT_SEARCH_INDEXER_MODE,
+                              buffer_interval_seconds: int = DELIVERY_BUFFER_INTERVAL_SECONDS,
+                              buffer_size_mb: int = DELIVERY_BUFFER_SIZE_MB, bulk_flush_size: int = BULK_FLUSH_SIZE,
+                              bulk_concurrency: int = BULK_CONCURRENCY, schemas: dict = None,
+                              refresh_interval: str = params.DEFAULT_SEARCH_REFRESH_INTERVAL):
+        if indexer_mode not in [params.SEARCH_INDEXER_MODE_FIREHOSE, params.SEARCH_INDEXER_MODE_BULK]:
+            raise InvalidArgumentsException(
+                f"{params.SEARCH_INDEXER_MODE} must be one of {params.SEARCH_INDEXER_MODE_FIREHOSE} or "
+                f"{params.SEARCH_INDEXER_MODE_BULK}")
+
+        if table_name is not None:
+            self._table_name = table_name
+
         response = self._validate_es_domain(es_domain_name)
         if response is not None:
             self._es_domain = response
@@ -178,68 +454,642 @@ class StreamsIntegration:
         print(f"Configuring {len(stream_arn_list)} Search Integration Flows")
 
         for s in stream_arn_list:
-            # verify the firehose delivery stream with routing to the ES domain
-            delivery_stream = self._verify_es_delivery_stream(s['Type'], firehose_delivery_role_arn,
-                                                              failure_record_bucket, kms_key_arn)
+            # verify the firehose delivery stream with routing to the ES domain. The bulk indexer writes to ES
+            # directly, and so doesn't need a delivery stream
+            delivery_stream = None
+            if indexer_mode == params.SEARCH_INDEXER_MODE_FIREHOSE:
+                delivery_stream = self._verify_es_delivery_stream(s['Type'], firehose_delivery_role_arn,
+                                                                  failure_record_bucket, kms_key_arn,
+                                                                  int(buffer_interval_seconds), int(buffer_size_mb))
 
             # verify the event source that wires the table's stream to the ES indexing function
             self._verify_event_source(stream_arn=s['ARN'])
 
             self._delivery_streams[s['Type']] = {
                 'SourceStreamARN': s['ARN'],
-                'DestinationDeliveryStreamARN': delivery_stream
+                'DestinationDeliveryStreamARN': delivery_stream,
+                'IndexName': utils.get_es_index_name(self._table_name, s['Type'])
             }
 
-            # setup the delivery stream index on the basis of the dynamodb update stream, so we can look the
-            # destination stream up quickly when we receive new records
-            self._dest_mapping[s['ARN']] = delivery_stream
-
         # output a structured payload that describes the stream and ES domain
-        return {
+        search_config = {
             'DeliveryStreams': self._delivery_streams,
-            ES_DOMAIN: self._es_domain
+            ES_DOMAIN: self._es_domain,
+            params.SEARCH_INDEXER_MODE: indexer_mode,
+            params.DELIVERY_STREAM_FAILURE_BUCKET: failure_record_bucket,
+            params.BULK_FLUSH_SIZE: int(bulk_flush_size),
+            params.BULK_CONCURRENCY: int(bulk_concurrency),
+            params.SEARCH_REFRESH_INTERVAL: refresh_interval
         }
 
+        # map the indexes explicitly from the schemas, rather than with the mappings ES would infer from documents
+        for t in [params.RESOURCE, params.METADATA]:
+            self.apply_index_template(self._table_name, search_config, t, None if schemas is None else schemas.get(t))
+
+        # setup the routes on the basis of the dynamodb update streams, so we can look the destination up quickly
+        # when we receive new records
+        self._add_routes(search_config)
+
+        return search_config
+
+    @staticmethod
+    def _get_document_id(payload: dict) -> str:
+        # the document id is the record's key values, joined with '.'
+        return ".".join([str(utils.decode_attribute(v)) for v in payload['Keys'].values()])
+
+    @staticmethod
+    def _is_delete(record: dict) -> bool:
+        # REMOVE events and soft deleted images, without decoding the rest of the image
+        image = record['dynamodb'].get('NewImage')
+
+        if record.get('eventName') == 'REMOVE' or image is None:
+            return True
+        else:
+            deleted = image.get(params.DELETED)
+            return deleted is not None and utils.decode_attribute(deleted) in (1, True)
+
+    @staticmethod
+    def coalesce(records: list) -> list:
+        '''Reduce a batch of stream records to the last record for each document, by sequence number. A document which
+        is inserted and then deleted within the batch is dropped altogether, as it was never indexed. Records are
+        returned in sequence number order, so that the batch can still be checkpointed by the last retained record
+        '''
+        latest = {}
+        inserted = set()
+
+        for r in sorted([r for r in records if 'dynamodb' in r], key=lambda r: int(r['dynamodb']['SequenceNumber'])):
+            document_id = StreamsIntegration._get_document_id(r['dynamodb'])
+
+            if document_id not in latest and r.get('eventName') == 'INSERT':
+                inserted.add(document_id)
+
+            latest[document_id] = r
+
+        output = []
+        for document_id, r in latest.items():
+            if document_id not in inserted or not StreamsIntegration._is_delete(r):
+                output.append(r)
+
+        return sorted(output, key=lambda r: int(r['dynamodb']['SequenceNumber']))
+
+    @staticmethod
+    def decode_record(record: dict, decoder) -> tuple:
+        '''Decode a DynamoDB stream record into a tuple of action, document id and typed document. REMOVE events, and
+        images which are soft deleted, are delete actions. The document is None for REMOVE events
+
+        :param record: DynamoDB stream record
+        :param decoder: image decoder, from utils.compile_stream_decoder
+        :return: (INDEX_ACTION or DELETE_ACTION, document_id, document)
+        '''
+        payload = record['dynamodb']
+        document_id = StreamsIntegration._get_document_id(payload)
+        image = payload.get('NewImage')
+
+        if record.get('eventName') == 'REMOVE' or image is None:
+            return DELETE_ACTION, document_id, None
+        else:
+            document = decoder(image)
+            document.setdefault(DOCUMENT_ID, document_id)
+
+            return DELETE_ACTION if document.get(params.DELETED) is True else INDEX_ACTION, document_id, document
+
+    @staticmethod
+    def _get_item_version(payload: dict):
+        '''Resolve the item version of a change from a DynamoDB stream record payload, for external versioning. Removed
+        items are versioned after their last image, so that the delete is newer than any copy of the item. Returns None
+        when the images don't carry an item version
+        '''
+        image = payload.get('NewImage')
+        if image is not None and params.ITEM_VERSION in image:
+            return int(utils.decode_attribute(image.get(params.ITEM_VERSION)))
+
+        image = payload.get('OldImage')
+        if image is not None and params.ITEM_VERSION in image:
+            return int(utils.decode_attribute(image.get(params.ITEM_VERSION))) + 1
+
+        return None
+
+    @staticmethod
+    def _backoff(attempt: int):
+        # exponential backoff with jitter before a retry
+        backoff = min(RETRY_BACKOFF_SECONDS * (2 ** (attempt - 1)), RETRY_MAX_BACKOFF_SECONDS)
+        time.sleep(backoff + random.uniform(0, backoff))
+
+    @staticmethod
+    def _chunk_entries(entries: list, max_records: int, max_bytes: int, max_entry_bytes: int) -> tuple:
+        '''Split a list of (key, payload) entries into batches within a limit of record count and request size.
+        Entries which are larger than max_entry_bytes can never be delivered, and are returned separately
+
+        :return: (list of batches of entries, list of oversized entries)
+        '''
+        chunks = []
+        oversized = []
+        chunk = []
+        chunk_bytes = 0
+
+        for entry in entries:
+            size = len(entry[1])
+
+            if size > max_entry_bytes:
+                oversized.append(entry)
+                continue
+
+            if len(chunk) == max_records or chunk_bytes + size > max_bytes:
+                chunks.append(chunk)
+                chunk = []
+                chunk_bytes = 0
+
+            chunk.append(entry)
+            chunk_bytes += size
+
+        if len(chunk) > 0:
+            chunks.append(chunk)
+
+        return chunks, oversized
+
+    def _decode_batch(self, route: dict, records: list) -> list:
+        # decode the last change to each document into a typed document with its item version, using the decoder for
+        # the source
+        decoder = route.get('Decoder')
+        if decoder is None:
+            decoder = self._compile_decoder(None)
+
+        coalesced = self.coalesce(records)
+        self._logger.debug(f"Coalesced {len(records)} Records to {len(coalesced)}")
+
+        return [(r['dynamodb']['SequenceNumber'],) + self.decode_record(r, decoder) + (
+            self._get_item_version(r['dynamodb']),) for r in coalesced]
+
+    def _put_record_batch(self, delivery_stream: str, entries: list) -> list:
+        '''Put a batch of (sequence number, data) entries to a delivery stream, retrying only the entries which fail,
+        with exponential backoff and jitter. Returns the entries which could not be delivered
+        '''
+        pending = entries
+
+        for attempt in range(params.DEFAULT_RETRY_COUNT):
+            if attempt > 0:
+                self._backoff(attempt)
+
+            try:
+                response = self._fh_client.put_record_batch(
+                    DeliveryStreamName=delivery_stream,
+                    Records=[{'Data': d} for s, d in pending]
+                )
+            except botocore.exceptions.ClientError as e:
+                # the whole batch is retried when the stream is throttled, and otherwise is returned as failed
+                if e.response['Error']['Code'] == 'ServiceUnavailableException':
+                    continue
+                else:
+                    self._logger.error(e)
+                    return pending
+
+            if response.get('FailedPutCount', 0) == 0:
+                return []
+            else:
+                pending = [e for e, r in zip(pending, response.get('RequestResponses')) if 'ErrorCode' in r]
+
+        self._logger.error(f"Unable to deliver {len(pending)} Records to {delivery_stream}")
+        return pending
+
+    def forward(self, records):
+        '''Forward a batch of stream records to ElasticSearch, with the indexer mode configured for their source. While
+        a reindex is running, the changes are also written to its new index, so that it's current when the alias is
+        flipped
+        '''
+        source_arn, route = self._get_route(records)
+
+        if route.get(params.SEARCH_INDEXER_MODE) == params.SEARCH_INDEXER_MODE_BULK:
+            output = self.forward_to_es_bulk(records)
+        else:
+            output = self.forward_to_es_firehose(records)
+
+        if route.get(REINDEX_INDEX_NAME) is not None:
+            failures = {f.get("itemIdentifier") for f in output.get("batchItemFailures")}
+            failures.update(self._index_batch(route, route.get(REINDEX_INDEX_NAME), self._decode_batch(route, records),
+                                              versioned=True))
+            output["batchItemFailures"] = [{"itemIdentifier": s} for s in sorted(failures, key=int)]
+
+        return output
+
     def forward_to_es_firehose(self, records):
+        '''Forward a batch of DynamoDB stream records to the Firehose delivery stream for their source. Records are
+        sent in batches within the Firehose limits, concurrently, and the sequence numbers of any records which could
+        not be delivered are returned as batchItemFailures, so that Lambda retries from the first failure rather than
+        replaying the whole batch
+        '''
         # determine the destination stream
-        destination_stream = None
-        if 'eventSourceARN' not in records[0]:
-            raise ResourceNotFoundException(
-                "Record does not contain an eventSourceARN and so is unroutable to Firehose")
-        else:
-            source_arn = records[0]['eventSourceARN']
-            destination_stream = self._dest_mapping.get(source_arn)
+        source_arn, route = self._get_route(records)
+        destination_stream = route.get(DELIVERY_STREAM_NAME)
 
         if destination_stream is None:
-            raise DetailedException(f"Unable to find Destination Route for Source {source_arn}")
+            raise DetailedException(f"Unable to find Destination Delivery Stream for Source {source_arn}")
 
-        # construct an elastic search batch index request
-        items = []
+        entries = []
+        for sequence_number, action, document_id, document, version in self._decode_batch(route, records):
+            # firehose can only index documents, so deletes are delivered as a tombstone with the deleted flag set
+            if action == DELETE_ACTION and document is None:
+                document = {DOCUMENT_ID: document_id, params.DELETED: True}
 
-        for r in records:
-            if 'dynamodb' in r:
-                # construct the item to be emitted
-                item = {}
-                payload = r['dynamodb']
-
-                # extract the key values and surface them as '_id'
-                ids = []
-                for k, v in payload['Keys'].items():
-                    for value in v.values():
-                        ids.append(value)
-                item["document_id"] = ".".join(ids)
-
-                # extract the NewImage values, which is the whole new record
-                for k, v in payload['NewImage'].items():
-                    for value in v.values():
-                        item[k] = value
-
-                # now add the item as base64 encoded json
-                items.append({'Data': json.dumps(item)})
-
-        # push the item batch to firehose
-        if len(items) > 0:
-            self._fh_client.put_record_batch(
-                DeliveryStreamName=destination_stream,
-                Records=items
-            )
+            entries.append((sequence_number, json.dumps(document)))
+
+        failed = []
+        chunks, oversized = self._chunk_entries(entries, FIREHOSE_MAX_BATCH_RECORDS, FIREHOSE_MAX_BATCH_BYTES,
+                                                FIREHOSE_MAX_RECORD_BYTES)
+
+        for s, d in oversized:
+            self._logger.error(f"Dropping Record {s} of {len(d)} bytes, which exceeds the Firehose limit")
+
+        # push the item batches to firehose
+        if len(chunks) == 1:
+            failed.extend(self._put_record_batch(destination_stream, chunks[0]))
+        elif len(chunks) > 1:
+            with ThreadPoolExecutor(max_workers=min(FIREHOSE_CONCURRENCY, len(chunks))) as executor:
+                for f in executor.map(lambda c: self._put_record_batch(destination_stream, c), chunks):
+                    failed.extend(f)
+
+        return {
+            "batchItemFailures": [{"itemIdentifier": s} for s, d in failed]
+        }
+
+    def _get_search_client(self, endpoint: str):
+        # clients are shared by the namespaces on each ES domain
+        if endpoint not in self._search_clients:
+            self._search_clients[endpoint] = Elasticsearch(hosts=[endpoint])
+
+        return self._search_clients[endpoint]
+
+    def _bulk_request(self, endpoint: str, chunk: list) -> list:
+        # send a chunk of (document id, action lines) entries as one _bulk request, returning (status, error) for each
+        try:
+            response = self._get_search_client(endpoint).bulk(body="".join([lines for document_id, lines in chunk]))
+        except TransportError as e:
+            # connection failures have no status, and are retried as unavailable
+            status = e.status_code if isinstance(e.status_code, int) else 503
+            return [(status, str(e))] * len(chunk)
+
+        results = []
+        for item in response.get('items'):
+            result = list(item.values())[0]
+            results.append((result.get('status'), result.get('error')))
+
+        return results
+
+    def _bulk_index(self, route: dict, entries: list) -> tuple:
+        '''Index a list of (document id, action lines) entries with concurrent _bulk requests, retrying the items which
+        were throttled or unavailable with exponential backoff and jitter
+
+        :return: (entries which could not be indexed after retries, list of (entry, error) which ES rejected)
+        '''
+        endpoint = route.get(ES_ENDPOINT)
+        flush_size = route.get(params.BULK_FLUSH_SIZE, BULK_FLUSH_SIZE)
+        concurrency = route.get(params.BULK_CONCURRENCY, BULK_CONCURRENCY)
+        pending = entries
+        rejected = []
+
+        for attempt in range(params.DEFAULT_RETRY_COUNT):
+            if attempt > 0:
+                self._backoff(attempt)
+
+            chunks, oversized = self._chunk_entries(pending, flush_size, BULK_MAX_BYTES, BULK_MAX_BYTES)
+            rejected.extend([(e, f"Document exceeds the {BULK_MAX_BYTES} byte bulk request limit") for e in oversized])
+
+            retry = []
+            if len(chunks) > 0:
+                # requests in flight are bounded by the concurrency, and each chunk by the flush size
+                with ThreadPoolExecutor(max_workers=min(concurrency, len(chunks))) as executor:
+                    for chunk, results in zip(chunks, executor.map(lambda c: self._bulk_request(endpoint, c), chunks)):
+                        for entry, (status, error) in zip(chunk, results):
+                            if status in BULK_RETRY_STATUSES:
+                                retry.append(entry)
+                            elif error is not None and status != BULK_CONFLICT_STATUS:
+                                # deletes of documents which aren't in the index return 404 without an error, and
+                                # creates of documents which were already written return a conflict
+                                rejected.append((entry, error))
+
+            pending = retry
+            if len(pending) == 0:
+                break
+
+        if len(pending) > 0:
+            self._logger.error(f"Unable to index {len(pending)} Documents after {params.DEFAULT_RETRY_COUNT} attempts")
+
+        return pending, rejected
+
+    def _write_failed_documents(self, route: dict, rejected: list) -> None:
+        '''Write documents which ES rejected to the failure bucket, as Firehose does for failed documents. Rejected
+        documents will be rejected again if they are retried, so documents which can't be written to the bucket are
+        logged in full and dropped, rather than being returned to Lambda to be retried indefinitely
+        '''
+        index_name = route.get('IndexName')
+        failure_bucket = route.get(params.DELIVERY_STREAM_FAILURE_BUCKET)
+
+        if failure_bucket is None:
+            for (document_id, lines), error in rejected:
+                self._logger.error(f"Dropping Document {document_id} rejected by {index_name}: {error}")
+            return
+
+        # failed documents are keyed as Firehose writes them, under the index name rather than the delivery stream
+        prefix = f"{params.AWS_DATA_API_NAME}/{index_name}/elasticsearch-failed"
+        key = f"{prefix}/{utils.get_date_now('%Y/%m/%d/%H')}/{uuid.uuid4()}"
+        body = "\n".join([json.dumps({'esIndexName': index_name, 'esDocumentId': document_id,
+                                      'errorMessage': str(error), 'rawData': lines}) for (document_id, lines), error
+                          in rejected])
+
+        try:
+            self._s3_client.put_object(Bucket=failure_bucket, Key=key, Body=body.encode('utf-8'))
+            self._logger.warning(f"Wrote {len(rejected)} Documents rejected by {index_name} to {key}")
+        except botocore.exceptions.ClientError as e:
+            self._logger.error(f"Unable to write {len(rejected)} Documents rejected by {index_name} to {key}: {e}")
+            for line in body.splitlines():
+                self._logger.error(f"Dropping rejected Document {line}")
+
+    def forward_to_es_bulk(self, records):
+        '''Index a batch of DynamoDB stream records directly with the ElasticSearch _bulk API, using the document id
+        as the ES _id so that deletes remove the document. Documents which ES rejects are written to the failure bucket,
+        and the sequence numbers of records which could not be indexed are returned as batchItemFailures
+        '''
+        source_arn, route = self._get_route(records)
+        index_name = route.get('IndexName')
+
+        if index_name is None or route.get(ES_ENDPOINT) is None:
+            raise DetailedException(f"Unable to find Index Route for Source {source_arn}")
+
+        return {
+            "batchItemFailures": [{"itemIdentifier": s} for s in
+                                  self._index_batch(route, index_name, self._decode_batch(route, records))]
+        }
+
+    def _index_batch(self, route: dict, index_name: str, decoded: list, versioned: bool = False) -> list:
+        '''Index a decoded batch of (sequence number, action, document id, document, item version) into an index with
+        the _bulk API, returning the sequence numbers of the records which could not be indexed. Versioned batches use
+        the item version as an external version, so that they can't be overwritten by older copies of the items, such
+        as those scanned by a reindex
+        '''
+        # records are coalesced, so each document appears once and concurrent requests can't reorder its changes
+        sequence_numbers = {}
+        entries = []
+        for sequence_number, action, document_id, document, version in decoded:
+            sequence_numbers[document_id] = sequence_number
+            meta = {'_index': index_name, '_id': document_id}
+            if versioned is True and version is not None:
+                meta.update({'version': version, 'version_type': 'external_gte'})
+
+            if action == DELETE_ACTION:
+                lines = json.dumps({'delete': meta}) + "\n"
+            else:
+                lines = json.dumps({'index': meta}) + "\n" + json.dumps(document) + "\n"
+
+            entries.append((document_id, lines))
+
+        failed, rejected = self._bulk_index(route, entries)
+
+        if len(rejected) > 0:
+            self._write_failed_documents(route, rejected)
+
+        return [sequence_numbers.get(d) for d, lines in failed]
+
+    def _get_reindex_key(self, table_name: str) -> dict:
+        return {params.CONTROL_HASH: table_name, params.CONTROL_SORT: params.CONTROL_TYPE_REINDEX}
+
+    def _set_reindex_target(self, table_name: str, search_type: str, index_name: str = None):
+        # record the reindex target in the namespace's search config, from which indexers load their routes
+        args = {
+            'Key': {params.CONTROL_HASH: table_name, params.CONTROL_SORT: params.CONTROL_TYPE_META},
+            'ExpressionAttributeNames': {'#search': params.SEARCH_CONFIG, '#streams': 'DeliveryStreams',
+                                         '#type': search_type, '#target': REINDEX_INDEX_NAME}
+        }
+        if index_name is None:
+            args['UpdateExpression'] = 'REMOVE #search.#streams.#type.#target'
+        else:
+            args['UpdateExpression'] = 'SET #search.#streams.#type.#target = :target'
+            args['ExpressionAttributeValues'] = {':target': index_name}
+
+        self._api_control_table.update_item(**args)
+
+    def get_reindex_job(self, table_name: str) -> dict:
+        return self._api_control_table.get_item(Key=self._get_reindex_key(table_name), ConsistentRead=True).get('Item')
+
+    def start_reindex(self, table_name: str, search_config: dict, total_segments: int, read_capacity: int = None,
+                      schemas: dict = None) -> dict:
+        '''Start a reindex of a namespace, creating a new versioned index for each search type from an index template
+        generated from its current schema, and recording the job in the control table with a checkpoint for each scan
+        segment. The new indexes are registered as reindex targets, so that indexers also write changes to them
+
+        :param table_name: the namespace table name
+        :param search_config: the namespace search config
+        :param total_segments: number of parallel scan segments of each table, which is the reindex concurrency
+        :param read_capacity: read capacity units per second which the reindex may consume from each table
+        :param schemas: the namespace JSON schemas by search type
+        :return: the reindex job
+        '''
+        endpoint = search_config.get(ES_DOMAIN, {}).get(ES_ENDPOINT)
+        search_client = self._get_search_client(endpoint)
+        version = utils.get_date_now('%Y%m%d%H%M%S')
+        indexes = {}
+
+        for t in [params.RESOURCE, params.METADATA]:
+            index_name = f"{utils.get_es_index_name(table_name, t)}-{version}"
+
+            self.put_index_template(search_client, table_name, t, None if schemas is None else schemas.get(t),
+                                    search_config.get(params.SEARCH_REFRESH_INTERVAL,
+                                                      params.DEFAULT_SEARCH_REFRESH_INTERVAL))
+            # the new index isn't searched until the alias is flipped, so it isn't refreshed while it's loaded
+            search_client.indices.create(index=index_name, body={"settings": {"index": {"refresh_interval": "-1"}}})
+            indexes[t] = index_name
+
+        segments = {f"{t}-{s}": {'Status': params.STATUS_CREATING, 'Indexed': 0} for t in indexes for s in
+                    range(total_segments)}
+        job = dict(self._get_reindex_key(table_name), **{
+            'Version': version,
+            'Status': params.STATUS_CREATING,
+            'StartTime': int(time.time()),
+            'Indexes': indexes,
+            'TotalSegments': total_segments,
+            'ReadCapacity': read_capacity,
+            'Remaining': len(segments),
+            'Segments': segments,
+            ES_ENDPOINT: endpoint,
+            params.SEARCH_REFRESH_INTERVAL: search_config.get(params.SEARCH_REFRESH_INTERVAL,
+                                                              params.DEFAULT_SEARCH_REFRESH_INTERVAL),
+            params.DELIVERY_STREAM_FAILURE_BUCKET: search_config.get(params.DELIVERY_STREAM_FAILURE_BUCKET),
+            params.BULK_FLUSH_SIZE: int(search_config.get(params.BULK_FLUSH_SIZE, BULK_FLUSH_SIZE)),
+            params.BULK_CONCURRENCY: int(search_config.get(params.BULK_CONCURRENCY, BULK_CONCURRENCY))
+        })
+        self._api_control_table.put_item(Item=job)
+
+        for t, index_name in indexes.items():
+            self._set_reindex_target(table_name, t, index_name)
+
+        self._logger.info(f"Started Reindex {version} of {table_name} with {total_segments} Segments")
+
+        return job
+
+    def _save_checkpoint(self, table_name: str, segment_key: str, checkpoint: dict) -> bool:
+        '''Save the checkpoint of a scan segment. A complete segment is counted down from the job's remaining segments,
+        once only, and True is returned for the last segment of the job to complete
+        '''
+        args = {
+            'Key': self._get_reindex_key(table_name),
+            'UpdateExpression': 'SET #segments.#segment = :checkpoint',
+            'ExpressionAttributeNames': {'#segments': 'Segments', '#segment': segment_key},
+            'ExpressionAttributeValues': {':checkpoint': checkpoint}
+        }
+
+        if checkpoint.get('Status') != params.STATUS_ACTIVE:
+            self._api_control_table.update_item(**args)
+            return False
+
+        args['UpdateExpression'] += ' ADD #remaining :completed'
+        args['ConditionExpression'] = '#segments.#segment.#status <> :active'
+        args['ExpressionAttributeNames'].update({'#remaining': 'Remaining', '#status': 'Status'})
+        args['ExpressionAttributeValues'].update({':completed': -1, ':active': params.STATUS_ACTIVE})
+        args['ReturnValues'] = 'UPDATED_NEW'
+
+        try:
+            response = self._api_control_table.update_item(**args)
+        except botocore.exceptions.ClientError as e:
+            # the segment was already counted by an earlier invocation
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                return False
+            else:
+                raise e
+
+        return int(response.get('Attributes').get('Remaining')) == 0
+
+    def reindex_segment(self, job: dict, table_name: str, search_type: str, segment: int, schema: dict = None,
+                        remaining_millis=None) -> bool:
+        '''Parallel scan a segment of a namespace table from its checkpoint, loading the decoded items into the job's
+        new index with the _bulk API. Scanned items are only created, so that they never replace a newer change written
+        by the indexers. The checkpoint is saved after each page, and the scan stops once remaining_millis falls below
+        REINDEX_MIN_REMAINING_MILLIS, so that an interrupted segment is resumed from its last page. The alias is flipped
+        by the last segment of the job to complete
+
+        :return: True if the segment is complete
+        '''
+        segment_key = f"{search_type}-{segment}"
+        checkpoint = dict(job.get('Segments').get(segment_key))
+        if checkpoint.get('Status') == params.STATUS_ACTIVE:
+            return True
+
+        # items can only be scanned once every indexer has loaded the reindex target, or changes would be missed
+        wait = int(job.get('StartTime')) + ROUTE_REFRESH_SECONDS - time.time()
+        if wait > 0:
+            time.sleep(wait)
+
+        index_name = job.get('Indexes').get(search_type)
+        route = {
+            'IndexName': index_name,
+            ES_ENDPOINT: job.get(ES_ENDPOINT),
+            params.DELIVERY_STREAM_FAILURE_BUCKET: job.get(params.DELIVERY_STREAM_FAILURE_BUCKET),
+            params.BULK_FLUSH_SIZE: int(job.get(params.BULK_FLUSH_SIZE, BULK_FLUSH_SIZE)),
+            params.BULK_CONCURRENCY: int(job.get(params.BULK_CONCURRENCY, BULK_CONCURRENCY))
+        }
+        decoder = self._compile_decoder(schema)
+
+        scan_table = table_name if search_type == params.RESOURCE else utils.get_metaname(table_name)
+        key_names = [k.get('AttributeName') for k in
+                     self._ddb_client.describe_table(TableName=scan_table).get('Table').get('KeySchema')]
+
+        # the read capacity limit applies to each table, and is shared by its segments
+        total_segments = int(job.get('TotalSegments'))
+        read_capacity = job.get('ReadCapacity')
+        segment_capacity = None if read_capacity is None else float(read_capacity) / total_segments
+
+        args = {'TableName': scan_table, 'Segment': segment, 'TotalSegments': total_segments,
+                'ReturnConsumedCapacity': 'TOTAL'}
+
+        while True:
+            if checkpoint.get('LastKey') is not None:
+                args[params.EXCLUSIVE_START_KEY] = json.loads(checkpoint.get('LastKey'))
+
+            start = time.time()
+            response = self._ddb_client.scan(**args)
+
+            entries = []
+            for image in response.get(params.ITEMS, []):
+                document = decoder(image)
+
+                if document.get(params.DELETED) is not True:
+                    document_id = ".".join([str(utils.decode_attribute(image.get(k))) for k in key_names])
+                    document.setdefault(DOCUMENT_ID, document_id)
+
+                    # scanned items are indexed with their item version, so that they don't replace newer changes or
+                    # deletes written by indexers, which conflict and are ignored. items without a version are only
+                    # created if an indexer hasn't written them
+                    version = self._get_item_version({'NewImage': image})
+                    if version is not None:
+                        action = {'index': {'_index': index_name, '_id': document_id, 'version': version,
+                                            'version_type': 'external_gte'}}
+                    else:
+                        action = {'create': {'_index': index_name, '_id': document_id}}
+
+                    entries.append((document_id, json.dumps(action) + "\n" + json.dumps(document) + "\n"))
+
+            failed, rejected = self._bulk_index(route, entries)
+            if len(rejected) > 0:
+                self._write_failed_documents(route, rejected)
+
+            # the checkpoint isn't advanced past a page which could not be indexed, so that it's retried on resume
+            if len(failed) > 0:
+                raise DetailedException(f"Unable to index {len(failed)} Documents into {index_name}")
+
+            last_key = response.get(params.LAST_EVALUATED_KEY)
+            checkpoint = {
+                'Status': params.STATUS_CREATING if last_key is not None else params.STATUS_ACTIVE,
+                'LastKey': json.dumps(last_key) if last_key is not None else None,
+                'Indexed': int(checkpoint.get('Indexed', 0)) + len(entries) - len(rejected)
+            }
+
+            if self._save_checkpoint(table_name, segment_key, checkpoint) is True:
+                self.complete_reindex(table_name)
+
+            if last_key is None:
+                return True
+
+            if segment_capacity is not None:
+                consumed = response.get('ConsumedCapacity', {}).get('CapacityUnits', 0)
+                throttle = consumed / segment_capacity - (time.time() - start)
+                if throttle > 0:
+                    time.sleep(throttle)
+
+            if remaining_millis is not None and remaining_millis() < REINDEX_MIN_REMAINING_MILLIS:
+                return False
+
+    def complete_reindex(self, table_name: str):
+        '''Atomically flip each search alias of a namespace to the new index of its reindex job, and remove the indexes
+        it replaces. Indexes which were created before reindexing, with the name of the alias, are replaced in the same
+        request
+        '''
+        job = self.get_reindex_job(table_name)
+        search_client = self._get_search_client(job.get(ES_ENDPOINT))
+        actions = []
+        replaced = []
+
+        for t, index_name in job.get('Indexes').items():
+            alias = utils.get_es_index_name(table_name, t)
+            search_client.indices.put_settings(index=index_name, body={"index": {
+                "refresh_interval": job.get(params.SEARCH_REFRESH_INTERVAL, params.DEFAULT_SEARCH_REFRESH_INTERVAL)}})
+
+            if search_client.indices.exists_alias(name=alias):
+                current = [i for i in search_client.indices.get_alias(name=alias).keys() if i != index_name]
+                actions.extend([{'remove': {'index': i, 'alias': alias}} for i in current])
+                replaced.extend(current)
+            elif search_client.indices.exists(index=alias):
+                actions.append({'remove_index': {'index': alias}})
+
+            actions.append({'add': {'index': index_name, 'alias': alias}})
+
+        search_client.indices.update_aliases(body={'actions': actions})
+
+        for t in job.get('Indexes').keys():
+            self._set_reindex_target(table_name, t, None)
+
+        for i in replaced:
+            search_client.indices.delete(index=i, ignore_unavailable=True)
+
+        self._api_control_table.update_item(Key=self._get_reindex_key(table_name),
+                                            UpdateExpression='SET #status = :active, #end = :end',
+                                            ExpressionAttributeNames={'#status': 'Status', '#end': 'EndTime'},
+                                            ExpressionAttributeValues={':active': params.STATUS_ACTIVE,
+                                                                       ':end': int(time.time())})
+        self._logger.info(f"Completed Reindex {job.get('Version')} of {table_name}")
@@ -4,6 +4,7 @@ import boto3
 import os
 import time
 import logging
+import threading
 import pystache
 from distutils import util as _util
 from chalicelib.data_api_encoder import DataApiEncoder
@@ -13,6 +14,9 @@ import chalicelib.parameters as params
 
 _sts_client = None
 _iam_client = None
+_ssm_clients = {}
+_parameter_cache = {}
+_parameter_cache_lock = threading.Lock()
 import chalicelib.exceptions as exceptions
 from logging import Logger
 
@@ -131,6 +135,12 @@ def get_metaid(id):
     return f"{id}-meta"
 
 
+# method to return the ID of the item which a metadata entry describes
+def get_id_from_metaid(meta_id):
+    suffix = get_metaid("")
+    return meta_id[:-len(suffix)] if meta_id is not None and meta_id.endswith(suffix) else meta_id
+
+
 # method to return the name of the metadata table for a data API element
 def get_metaname(name):
     return f"{name}-Metadata"
@@ -347,14 +357,35 @@ def get_all_data_apis():
     return response
 
 
-def get_encrypted_parameter(parameter_name, region):
-    _pstore_client = boto3.client('ssm', region_name=region)
-    _password_response = _pstore_client.get_parameter(Name=parameter_name)
+def get_encrypted_parameter(parameter_name, region, refresh: bool = False):
+    '''Fetch and decrypt a parameter from SSM Parameter Store. Values are cached for the life of the process by
+    parameter and region for DEFAULT_PARAMETER_CACHE_SECONDS, and callers which find that a cached credential has been
+    rotated should fetch it again with refresh=True
+    '''
+    cache_key = (parameter_name, region)
+
+    with _parameter_cache_lock:
+        cached = _parameter_cache.get(cache_key)
+
+        if refresh is False and cached is not None and \
+                get_time_now() - cached.get("FetchedAt") < params.DEFAULT_PARAMETER_CACHE_SECONDS:
+            return cached.get("Value")
+
+        _pstore_client = _ssm_clients.get(region)
+        if _pstore_client is None:
+            _pstore_client = boto3.client('ssm', region_name=region)
+            _ssm_clients[region] = _pstore_client
+
+    _password_response = _pstore_client.get_parameter(Name=parameter_name, WithDecryption=True)
 
     if _password_response is None:
         raise DetailedException(f"Unable to connect to SSM Parameter Store in {region}")
     else:
         _pwd = _password_response.get('Parameter').get('Value')
+
+        with _parameter_cache_lock:
+            _parameter_cache[cache_key] = {"Value": _pwd, "FetchedAt": get_time_now()}
+
         return _pwd
 
 
@@ -461,44 +492,233 @@ def verify_crawler(table_name, crawler_rolename, catalog_db, datasource_type: st
                 pass
 
 
-def pivot_resultset_into_json(rows: list, column_spec: list, type_map: dict = None):
-    def _handle_item(item: list) -> dict:
-        obj = {}
-        for i, c in enumerate(column_spec):
-            # skip null responses
-            if item[i] is None:
-                pass
-            else:
-                # special handling for found types including boolean (returned as '0' or '1') and datetime
-                if type(item[i]) == str:
-                    if item[i].lower() != 'null' and type_map.get(c) == 'boolean':
-                        obj[c] = strtobool(item[i])
-                elif type(item[i]) == datetime.datetime:
-                    obj[c] = item[i].strftime(params.DEFAULT_DATE_FORMAT)
+def _to_bool(value):
+    # native boolean columns are returned as bool, and legacy char(1) flags as '0' or '1'
+    if type(value) == bool:
+        return value
+    elif type(value) == str and value.lower() != 'null':
+        return strtobool(value)
+    else:
+        return value
 
-            # no special handling or null schema, so set the object value to the returned type
-            if c not in obj:
-                obj[c] = item[i]
 
-        return obj
+def _to_date_string(value):
+    if type(value) == datetime.datetime:
+        return value.strftime(params.DEFAULT_DATE_FORMAT)
+    else:
+        return value
 
-    output = None
 
-    if len(rows) == 1:
-        output = _handle_item(rows[0])
+def _from_document(value):
+    # pg8000 decodes jsonb columns, while asyncpg returns their text
+    if type(value) == str:
+        return json.loads(value)
     else:
+        return value
+
+
+_column_converters = {
+    'boolean': _to_bool,
+    'datetime': _to_date_string,
+    'object': _from_document,
+    'array': _from_document
+}
+
+
+def compile_row_converter(column_spec: list, type_map: dict = None):
+    '''Build a function which converts a list of result set rows into a list of dicts keyed by column_spec. Conversion
+    functions are resolved once per column from the type_map, so that converting a result set only touches the
+    columns which need it. Rows which are None are skipped, and the output is always a list
+    '''
+    columns = tuple(column_spec)
+    converted = tuple((i, c, _column_converters.get(type_map.get(c))) for i, c in enumerate(columns) if
+                      type_map is not None and type_map.get(c) in _column_converters)
+
+    def _convert(rows: list) -> list:
         output = []
 
         for r in rows:
             if r is not None:
-                obj = _handle_item(r)
+                obj = dict(zip(columns, r))
+
+                for i, c, f in converted:
+                    if r[i] is not None:
+                        obj[c] = f(r[i])
+
                 output.append(obj)
 
-    return output
+        return output
+
+    return _convert
+
+
+def _decode_number(value: str):
+    # DynamoDB numbers are decoded as int where they are integral, so that documents serialise as JSON numbers
+    try:
+        return int(value)
+    except ValueError:
+        return float(value)
+
+
+def decode_attribute(value: dict):
+    '''Decode a DynamoDB attribute value into a JSON type, as boto3's TypeDeserializer does but without Decimals or
+    Sets. Binary values are left base64 encoded, as they are delivered in stream events
+    '''
+    (t, v), = value.items()
+
+    if t == 'S' or t == 'BOOL' or t == 'B':
+        return v
+    elif t == 'N':
+        return _decode_number(v)
+    elif t == 'NULL':
+        return None
+    elif t == 'M':
+        return {k: decode_attribute(a) for k, a in v.items()}
+    elif t == 'L':
+        return [decode_attribute(a) for a in v]
+    elif t == 'SS' or t == 'BS':
+        return list(v)
+    elif t == 'NS':
+        return [_decode_number(n) for n in v]
+    else:
+        raise exceptions.InvalidArgumentsException(f"Unable to decode DynamoDB Type {t}")
+
+
+def _compile_attribute_decoder(spec: dict):
+    # resolve a decoder for a JSON schema property, which reads the expected DynamoDB type directly and falls back to
+    # the generic decoder for nulls and values which don't match the schema
+    p_type = spec.get("type") if spec is not None else None
+    p_type = p_type.lower() if isinstance(p_type, str) else None
+
+    if p_type == 'string':
+        def _decode(value: dict):
+            v = value.get('S')
+            return v if v is not None else decode_attribute(value)
+    elif p_type == 'integer':
+        def _decode(value: dict):
+            v = value.get('N')
+            return int(v) if v is not None and v.lstrip('-').isdigit() else decode_attribute(value)
+    elif p_type == 'number':
+        def _decode(value: dict):
+            v = value.get('N')
+            return float(v) if v is not None else decode_attribute(value)
+    elif p_type == 'boolean':
+        # numeric flags, such as the DynamoDB deleted attribute, are decoded as booleans
+        def _decode(value: dict):
+            v = value.get('BOOL')
+            if v is not None:
+                return v
+            else:
+                n = value.get('N')
+                return float(n) != 0 if n is not None else decode_attribute(value)
+    elif p_type == 'object' and spec.get('properties') is not None:
+        decode_object = compile_stream_decoder(spec)
+
+        def _decode(value: dict):
+            v = value.get('M')
+            return decode_object(v) if v is not None else decode_attribute(value)
+    elif p_type == 'array' and isinstance(spec.get('items'), dict):
+        decode_item = _compile_attribute_decoder(spec.get('items'))
+
+        def _decode(value: dict):
+            v = value.get('L')
+            return [decode_item(i) for i in v] if v is not None else decode_attribute(value)
+    else:
+        _decode = decode_attribute
+
+    return _decode
+
+
+def compile_stream_decoder(schema: dict = None):
+    '''Build a function which decodes a DynamoDB stream image into a typed document. Decoders are resolved once per
+    attribute from the JSON schema's properties, and attributes which are not in the schema are decoded generically
+    '''
+    properties = schema.get("properties") if schema is not None else None
+    decoders = {} if properties is None else {k: _compile_attribute_decoder(v) for k, v in properties.items()}
+
+    def _decode(image: dict) -> dict:
+        output = {}
+
+        for k, v in image.items():
+            f = decoders.get(k)
+            output[k] = decode_attribute(v) if f is None else f(v)
+
+        return output
+
+    return _decode
+
+
+def _es_attribute_mapping(spec: dict):
+    # map a JSON schema property to an ElasticSearch field mapping, or None where the type is left to dynamic mapping.
+    # Strings are analysed as text unless they are annotated or enumerated as keywords, and blobs are not indexed
+    if spec is None:
+        return None
+
+    p_type = spec.get("type")
+    if isinstance(p_type, list):
+        p_type = next((t for t in p_type if t != 'null'), None)
+    p_type = p_type.lower() if isinstance(p_type, str) else None
+    annotation = spec.get(params.SCHEMA_SEARCH_MAPPING)
+
+    if annotation == params.SEARCH_MAPPING_DISABLED:
+        # disabled attributes are kept in the source document, but aren't indexed or held in doc values
+        if p_type in ['object', 'array']:
+            return {"type": "object", "enabled": False}
+        else:
+            scalar = {'integer': 'long', 'number': 'double', 'boolean': 'boolean'}.get(p_type, 'keyword')
+            return {"type": scalar, "index": False, "doc_values": False}
+    elif p_type == 'string':
+        if spec.get("contentEncoding") is not None:
+            return {"type": "binary"}
+        elif spec.get("format") in ["date", "date-time"]:
+            return {"type": "date"}
+        elif annotation == params.SEARCH_MAPPING_KEYWORD or (annotation is None and "enum" in spec):
+            return {"type": "keyword"}
+        else:
+            return {"type": "text"}
+    elif p_type == 'integer':
+        return {"type": "long"}
+    elif p_type == 'number':
+        return {"type": "double"}
+    elif p_type == 'boolean':
+        return {"type": "boolean"}
+    elif p_type == 'object':
+        properties = spec.get("properties")
+        if properties is None:
+            return {"type": "object"}
+        else:
+            mapped = {k: _es_attribute_mapping(v) for k, v in properties.items()}
+            return {"properties": {k: v for k, v in mapped.items() if v is not None}}
+    elif p_type == 'array':
+        # ElasticSearch fields hold arrays of their type
+        return _es_attribute_mapping(spec.get("items"))
+    else:
+        return None
+
+
+def generate_es_mapping(schema: dict = None) -> dict:
+    '''Build an ElasticSearch index mapping from a JSON schema, with an explicit field mapping for each property which
+    has a type. Strings are text unless annotated with searchMapping 'keyword', and properties annotated 'disabled', or
+    with a contentEncoding, are not indexed. Attributes which aren't in the schema are mapped dynamically, with strings
+    as text rather than text with a keyword sub field, and aren't indexed if the schema has no additionalProperties
+    '''
+    properties = schema.get("properties") if schema is not None else None
+    mapped = {} if properties is None else {k: _es_attribute_mapping(v) for k, v in properties.items()}
+
+    mapping = {
+        "dynamic_templates": [{"strings": {"match_mapping_type": "string", "mapping": {"type": "text"}}}],
+        "properties": {k: v for k, v in mapped.items() if v is not None}
+    }
+
+    if schema is not None and schema.get("additionalProperties") is False:
+        mapping["dynamic"] = False
+
+    return mapping
 
 
-def json_to_pg(p_name: str, p_spec: dict, p_required: dict, pk_name: str) -> str:
-    '''Convert a JSON type to a Postgres type with nullability spec
+def json_to_pg(p_name: str, p_spec: dict, p_required: dict, pk_name: str, inline_pk: bool = True) -> str:
+    '''Convert a JSON type to a Postgres type with nullability spec. Tables with a composite primary key declare it
+    as a table constraint, and so the primary key column is only marked NOT NULL when inline_pk is False
     '''
     base = None
     if p_spec is not None:
@@ -511,14 +731,15 @@ def json_to_pg(p_name: str, p_spec: dict, p_required: dict, pk_name: str) -> str
         elif p_type.lower() == 'integer':
             base = 'integer'
         elif p_type.lower() == 'boolean':
-            base = 'char(1) DEFAULT 0'
-            return base
+            base = 'boolean'
+        elif p_type.lower() in ['object', 'array']:
+            base = 'jsonb'
         else:
             raise exceptions.UnimplementedFeatureException(f"Type {p_type} not translatable to RDBMS types")
 
         # process null/not null
         if p_name.lower() == pk_name:
-            base += ' NOT NULL PRIMARY KEY'
+            base += ' NOT NULL PRIMARY KEY' if inline_pk is True else ' NOT NULL'
         elif p_name in p_required:
             base += ' NOT NULL'
         else:
@@ -0,0 +1,330 @@
+import unittest
+import sys
+import json
+import base64
+import logging
+
+sys.path.append("../chalicelib")
+
+import chalicelib.aws_data_api as ada
+import chalicelib.parameters as params
+from elasticsearch.exceptions import TransportError
+from chalicelib.aws_data_api import AwsDataAPI
+from chalicelib.exceptions import InvalidArgumentsException
+
+_table_name = 'SearchTest-dev'
+_index_name = f"awsdataapi-{_table_name.lower()}-resource"
+
+
+def _hits(count: int) -> list:
+    return [{'_id': str(i), '_score': 1.0, '_source': {'document_id': str(i), 'n': i}} for i in range(count)]
+
+
+class Transport:
+    '''ElasticSearch transport which opens points in time, or fails with a status where they aren't supported'''
+
+    def __init__(self, pit_status: int = None):
+        self.requests = []
+        self._pit_status = pit_status
+
+    def perform_request(self, method, url, params=None, body=None):
+        self.requests.append((method, url))
+        if method == 'POST' and self._pit_status is not None:
+            raise TransportError(self._pit_status, 'illegal_argument_exception', 'no handler found for uri')
+
+        return {'id': 'pit-0'}
+
+
+class SearchClient:
+    '''ElasticSearch client over a list of hits, which pages with search_after against a point in time or with a
+    scroll. Each request renews the search context with a new id'''
+
+    def __init__(self, hits: list, pit_status: int = None):
+        self.searches = []
+        self.cleared = []
+        self.transport = Transport(pit_status)
+        self._hits = hits
+        self._scrolls = {}
+
+    def _page(self, start: int, size: int) -> list:
+        return [dict(h, sort=[h.get('_score'), n]) for n, h in enumerate(self._hits) if start <= n < start + size]
+
+    def search(self, index=None, body=None, scroll=None):
+        self.searches.append((index, json.loads(json.dumps(body)), scroll))
+        size = body.get('size', 10)
+        if scroll is not None:
+            scroll_id = f"scroll-{len(self.searches)}"
+            self._scrolls[scroll_id] = (size, size)
+            return {'_scroll_id': scroll_id, 'hits': {'hits': self._page(0, size)}}
+        else:
+            start = body['search_after'][1] + 1 if 'search_after' in body else 0
+            return {'pit_id': f"pit-{len(self.searches)}", 'hits': {'hits': self._page(start, size)}}
+
+    def scroll(self, scroll_id, scroll):
+        position, size = self._scrolls.pop(scroll_id)
+        scroll_id = f"{scroll_id}-{position}"
+        self._scrolls[scroll_id] = (position + size, size)
+        return {'_scroll_id': scroll_id, 'hits': {'hits': self._page(position, size)}}
+
+    def clear_scroll(self, scroll_id):
+        self.cleared.append(scroll_id)
+
+
+class StorageHandler:
+    '''Storage handler which searches a list of hits by offset, and reads Items by id. Deleted Items aren't found'''
+
+    def __init__(self, hits: list = None, items: dict = None):
+        self.searches = []
+        self.batch_gets = []
+        self._hits = hits
+        self._items = {} if items is None else items
+
+    def batch_get(self, ids, suppress_meta_fetch=False, consistent_read=False):
+        self.batch_gets.append(ids)
+        return {params.ITEMS: [self._items[x] for x in ids if x in self._items],
+                params.NOT_FOUND: [x for x in ids if x not in self._items]}
+
+    def search(self, search_type, body):
+        self.searches.append(dict(body))
+        start = body.get('from', 0)
+        return {'hits': {'total': {'value': len(self._hits), 'relation': 'eq'},
+                         'hits': self._hits[start:start + body.get('size', 10)]}}
+
+
+class S3Client:
+    '''S3 client which records objects and multipart uploads, and can fail to upload a part'''
+
+    def __init__(self, fail_part: int = None):
+        self.objects = {}
+        self.uploads = {}
+        self.completed = []
+        self.aborted = []
+        self._fail_part = fail_part
+
+    def put_object(self, Bucket, Key, Body):
+        self.objects[f"{Bucket}/{Key}"] = Body
+
+    def create_multipart_upload(self, Bucket, Key):
+        upload_id = f"upload-{len(self.uploads)}"
+        self.uploads[upload_id] = []
+        return {'UploadId': upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        if PartNumber == self._fail_part:
+            raise ConnectionError("Connection reset by peer")
+        self.uploads[UploadId].append(Body)
+        return {'ETag': f"etag-{PartNumber}"}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        assert [p['PartNumber'] for p in MultipartUpload['Parts']] == list(range(1, len(self.uploads[UploadId]) + 1))
+        self.objects[f"{Bucket}/{Key}"] = b"".join(self.uploads.pop(UploadId))
+        self.completed.append(len(MultipartUpload['Parts']))
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.aborted.append(UploadId)
+        self.uploads.pop(UploadId)
+
+
+class AwsDataApiSearchTest(unittest.TestCase):
+    def _api(self, search_client: SearchClient = None, storage_handler: StorageHandler = None,
+             s3_client: S3Client = None):
+        api = AwsDataAPI.__new__(AwsDataAPI)
+        api._logger = logging.getLogger("AwsDataApiSearchTest")
+        api._caller_identity = 'AwsDataApiSearchTest'
+        api._api_name = 'SearchTest'
+        api._table_name = _table_name
+        api._pk_name = 'id'
+        api._es_client = search_client
+        api._storage_handler = storage_handler
+        api._s3_client = s3_client
+        if storage_handler is not None:
+            api._full_config = {params.STORAGE_HANDLER: params.RDBMS_STORAGE_HANDLER}
+            api._search_config = None
+        else:
+            api._full_config = {}
+            api._search_config = {'ElasticSearchDomain': {'ElasticSearchEndpoint': 'search-searchtest'}}
+        return api
+
+    def _search_all(self, api: AwsDataAPI, size: int, search_type: str = params.RESOURCE):
+        # page through a search, returning the ids of each page and the tokens between them
+        pages = []
+        tokens = []
+        token = None
+        while True:
+            response = api.search(search_type, query={'size': size}, Paginate='true', ExclusiveStartKey=token)[
+                search_type]
+            pages.append([h['_id'] for h in response['hits']['hits']])
+            token = response[params.LAST_EVALUATED_KEY]
+            if token is None:
+                return pages, tokens
+            tokens.append(token)
+
+    def setUp(self):
+        self._part_bytes = ada.SEARCH_EXPORT_PART_BYTES
+
+    def tearDown(self):
+        ada.SEARCH_EXPORT_PART_BYTES = self._part_bytes
+
+    def test_search_after(self):
+        search_client = SearchClient(_hits(25))
+        pages, tokens = self._search_all(self._api(search_client), 10)
+        self.assertEqual([[str(i) for i in range(s, min(s + 10, 25))] for s in [0, 10, 20]], pages)
+
+        # tokens carry the renewed point in time and the sort values of the last hit of the page
+        self.assertEqual([{'t': params.RESOURCE, 'pit': 'pit-1', 'after': [1.0, 9]},
+                          {'t': params.RESOURCE, 'pit': 'pit-2', 'after': [1.0, 19]}],
+                         [json.loads(base64.urlsafe_b64decode(t)) for t in tokens])
+
+        # point in time searches aren't addressed to the index, and continue after the previous page
+        self.assertEqual([('POST', f"/{_index_name}/_pit"), ('DELETE', '/_pit')], search_client.transport.requests)
+        self.assertEqual([None, None, None], [s[0] for s in search_client.searches])
+        self.assertEqual(['pit-0', 'pit-1', 'pit-2'], [s[1]['pit']['id'] for s in search_client.searches])
+        self.assertEqual([None, [1.0, 9], [1.0, 19]], [s[1].get('search_after') for s in search_client.searches])
+        self.assertEqual([{'_score': 'desc'}], search_client.searches[0][1]['sort'])
+
+    def test_scroll_fallback(self):
+        for status in [400, 404]:
+            search_client = SearchClient(_hits(25), pit_status=status)
+            api = self._api(search_client)
+            pages, tokens = self._search_all(api, 10)
+            self.assertEqual([[str(i) for i in range(s, min(s + 10, 25))] for s in [0, 10, 20]], pages)
+
+            # the scroll is opened against the index, and released once exhausted
+            self.assertFalse(api._pit_supported)
+            self.assertEqual([(_index_name, {'size': 10}, params.DEFAULT_SEARCH_KEEP_ALIVE)], search_client.searches)
+            self.assertEqual(10, json.loads(base64.urlsafe_b64decode(tokens[0]))['size'])
+            self.assertEqual(1, len(search_client.cleared))
+
+            # later searches don't try to open a point in time
+            self._search_all(api, 10)
+            self.assertEqual([('POST', f"/{_index_name}/_pit")], search_client.transport.requests)
+
+    def test_rdbms_offset_paging(self):
+        storage_handler = StorageHandler(_hits(25))
+        pages, tokens = self._search_all(self._api(storage_handler=storage_handler), 10)
+        self.assertEqual([[str(i) for i in range(s, min(s + 10, 25))] for s in [0, 10, 20]], pages)
+        self.assertEqual([0, 10, 20], [s['from'] for s in storage_handler.searches])
+
+        # exact pages end with an empty page
+        storage_handler = StorageHandler(_hits(20))
+        pages, tokens = self._search_all(self._api(storage_handler=storage_handler), 10)
+        self.assertEqual([10, 10, 0], [len(p) for p in pages])
+
+    def test_search_token(self):
+        api = self._api(SearchClient(_hits(25)))
+        response = api.search(params.RESOURCE, query={'size': 10}, Paginate='true')[params.RESOURCE]
+        token = response[params.LAST_EVALUATED_KEY]
+        self.assertEqual(params.RESOURCE, AwsDataAPI._decode_search_token(token, params.RESOURCE)['t'])
+
+        # tokens can't be used to page a different search type, and invalid tokens are rejected
+        with self.assertRaises(InvalidArgumentsException):
+            api.search(params.METADATA, query={'size': 10}, ExclusiveStartKey=token)
+        for invalid in ['not a token', AwsDataAPI._encode_search_token(['Resource'])]:
+            with self.assertRaises(InvalidArgumentsException):
+                AwsDataAPI._decode_search_token(invalid, params.RESOURCE)
+
+        # paginated searches must have a search type
+        with self.assertRaises(InvalidArgumentsException):
+            api.search(None, Paginate='true')
+
+    def test_merge_search_results(self):
+        def _response(ids: list, total: int, took: int):
+            return {'took': took, 'hits': {'total': {'value': total, 'relation': 'eq'}, 'hits': [
+                {'_id': x, '_score': 1.0, '_source': {'document_id': x}} for x in ids]}}
+
+        # item 1 matches in both indexes, and ranks first with the sum of its scores
+        output = AwsDataAPI._merge_search_results({params.RESOURCE: _response(['0', '1'], 2, 3),
+                                                   params.METADATA: _response(['1-meta', '2-meta'], 2, 5)})
+        self.assertEqual(['1', '0', '2'], [h['_id'] for h in output['hits']['hits']])
+        self.assertEqual([2.0, 1.0, 1.0], [h['_score'] for h in output['hits']['hits']])
+        self.assertEqual('1-meta', output['hits']['hits'][0][params.METADATA]['_id'])
+        self.assertEqual(5, output['took'])
+
+        # every hit was returned, so the total is the number of merged items
+        self.assertEqual({'value': 3, 'relation': 'eq'}, output['hits']['total'])
+
+        # otherwise items matching in both indexes can't be counted, so the total is a lower bound
+        output = AwsDataAPI._merge_search_results({params.RESOURCE: _response(['0', '1'], 40, 3),
+                                                   params.METADATA: _response(['1-meta', '2-meta'], 25, 5)})
+        self.assertEqual({'value': 40, 'relation': 'gte'}, output['hits']['total'])
+
+        output = AwsDataAPI._merge_search_results({params.RESOURCE: _response(['0', '1'], 40, 3)})
+        self.assertEqual({'value': 40, 'relation': 'eq'}, output['hits']['total'])
+
+    def test_hydrate_search_results(self):
+        items = {x: {params.RESOURCE: {'id': x, 'attr': x * 2}} for x in ['0', '2', '3']}
+        storage_handler = StorageHandler(items=items)
+        api = self._api(SearchClient([]))
+        api._storage_handler = storage_handler
+
+        # hits are replaced by their items in ranking order with a single read, dropping items which aren't found
+        response = {'took': 3, 'hits': {'total': {'value': 4, 'relation': 'eq'}, 'max_score': 4.0, 'hits': [
+            {'_id': x, '_score': 4.0 - n, '_source': {'document_id': x}} for n, x in enumerate(['3', '1', '0', '2'])]}}
+        output = api._hydrate_search_results(response, params.RESOURCE)
+        self.assertEqual([['3', '1', '0', '2']], storage_handler.batch_gets)
+        self.assertEqual(['3', '0', '2'], [h['_id'] for h in output['hits']['hits']])
+        self.assertEqual([items['3'], items['0'], items['2']], [h[params.ITEM] for h in output['hits']['hits']])
+        self.assertEqual([4.0, 2.0, 1.0], [h['_score'] for h in output['hits']['hits']])
+        self.assertNotIn('_source', output['hits']['hits'][0])
+        self.assertEqual(3, output['took'])
+        self.assertEqual(4, len(response['hits']['hits']))
+
+        # metadata hits are read by the id of the item which they describe
+        response = {'hits': {'hits': [{'_id': f"{x}-meta", '_score': 1.0, '_source': {'document_id': f"{x}-meta"}}
+                                      for x in ['2', '1', '0']]}}
+        output = api._hydrate_search_results(response, params.METADATA)
+        self.assertEqual(['2', '1', '0'], storage_handler.batch_gets[-1])
+        self.assertEqual(['2', '0'], [h['_id'] for h in output['hits']['hits']])
+        self.assertEqual(items['2'], output['hits']['hits'][0][params.ITEM])
+
+        # merged hits are already keyed by item id, and drop the hits which they were merged from
+        merged = AwsDataAPI._merge_search_results({
+            params.RESOURCE: {'hits': {'hits': [{'_id': '0', '_score': 1.0, '_source': {'document_id': '0'}}]}},
+            params.METADATA: {'hits': {'hits': [{'_id': '3-meta', '_score': 2.0, '_source': {'document_id': '3-meta'}},
+                                                {'_id': '0-meta', '_score': 2.0,
+                                                 '_source': {'document_id': '0-meta'}}]}}})
+        output = api._hydrate_search_results(merged)
+        self.assertEqual(['0', '3'], [h['_id'] for h in output['hits']['hits']])
+        self.assertEqual([3.0, 2.0], [h['_score'] for h in output['hits']['hits']])
+        self.assertNotIn(params.RESOURCE, output['hits']['hits'][0])
+        self.assertNotIn(params.METADATA, output['hits']['hits'][0])
+
+    def test_search_export(self):
+        # small exports are written with a single put
+        s3_client = S3Client()
+        output = self._api(SearchClient(_hits(25)), s3_client=s3_client).search_export(
+            params.RESOURCE, S3ExportPath='s3://exports/searches/', query={'size': 10})
+        self.assertEqual(25, output['Count'])
+        self.assertTrue(output[params.EXPORT_S3_PATH].startswith('s3://exports/searches/SearchTest-Resource-'))
+        body = s3_client.objects[output[params.EXPORT_S3_PATH][len('s3://'):]]
+        self.assertEqual(list(range(25)), [json.loads(line)['n'] for line in body.decode('utf-8').splitlines()])
+        self.assertEqual([], s3_client.completed)
+
+        # larger exports stream pages into a multipart upload
+        ada.SEARCH_EXPORT_PART_BYTES = 100
+        s3_client = S3Client()
+        output = self._api(SearchClient(_hits(25)), s3_client=s3_client).search_export(
+            params.RESOURCE, S3ExportPath='s3://exports', query={'size': 10})
+        self.assertEqual(25, output['Count'])
+        self.assertTrue(output[params.EXPORT_S3_PATH].startswith('s3://exports/SearchTest-Resource-'))
+        body = s3_client.objects[output[params.EXPORT_S3_PATH][len('s3://'):]]
+        self.assertEqual(list(range(25)), [json.loads(line)['n'] for line in body.decode('utf-8').splitlines()])
+        self.assertEqual([3], s3_client.completed)
+
+        # multipart uploads are aborted when the export fails
+        s3_client = S3Client(fail_part=2)
+        with self.assertRaises(ConnectionError):
+            self._api(SearchClient(_hits(25)), s3_client=s3_client).search_export(
+                params.RESOURCE, S3ExportPath='s3://exports', query={'size': 10})
+        self.assertEqual(['upload-0'], s3_client.aborted)
+        self.assertEqual({}, s3_client.objects)
+
+        # exports must be written to an s3 location
+        for path in [None, 'exports/searches', 's3:///searches']:
+            with self.assertRaises(InvalidArgumentsException):
+                self._api(SearchClient(_hits(25)), s3_client=S3Client()).search_export(params.RESOURCE,
+                                                                                        S3ExportPath=path)
+
+
+if __name__ == '__main__':
+    unittest.main()
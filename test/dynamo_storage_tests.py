@@ -0,0 +1,111 @@
+import unittest
+import sys
+import logging
+
+sys.path.append("../chalicelib")
+
+import chalicelib.parameters as params
+import chalicelib.dynamo_data_api as dda
+from chalicelib.dynamo_data_api import DataAPIStorageHandler
+from chalicelib.exceptions import DetailedException
+
+_table_name = 'DynamoTest-dev'
+_meta_table_name = f"{_table_name}-Metadata"
+
+
+class Table:
+    def __init__(self, name: str):
+        self.name = name
+
+
+class DynamoResource:
+    '''DynamoDB resource over tables of items by id, which leaves the last key of each table unprocessed while it is
+    throttled'''
+
+    def __init__(self, tables: dict, throttled_requests: int = 0):
+        self.requests = []
+        self._tables = tables
+        self._throttled_requests = throttled_requests
+
+    def batch_get_item(self, RequestItems):
+        self.requests.append({k: len(v['Keys']) for k, v in RequestItems.items()})
+        if sum(self.requests[-1].values()) > dda.BATCH_GET_LIMIT:
+            raise ValueError("Too many items requested for the BatchGetItem call")
+
+        responses = {}
+        unprocessed = {}
+        for table_name, request in RequestItems.items():
+            keys = request['Keys']
+            if len(self.requests) <= self._throttled_requests:
+                unprocessed[table_name] = dict(request, Keys=keys[-1:])
+                keys = keys[:-1]
+
+            responses[table_name] = [dict(self._tables[table_name][k['id']]) for k in keys if
+                                     k['id'] in self._tables[table_name]]
+
+        return {'Responses': responses, 'UnprocessedKeys': unprocessed}
+
+
+class DynamoStorageTest(unittest.TestCase):
+    def _handler(self, dynamo_resource: DynamoResource):
+        handler = DataAPIStorageHandler.__new__(DataAPIStorageHandler)
+        handler._logger = logging.getLogger("DynamoStorageTest")
+        handler._table_name = _table_name
+        handler._pk_name = 'id'
+        handler._deployed_account = '123456789012'
+        handler._resource_table = Table(_table_name)
+        handler._metadata_table = Table(_meta_table_name)
+        handler._dynamo_resource = dynamo_resource
+        return handler
+
+    def _tables(self, count: int, deleted: list = None) -> dict:
+        return {
+            _table_name: {str(i): {'id': str(i), 'attr': i, params.DELETED: 1 if i in (deleted or []) else 0} for i in
+                          range(count)},
+            _meta_table_name: {f"{i}-meta": {'id': f"{i}-meta", 'CostCenter': str(i)} for i in range(count)}
+        }
+
+    def test_batch_get_chunks(self):
+        # each id reads its resource and metadata, so requests are chunked to half the key limit
+        dynamo_resource = DynamoResource(self._tables(120))
+        output = self._handler(dynamo_resource).batch_get(ids=[str(i) for i in range(120)])
+        self.assertEqual([{_table_name: 50, _meta_table_name: 50}, {_table_name: 50, _meta_table_name: 50},
+                          {_table_name: 20, _meta_table_name: 20}], dynamo_resource.requests)
+        self.assertEqual(120, len(output[params.ITEMS]))
+        self.assertEqual({'CostCenter': '7'}, output[params.ITEMS][7][params.METADATA])
+
+        # without metadata, chunks use the full key limit
+        dynamo_resource = DynamoResource(self._tables(120))
+        output = self._handler(dynamo_resource).batch_get(ids=[str(i) for i in range(120)], suppress_meta_fetch=True)
+        self.assertEqual([{_table_name: 100}, {_table_name: 20}], dynamo_resource.requests)
+        self.assertEqual(120, len(output[params.ITEMS]))
+        self.assertNotIn(params.METADATA, output[params.ITEMS][0])
+
+    def test_batch_get_unprocessed_keys(self):
+        # unprocessed keys are retried until they are read
+        dynamo_resource = DynamoResource(self._tables(10), throttled_requests=2)
+        output = self._handler(dynamo_resource).batch_get(ids=[str(i) for i in range(10)])
+        self.assertEqual([{_table_name: 10, _meta_table_name: 10}, {_table_name: 1, _meta_table_name: 1},
+                          {_table_name: 1, _meta_table_name: 1}], dynamo_resource.requests)
+        self.assertEqual([str(i) for i in range(10)], [i[params.RESOURCE]['id'] for i in output[params.ITEMS]])
+        self.assertEqual('9', output[params.ITEMS][9][params.METADATA]['CostCenter'])
+
+        # and the batch get fails once the retries are exhausted
+        dynamo_resource = DynamoResource(self._tables(10), throttled_requests=params.DEFAULT_RETRY_COUNT)
+        with self.assertRaises(DetailedException):
+            self._handler(dynamo_resource).batch_get(ids=[str(i) for i in range(10)])
+        self.assertEqual(params.DEFAULT_RETRY_COUNT, len(dynamo_resource.requests))
+
+    def test_batch_get_not_found(self):
+        # deleted and missing items are not found, and items are returned once each in the order requested
+        output = self._handler(DynamoResource(self._tables(5, deleted=[1]))).batch_get(ids=['3', '1', 'x', '0', '3'])
+        self.assertEqual(['3', '0'], [i[params.RESOURCE]['id'] for i in output[params.ITEMS]])
+        self.assertEqual(['1', 'x'], output[params.NOT_FOUND])
+        self.assertEqual({'CostCenter': '3'}, output[params.ITEMS][0][params.METADATA])
+
+        self.assertEqual({params.ITEMS: [], params.NOT_FOUND: []},
+                         self._handler(DynamoResource(self._tables(0))).batch_get(ids=[]))
+
+
+if __name__ == '__main__':
+    unittest.main()
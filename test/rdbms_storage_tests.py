@@ -83,9 +83,12 @@ class RdbmsStorageTests(unittest.TestCase):
     }
 
     def create_storage_handler(self, with_name: str, resource_schema: dict, metadata_schema: dict,
-                               override_metaname: str = None) -> DataAPIStorageHandler:
+                               override_metaname: str = None, cluster_address: str = None,
+                               reader_address: str = None, async_engine: bool = False,
+                               table_indexes: list = None, partitioning: dict = None,
+                               text_search: bool = False, change_feed: bool = False) -> DataAPIStorageHandler:
         other_args = {
-            params.CLUSTER_ADDRESS: self._cluster_address,
+            params.CLUSTER_ADDRESS: self._cluster_address if cluster_address is None else cluster_address,
             params.CLUSTER_PORT: self._cluster_port,
             params.DB_USERNAME: self._cluster_user,
             params.DB_NAME: self._cluster_db,
@@ -93,7 +96,10 @@ class RdbmsStorageTests(unittest.TestCase):
             params.DB_USE_SSL: False,
             params.CONTROL_TYPE_RESOURCE_SCHEMA: resource_schema,
             params.CONTROL_TYPE_METADATA_SCHEMA: metadata_schema,
-            params.RDBMS_DIALECT: engine_types.DIALECT_PG
+            params.RDBMS_DIALECT: engine_types.DIALECT_PG,
+            params.RDBMS_ASYNC_ENGINE: async_engine,
+            params.RDBMS_TEXT_SEARCH: text_search,
+            params.RDBMS_CHANGE_FEED: change_feed
         }
 
         other_args.update(self._networking_config)
@@ -101,12 +107,19 @@ class RdbmsStorageTests(unittest.TestCase):
         if override_metaname is not None:
             other_args[params.OVERRIDE_METADATA_TABLENAME] = override_metaname
 
+        if reader_address is not None:
+            other_args[params.READER_CLUSTER_ADDRESS] = reader_address
+
+        if partitioning is not None:
+            other_args.update(partitioning)
+
         sts_client = boto3.client('sts')
         account = sts_client.get_caller_identity().get('Account')
         handler = DataAPIStorageHandler(table_name=with_name, primary_key_attribute="id",
                                         region="eu-west-1",
                                         delete_mode=params.DELETE_MODE_HARD, allow_runtime_delete_mode_change=True,
-                                        table_indexes=["attr2"], metadata_indexes=None,
+                                        table_indexes=["attr2"] if table_indexes is None else table_indexes,
+                                        metadata_indexes=None,
                                         crawler_rolename="DataAPICrawlerRole",
                                         catalog_database='data-api', allow_non_itemmaster_writes=False,
                                         strict_occv=True,
@@ -141,15 +154,15 @@ class RdbmsStorageTests(unittest.TestCase):
         self.assertEqual(8, len(updates))
         self.assertEqual(updates[0], "a = '12345'")
         self.assertEqual(updates[1], 'b = 999')
-        self.assertEqual(updates[2], 'c = 0')
-        self.assertEqual(updates[3], 'd = 1')
+        self.assertEqual(updates[2], 'c = FALSE')
+        self.assertEqual(updates[3], 'd = TRUE')
 
         update_statement = self._storage_handler._create_update_statement(table_ref='my_table', pk_name="id",
                                                                           input=input, item_id="123",
                                                                           caller_identity=self._caller_identity)
 
         self.assertEqual(update_statement,
-                         "update my_table set a = '12345',b = 999,c = 0,d = 1,last_update_action = 'update',last_update_date = CURRENT_TIMESTAMP,last_updated_by = 'bob',item_version = item_version+1 where id = '123' and deleted = FALSE")
+                         "update my_table set a = '12345',b = 999,c = FALSE,d = TRUE,last_update_action = 'update',last_update_date = CURRENT_TIMESTAMP,last_updated_by = 'bob',item_version = item_version+1 where id = '123' and deleted = FALSE")
 
     def test_insert_clause(self):
         input = {
@@ -175,14 +188,14 @@ class RdbmsStorageTests(unittest.TestCase):
         self.assertEqual(values[0], f"'{self._item_id}'")
         self.assertEqual(values[1], "'12345'")
         self.assertEqual(values[2], 999)
-        self.assertEqual(values[3], 0)
-        self.assertEqual(values[4], 1)
+        self.assertEqual(values[3], 'FALSE')
+        self.assertEqual(values[4], 'TRUE')
 
         insert = self._storage_handler._create_insert_statement(table_ref='mytable', pk_name="id",
                                                                 pk_value=self._item_id, input=input,
                                                                 caller_identity=self._caller_identity)
         self.assertEqual(insert,
-                         f"insert into mytable (id,a,b,c,d,item_version,last_update_action,last_update_date,last_updated_by) values ('{self._item_id}','12345',999,0,1,0,'create',CURRENT_TIMESTAMP,'{self._caller_identity}')")
+                         f"insert into mytable (id,a,b,c,d,item_version,last_update_action,last_update_date,last_updated_by) values ('{self._item_id}','12345',999,FALSE,TRUE,0,'create',CURRENT_TIMESTAMP,'{self._caller_identity}')")
 
     def test_check_no_object(self):
         with self.assertRaises(exceptions.ResourceNotFoundException):
@@ -233,6 +246,63 @@ class RdbmsStorageTests(unittest.TestCase):
         self.assertEqual(metadata_ovrr, handler._metadata_table_name)
         _teardown(handler)
 
+    @unittest.skipUnless(params.READER_CLUSTER_ADDRESS in os.environ, "No Reader Cluster Address configured")
+    def test_reader_routing(self):
+        # the reader is a separate database which doesn't replicate from the writer, so a read which is routed to
+        # the reader cannot see writes made through the handler unless it is pinned to the writer
+        reader_address = os.environ[params.READER_CLUSTER_ADDRESS]
+        reader_only = self.create_storage_handler(with_name="test_reader_routing",
+                                                  resource_schema=self._resource_schema,
+                                                  metadata_schema=self._metadata_schema,
+                                                  cluster_address=reader_address)
+        handler = self.create_storage_handler(with_name="test_reader_routing",
+                                              resource_schema=self._resource_schema,
+                                              metadata_schema=self._metadata_schema,
+                                              reader_address=reader_address)
+
+        update_response = handler.update_item(id=self._item_id, caller_identity=self._caller_identity,
+                                              **_test_resource)
+        self.assertTrue(update_response.get(params.RESOURCE).get(params.DATA_MODIFIED))
+
+        with self.assertRaises(exceptions.ResourceNotFoundException):
+            handler.check(self._item_id)
+
+        self.assertTrue(handler.check(self._item_id, consistent_read=True))
+        self.assertEqual(_resource_attr1,
+                         handler.get(id=self._item_id, consistent_read=True).get(params.RESOURCE).get("attr1"))
+
+        _teardown(handler)
+        _teardown(reader_only)
+
+    def test_async_engine(self):
+        handler = self.create_storage_handler(with_name="test_async_engine",
+                                              resource_schema=self._resource_schema,
+                                              metadata_schema=self._metadata_schema,
+                                              async_engine=True)
+
+        # resource and metadata are merged in turn on the writer connection
+        item = copy.deepcopy(_test_resource)
+        item.update(copy.deepcopy(_test_metadata))
+        update_response = handler.update_item(id=self._item_id, caller_identity=self._caller_identity, **item)
+        self.assertTrue(update_response.get(params.RESOURCE).get(params.DATA_MODIFIED))
+        self.assertTrue(update_response.get(params.METADATA).get(params.DATA_MODIFIED))
+
+        # and updated on the second merge
+        item[params.RESOURCE]["attr2"] = "async"
+        handler.update_item(id=self._item_id, caller_identity=self._caller_identity, **item)
+        fetched = handler.get(id=self._item_id)
+        self.assertEqual("async", fetched.get(params.RESOURCE).get("attr2"))
+        self.assertEqual(_meta_attr1, fetched.get(params.METADATA).get("meta1"))
+
+        # batch gets larger than a chunk are fetched concurrently
+        ids = [str(x) for x in range(params.DEFAULT_BATCH_GET_CHUNK_SIZE * 2)]
+        ids.append(self._item_id)
+        response = handler.batch_get(ids=ids)
+        self.assertEqual(1, len(response.get(params.ITEMS)))
+        self.assertEqual(len(ids) - 1, len(response.get(params.NOT_FOUND)))
+
+        _teardown(handler)
+
     def test_item_update(self):
         update_response = self._storage_handler.update_item(id=self._item_id, caller_identity=self._caller_identity,
                                                             **_test_resource)
@@ -310,6 +380,66 @@ class RdbmsStorageTests(unittest.TestCase):
         self.assertIsNotNone(item)
         self.assertIsNotNone(item.get(params.RESOURCE))
 
+    def test_run_batch(self):
+        union = {
+            params.RESOURCE: _test_resource.get(params.RESOURCE),
+            params.METADATA: _test_metadata.get(params.METADATA)
+        }
+        self._storage_handler.update_item(id=self._item_id, caller_identity=self._caller_identity, **union)
+
+        # remove attributes from the resource and metadata in a single batch, with a statement that matches nothing
+        counts = self._storage_handler._engine_type.run_batch(self._storage_handler._db_conn, [
+            self._storage_handler._remove_attributes_statement(item_id=self._item_id, attribute_list=["attr2"],
+                                                               table_name=self._storage_handler._resource_table_name,
+                                                               caller_identity=self._caller_identity),
+            (f"update {self._storage_handler._metadata_table_name} set meta2 = null where {self._storage_handler._pk_name} = %s",
+             [self._item_id]),
+            self._storage_handler._delete_statement(table_name=self._storage_handler._resource_table_name,
+                                                    item_id="no-such-item")
+        ])
+        self.assertEqual([1, 1, 0], counts)
+
+        item = self._storage_handler.get(id=self._item_id)
+        self.assertIsNone(item.get(params.RESOURCE).get("attr2"))
+        self.assertIsNone(item.get(params.METADATA).get("meta2"))
+
+        # a failing statement rolls back the whole batch
+        counts = self._storage_handler._engine_type.run_batch(self._storage_handler._db_conn, [
+            self._storage_handler._delete_statement(table_name=self._storage_handler._metadata_table_name,
+                                                    item_id=self._item_id),
+            f"update {self._storage_handler._resource_table_name} set no_such_column = 1"
+        ])
+        self.assertEqual([0, 0], counts)
+        self.assertIsNotNone(self._storage_handler.get_metadata(id=self._item_id))
+
+    def test_transaction(self):
+        union = {
+            params.RESOURCE: _test_resource.get(params.RESOURCE),
+            params.METADATA: _test_metadata.get(params.METADATA)
+        }
+
+        # a failure part way through a transaction leaves neither the resource nor the metadata written
+        with self.assertRaises(exceptions.DetailedException):
+            with self._storage_handler.transaction():
+                self._storage_handler.update_item(id="txn-item", caller_identity=self._caller_identity, **union)
+                raise exceptions.DetailedException("Abort Transaction")
+
+        with self.assertRaises(exceptions.ResourceNotFoundException):
+            self._storage_handler.check(id="txn-item", consistent_read=True)
+        with self.assertRaises(exceptions.ResourceNotFoundException):
+            self._storage_handler.get_metadata(id="txn-item", consistent_read=True)
+
+        # nested transactions are committed with the outermost transaction
+        with self._storage_handler.transaction():
+            with self._storage_handler.transaction():
+                self._storage_handler.update_item(id="txn-item", caller_identity=self._caller_identity, **union)
+            self.assertTrue(self._storage_handler._db_conn.in_transaction)
+
+        self.assertFalse(self._storage_handler._db_conn.in_transaction)
+        self.assertTrue(self._storage_handler.check(id="txn-item", consistent_read=True))
+
+        self._storage_handler.delete(id="txn-item", caller_identity=self._caller_identity)
+
     def test_item_remove_attr(self):
         # create an item with a value to be removed
         c = "attr4"
@@ -413,6 +543,266 @@ class RdbmsStorageTests(unittest.TestCase):
 
         self._storage_handler.run_commands(commands=[f"delete from {self._storage_handler._resource_table_name}"])
 
+    def test_build_indexes(self):
+        handler = self.create_storage_handler(with_name="test_build_indexes",
+                                              resource_schema=self._resource_schema,
+                                              metadata_schema=self._metadata_schema)
+
+        # indexes are not built when the handler is created
+        status = handler.get_index_status()
+        self.assertEqual(params.STATUS_MISSING, status.get(handler._resource_table_name).get("attr2"))
+
+        status = handler.build_indexes()
+        self.assertEqual(params.STATUS_ACTIVE, status.get(handler._resource_table_name).get("attr2"))
+
+        status = handler.get_index_status()
+        self.assertEqual(params.STATUS_ACTIVE, status.get(handler._resource_table_name).get("attr2"))
+
+        _teardown(handler)
+
+    def test_boolean_migration(self):
+        handler = self.create_storage_handler(with_name="test_boolean_migration",
+                                              resource_schema=self._resource_schema,
+                                              metadata_schema=self._metadata_schema)
+
+        # tables created by earlier versions stored booleans as char(1) flags
+        handler.update_item(id=self._item_id, caller_identity=self._caller_identity, **_test_resource)
+        handler.run_commands([
+            f"alter table {handler._metadata_table_name} alter column meta3 type char(1) using case when meta3 then '1' else '0' end, alter column meta3 set default '0'",
+            f"insert into {handler._metadata_table_name} (id, meta1, meta2, meta3, {','.join(handler._engine_type.who_column_list())}) values ('{self._item_id}', '{_meta_attr1}', {_meta_attr2}, '1', {','.join(handler._engine_type.who_column_insert(self._caller_identity))})"])
+
+        # booleans can't be written to flag columns until they are migrated
+        handler = self.create_storage_handler(with_name="test_boolean_migration",
+                                              resource_schema=self._resource_schema,
+                                              metadata_schema=self._metadata_schema)
+        with self.assertRaises(exceptions.DetailedException):
+            handler.update_item(id=self._item_id, caller_identity=self._caller_identity,
+                                **{params.METADATA: {"meta3": False}})
+
+        # flags are converted to native booleans by the migration, and not by building indexes
+        handler.build_indexes()
+        self.assertEqual({handler._metadata_table_name: ["meta3"]}, handler._char_flag_columns)
+        self.assertEqual({handler._metadata_table_name: ["meta3"]}, handler.migrate_boolean_columns())
+        self.assertEqual({}, handler.migrate_boolean_columns())
+        self.assertTrue(handler.get_metadata(id=self._item_id).get("meta3"))
+
+        update_response = handler.update_item(id=self._item_id, caller_identity=self._caller_identity,
+                                              **{params.METADATA: {"meta3": False}})
+        self.assertTrue(update_response.get(params.METADATA).get(params.DATA_MODIFIED))
+        self.assertFalse(handler.get_metadata(id=self._item_id).get("meta3"))
+
+        _teardown(handler)
+
+    def test_partitioned_tables(self):
+        handler = self.create_storage_handler(with_name="test_hash_partitions",
+                                              resource_schema=self._resource_schema,
+                                              metadata_schema=self._metadata_schema,
+                                              partitioning={params.PARTITION_TYPE: "hash", params.PARTITION_COUNT: 4})
+
+        # both the resource and metadata tables are hash partitioned on the primary key
+        self.assertEqual(4, len(handler._engine_type.get_partitions(handler._db_conn, handler._resource_table_name)))
+        self.assertEqual(4, len(handler._engine_type.get_partitions(handler._db_conn, handler._metadata_table_name)))
+
+        handler.update_item(id=self._item_id, caller_identity=self._caller_identity, **_test_resource)
+        self.assertTrue(handler.check(id=self._item_id))
+
+        # indexes are built on each partition and attached to the parent
+        status = handler.build_indexes()
+        self.assertEqual(params.STATUS_ACTIVE, status.get(handler._resource_table_name).get("attr2"))
+        _teardown(handler)
+
+        # range partitions are created by month from the partition start, with a default partition for other values
+        schema = copy.deepcopy(self._resource_schema)
+        schema["properties"]["created"] = {"type": "string", "format": "date-time"}
+        schema["required"].append("created")
+        handler = self.create_storage_handler(with_name="test_range_partitions",
+                                              resource_schema=schema,
+                                              metadata_schema=self._metadata_schema,
+                                              partitioning={params.PARTITION_TYPE: "range",
+                                                            params.PARTITION_ATTRIBUTE: "created",
+                                                            params.PARTITION_COUNT: 3,
+                                                            params.PARTITION_START: "2020-01-15"})
+
+        partitions = handler._engine_type.get_partitions(handler._db_conn, handler._resource_table_name)
+        self.assertEqual([f"{handler._resource_table_name}_{p}" for p in ["20200101", "20200201", "20200301", "default"]],
+                         partitions)
+        self.assertEqual(0, len(handler._engine_type.get_partitions(handler._db_conn, handler._metadata_table_name)))
+
+        item = copy.deepcopy(_test_resource)
+        item[params.RESOURCE]["created"] = "2020-02-03T10:00:00Z"
+        self.assertTrue(handler.update_item(id=self._item_id, caller_identity=self._caller_identity, **item).get(
+            params.RESOURCE).get(params.DATA_MODIFIED))
+
+        # bulk load merges on the primary key and partition attribute
+        item[params.RESOURCE]["attr2"] = "reloaded"
+        response = handler.bulk_load(items=[dict(item[params.RESOURCE], id=self._item_id)],
+                                     caller_identity=self._caller_identity)
+        self.assertEqual(1, response.get("Loaded"))
+        self.assertEqual("reloaded",
+                         handler.get(id=self._item_id, suppress_meta_fetch=True).get(params.RESOURCE).get("attr2"))
+
+        # a new partition attribute value moves the item rather than adding a second row for its id
+        item[params.RESOURCE]["created"] = "2020-03-04T10:00:00Z"
+        response = handler.bulk_load(items=[dict(item[params.RESOURCE], id=self._item_id)],
+                                     caller_identity=self._caller_identity)
+        self.assertEqual(1, response.get("Loaded"))
+        self.assertEqual("2020-03-04T10:00:00Z",
+                         handler.get(id=self._item_id, suppress_meta_fetch=True).get(params.RESOURCE).get("created"))
+
+        counts, rows = handler._engine_type.run_commands(handler._db_conn, [
+            f"select count(9) from {handler._resource_table_name} where id = '{self._item_id}'"])
+        self.assertEqual(1, rows[0][0])
+
+        _teardown(handler)
+
+    def test_text_search(self):
+        handler = self.create_storage_handler(with_name="test_text_search",
+                                              resource_schema=self._resource_schema,
+                                              metadata_schema=self._metadata_schema,
+                                              text_search=True)
+
+        # the search vector and its index are created with the other indexes
+        status = handler.build_indexes()
+        self.assertEqual(params.STATUS_ACTIVE, status.get(handler._resource_table_name).get("search_vector:gin"))
+
+        for i, (attr1, attr2) in enumerate([("red fox", "quick brown fox"), ("blue whale", "the fox jumps"),
+                                            ("grey wolf", "lazy dog")]):
+            handler.update_item(id=str(i), caller_identity=self._caller_identity,
+                                **{params.RESOURCE: {"attr1": attr1, "attr2": attr2}})
+
+        # matches on attr1 are weighted above matches on attr2
+        response = handler.search(search_type=params.RESOURCE, body={"query": {"match": {"attr1": "fox"}}})
+        hits = response.get("hits")
+        self.assertEqual(2, hits.get("total").get("value"))
+        self.assertEqual(["0", "1"], [h.get("_id") for h in hits.get("hits")])
+        self.assertEqual("red fox", hits.get("hits")[0].get("_source").get("attr1"))
+        self.assertEqual(hits.get("max_score"), hits.get("hits")[0].get("_score"))
+
+        # pages keep the total of all matches
+        response = handler.search(search_type=params.RESOURCE,
+                                  body={"query": {"query_string": {"query": "fox -whale"}}, "from": 0, "size": 1})
+        self.assertEqual(1, response.get("hits").get("total").get("value"))
+
+        response = handler.search(search_type=params.RESOURCE,
+                                  body={"query": {"query_string": {"query": "fox"}}, "from": 1, "size": 1})
+        self.assertEqual(2, response.get("hits").get("total").get("value"))
+        self.assertEqual("1", response.get("hits").get("hits")[0].get("_id"))
+
+        # empty pages still report the total
+        response = handler.search(search_type=params.RESOURCE,
+                                  body={"query": {"query_string": {"query": "fox"}}, "from": 0, "size": 0})
+        self.assertEqual(2, response.get("hits").get("total").get("value"))
+        self.assertEqual([], response.get("hits").get("hits"))
+
+        response = handler.search(search_type=params.RESOURCE,
+                                  body={"query": {"query_string": {"query": "fox"}}, "from": 5, "size": 10})
+        self.assertEqual(2, response.get("hits").get("total").get("value"))
+        self.assertEqual([], response.get("hits").get("hits"))
+
+        # deleted items are not returned
+        handler.delete(id="0", caller_identity=self._caller_identity)
+        response = handler.search(search_type=params.RESOURCE, body={"query": {"match": {"attr1": "fox"}}})
+        self.assertEqual(1, response.get("hits").get("total").get("value"))
+
+        # metadata of soft deleted resources is not returned
+        for i in range(1, 3):
+            handler.update_item(id=str(i), caller_identity=self._caller_identity,
+                                **{params.METADATA: {"meta1": "arctic fox", "meta2": i}})
+        response = handler.search(search_type=params.METADATA, body={"query": {"match": {"meta1": "fox"}}})
+        self.assertEqual(2, response.get("hits").get("total").get("value"))
+
+        handler._delete_mode = params.DELETE_MODE_SOFT
+        handler.delete(id="1", caller_identity=self._caller_identity)
+        handler._delete_mode = params.DELETE_MODE_HARD
+        response = handler.search(search_type=params.METADATA, body={"query": {"match": {"meta1": "fox"}}})
+        self.assertEqual(1, response.get("hits").get("total").get("value"))
+        self.assertEqual(["2"], [h.get("_id") for h in response.get("hits").get("hits")])
+
+        with self.assertRaises(exceptions.InvalidArgumentsException):
+            handler.search(search_type=params.RESOURCE, body={"query": {"bool": {}}})
+
+        _teardown(handler)
+
+    def test_change_feed(self):
+        handler = self.create_storage_handler(with_name="test_change_feed",
+                                              resource_schema=self._resource_schema,
+                                              metadata_schema=self._metadata_schema,
+                                              change_feed=True)
+        streams = handler.get_streams()
+
+        union = {
+            params.RESOURCE: _test_resource.get(params.RESOURCE),
+            params.METADATA: _test_metadata.get(params.METADATA)
+        }
+        handler.update_item(id=self._item_id, caller_identity=self._caller_identity, **union)
+        handler.update_item(id=self._item_id, caller_identity=self._caller_identity,
+                            **{params.RESOURCE: {"attr2": "changed"}})
+        handler.delete(id=self._item_id, caller_identity=self._caller_identity)
+
+        # a failing processor leaves the changes in the feed
+        def _fail(records):
+            raise exceptions.DetailedException("Unable to process")
+
+        with self.assertRaises(exceptions.DetailedException):
+            handler.process_changes(processor=_fail)
+
+        received = {}
+
+        def _collect(records):
+            # each batch of records is from a single source, in sequence number order
+            self.assertEqual(1, len(set([r.get("eventSourceARN") for r in records])))
+            received.setdefault(records[0].get("eventSourceARN"), []).extend(records)
+
+        self.assertEqual(5, handler.process_changes(processor=_collect))
+        self.assertEqual(0, handler.process_changes(processor=_collect))
+
+        resource_records = received.get(streams.get(params.RESOURCE_STREAM_ARN))
+        self.assertEqual(["INSERT", "MODIFY", "REMOVE"], [r.get("eventName") for r in resource_records])
+        self.assertEqual({"S": self._item_id}, resource_records[0].get("dynamodb").get("Keys").get("id"))
+        self.assertEqual({"S": "changed"}, resource_records[1].get("dynamodb").get("NewImage").get("attr2"))
+        self.assertEqual({"N": "1"}, resource_records[1].get("dynamodb").get("NewImage").get(params.ITEM_VERSION))
+        self.assertIsNone(resource_records[2].get("dynamodb").get("NewImage"))
+
+        metadata_records = received.get(streams.get(params.METADATA_STREAM_ARN))
+        self.assertEqual(["INSERT", "REMOVE"], [r.get("eventName") for r in metadata_records])
+
+        handler.run_commands([f"drop function if exists {handler._change_feed_name}_capture cascade",
+                              f"drop table if exists {handler._change_feed_name}"])
+        _teardown(handler)
+
+    def test_document_find(self):
+        resource_schema = copy.deepcopy(self._resource_schema)
+        resource_schema["properties"]["address"] = {"type": "object"}
+        resource_schema["properties"]["tags"] = {"type": "array"}
+
+        handler = self.create_storage_handler(with_name="test_document_find", resource_schema=resource_schema,
+                                              metadata_schema=self._metadata_schema,
+                                              table_indexes=["attr2", "address.city", "tags:gin"])
+
+        for x, city in enumerate(["Leeds", "York", "Leeds"]):
+            item = copy.deepcopy(_test_resource)
+            item[params.RESOURCE]["address"] = {"city": city, "floor": x}
+            item[params.RESOURCE]["tags"] = ["all", f"tag-{x}"]
+            handler.update_item(id=str(x), caller_identity=self._caller_identity, **item)
+
+        # documents are returned as documents
+        self.assertEqual({"city": "York", "floor": 1}, handler.get(id="1").get(params.RESOURCE).get("address"))
+
+        found = handler.find(**{params.RESOURCE: {"address.city": "Leeds"}}).get(params.ITEMS)
+        self.assertEqual(["0", "2"], [f.get("id") for f in found])
+
+        found = handler.find(**{params.RESOURCE: {"address.floor": {"GE": 1}}}).get(params.ITEMS)
+        self.assertEqual(["1", "2"], [f.get("id") for f in found])
+
+        found = handler.find(**{params.RESOURCE: {"tags": {"CONTAINS": ["tag-2"]}}}).get(params.ITEMS)
+        self.assertEqual(["2"], [f.get("id") for f in found])
+
+        # expression and GIN indexes are built alongside column indexes
+        status = handler.build_indexes().get(handler._resource_table_name)
+        self.assertEqual([params.STATUS_ACTIVE] * 3, list(status.values()))
+
+        _teardown(handler)
+
     def test_find(self):
         # seed the resource and metadata tables with 10 records
         self._create_ten_random()
@@ -423,9 +813,9 @@ class RdbmsStorageTests(unittest.TestCase):
                 "attr2": "abc-7"
             }
         }
-        found = self._storage_handler.find(**find_request)
-        self.assertEqual("dict", type(found).__name__)
-        self.assertEqual(found.get("id"), "7")
+        found = self._storage_handler.find(**find_request).get("Items")
+        self.assertEqual(1, len(found))
+        self.assertEqual(found[0].get("id"), "7")
 
         # query for multiple resources
         find_request = {
@@ -433,8 +823,7 @@ class RdbmsStorageTests(unittest.TestCase):
                 "attr1": _resource_attr1
             }
         }
-        found = self._storage_handler.find(**find_request)
-        self.assertEqual("list", type(found).__name__)
+        found = self._storage_handler.find(**find_request).get("Items")
         self.assertEqual(10, len(found))
 
         # issue a find for metadata
@@ -443,9 +832,9 @@ class RdbmsStorageTests(unittest.TestCase):
                 "meta1": "12345-4"
             }
         }
-        found = self._storage_handler.find(**find_request)
-        self.assertEqual("dict", type(found).__name__)
-        self.assertEqual(found.get("id"), "4")
+        found = self._storage_handler.find(**find_request).get("Items")
+        self.assertEqual(1, len(found))
+        self.assertEqual(found[0].get("id"), "4")
 
         # query for multiple resources
         find_request = {
@@ -453,12 +842,129 @@ class RdbmsStorageTests(unittest.TestCase):
                 "meta2": _meta_attr2
             }
         }
-        found = self._storage_handler.find(**find_request)
-        self.assertEqual("list", type(found).__name__)
+        found = self._storage_handler.find(**find_request).get("Items")
         self.assertEqual(10, len(found))
 
         self._storage_handler.run_commands(commands=[f"delete from {self._storage_handler._resource_table_name}"])
 
+    def test_batch_get(self):
+        # seed the resource and metadata tables with 10 records
+        self._create_ten_random()
+
+        # request out of order, with a duplicate and an id which doesn't exist
+        ids = ["7", "2", "missing", "9", "2"]
+        response = self._storage_handler.batch_get(ids=ids)
+
+        items = response.get(params.ITEMS)
+        self.assertEqual(3, len(items))
+        self.assertEqual(["7", "2", "9"], [i.get(params.RESOURCE).get("id") for i in items])
+        self.assertEqual("12345-7", items[0].get(params.METADATA).get("meta1"))
+        self.assertEqual(["missing"], response.get(params.NOT_FOUND))
+
+        # resource only fetch
+        response = self._storage_handler.batch_get(ids=["4"], suppress_meta_fetch=True)
+        self.assertIsNone(response.get(params.ITEMS)[0].get(params.METADATA))
+
+        self._storage_handler.run_commands(commands=[f"delete from {self._storage_handler._resource_table_name}"])
+
+    def test_find_operators(self):
+        self._create_ten_random()
+
+        # multiple filters are combined
+        found = self._storage_handler.find(**{params.RESOURCE: {"attr1": _resource_attr1, "attr2": "abc-3"}})
+        self.assertEqual(1, len(found.get("Items")))
+
+        found = self._storage_handler.find(**{params.RESOURCE: {"attr2": {"IN": ["abc-1", "abc-2", "abc-x"]}}})
+        self.assertEqual(2, len(found.get("Items")))
+
+        found = self._storage_handler.find(**{params.RESOURCE: {"attr2": {"BETWEEN": ["abc-2", "abc-4"]}}})
+        self.assertEqual(3, len(found.get("Items")))
+
+        found = self._storage_handler.find(**{params.RESOURCE: {"attr2": {"BEGINS_WITH": "abc-"}}})
+        self.assertEqual(10, len(found.get("Items")))
+
+        with self.assertRaises(exceptions.InvalidArgumentsException):
+            self._storage_handler.find(**{params.RESOURCE: {"attr2": {"LIKE": "abc"}}})
+
+        with self.assertRaises(exceptions.InvalidArgumentsException):
+            self._storage_handler.find(**{params.RESOURCE: {"attr2; drop table x": "abc"}})
+
+        # page through the results with keyset continuation
+        seen = []
+        last_key = None
+        while True:
+            page = self._storage_handler.find(**{params.RESOURCE: {"attr1": _resource_attr1},
+                                                 params.QUERY_PARAM_LIMIT: 3,
+                                                 params.EXCLUSIVE_START_KEY: last_key})
+            seen.extend([x.get("id") for x in page.get("Items")])
+            last_key = page.get(params.LAST_EVALUATED_KEY)
+
+            if last_key is None:
+                break
+
+        self.assertEqual(sorted([str(x) for x in range(10)]), seen)
+
+        # soft deleted items are not returned
+        self._storage_handler.run_commands(
+            commands=[f"update {self._storage_handler._resource_table_name} set deleted = TRUE where id = '5'"])
+        found = self._storage_handler.find(**{params.RESOURCE: {"attr1": _resource_attr1}})
+        self.assertEqual(9, len(found.get("Items")))
+
+        # debug mode returns the query plan
+        found = self._storage_handler.find(**{params.RESOURCE: {"attr2": "abc-1"}, params.QUERY_PARAM_EXPLAIN: True})
+        self.assertIsNotNone(found.get(params.QUERY_PLAN))
+
+        self._storage_handler.run_commands(commands=[f"delete from {self._storage_handler._resource_table_name}"])
+
+    def test_usage(self):
+        self._create_ten_random()
+
+        usage = self._storage_handler.get_usage(table_name=_API_ALIAS)
+        self.assertIsNotNone(usage)
+        self.assertTrue(usage.get("CountIsEstimate"))
+        self.assertGreater(usage.get("SizeBytes"), 0)
+
+        # metadata is addressed with the DynamoDB naming convention by the API layer
+        self.assertIsNotNone(self._storage_handler.get_usage(table_name=f"{_API_ALIAS}-Metadata"))
+
+        # exact counts are taken within the request and then served from cache
+        usage = self._storage_handler.get_usage(table_name=_API_ALIAS, exact=True)
+        self.assertEqual("COMPLETE", usage.get("ExactCountStatus"))
+        self.assertEqual(10, usage.get("ExactCount"))
+
+        counted = usage.get("ExactCountDate")
+        self.assertEqual(counted, self._storage_handler.get_usage(table_name=_API_ALIAS, exact=True).get(
+            "ExactCountDate"))
+
+        self._storage_handler.run_commands(commands=[f"delete from {self._storage_handler._resource_table_name}"])
+
+    def test_bulk_load(self):
+        items = [{"id": f"bulk-{x}", "attr1": _resource_attr1, "attr2": f"bulk-{x}"} for x in range(100)]
+
+        # a later row for the same key wins
+        items.append({"id": "bulk-0", "attr1": "replaced", "attr2": "bulk-0"})
+
+        # rows which fail validation are reported and not loaded
+        items.append({"id": "bulk-invalid", "attr1": _resource_attr1})
+        items.append({"attr1": _resource_attr1, "attr2": "no-key"})
+
+        response = self._storage_handler.bulk_load(items=items, caller_identity=self._caller_identity,
+                                                   batch_size=30)
+        self.assertEqual(101, response.get("Staged"))
+        self.assertEqual(100, response.get("Loaded"))
+        self.assertEqual(2, response.get("FailedCount"))
+        self.assertEqual("bulk-invalid", response.get("Failures")[0].get("id"))
+
+        item = self._storage_handler.get(id="bulk-0", suppress_meta_fetch=True)
+        self.assertEqual("replaced", item.get(params.RESOURCE).get("attr1"))
+
+        # reloading the same items from NDJSON updates them in place
+        ndjson = "\n".join([json.dumps(x) for x in items[:10]])
+        response = self._storage_handler.bulk_load(items=ndjson, caller_identity=self._caller_identity)
+        self.assertEqual(10, response.get("Loaded"))
+
+        self._storage_handler.run_commands(commands=[f"delete from {self._storage_handler._resource_table_name}"])
+
     def test_restore_statement(self):
         restore = self._storage_handler._create_restore_statement(id=self._item_id,
                                                                   caller_identity=self._caller_identity)
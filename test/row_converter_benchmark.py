@@ -0,0 +1,93 @@
+import unittest
+import sys
+import datetime
+import timeit
+
+sys.path.append("../chalicelib")
+
+import chalicelib.utils as utils
+import chalicelib.parameters as params
+
+_ROWS = 100000
+_RUNS = 5
+
+_column_spec = ["id", "attr1", "attr2", "attr3", "attr4", "attr5", params.ITEM_VERSION, params.LAST_UPDATE_DATE,
+                params.DELETED]
+_type_map = {
+    "id": "string",
+    "attr1": "string",
+    "attr2": "string",
+    "attr3": "integer",
+    "attr4": "number",
+    "attr5": "boolean",
+    params.ITEM_VERSION: "integer",
+    params.LAST_UPDATE_DATE: "datetime",
+    params.DELETED: "boolean"
+}
+
+_now = datetime.datetime.now()
+_rows = [(str(x), "12345", f"abc-{x}", x, x * 1.5, x % 2 == 0, 1, _now, False) for x in range(_ROWS)]
+
+
+def _per_cell_pivot(rows: list, column_spec: list, type_map: dict) -> list:
+    # the previous per cell conversion, kept as a baseline
+    output = []
+    for r in rows:
+        obj = {}
+        for i, c in enumerate(column_spec):
+            if r[i] is not None:
+                if type(r[i]) == str:
+                    if r[i].lower() != 'null' and type_map.get(c) == 'boolean':
+                        obj[c] = utils.strtobool(r[i])
+                elif type(r[i]) == datetime.datetime:
+                    obj[c] = r[i].strftime(params.DEFAULT_DATE_FORMAT)
+
+            if c not in obj:
+                obj[c] = r[i]
+        output.append(obj)
+
+    return output
+
+
+class RowConverterBenchmark(unittest.TestCase):
+    '''
+    Benchmark for compiled row converters over large result sets, using rows shaped like a resource table with who
+    columns. Does not require a database connection
+    '''
+
+    def test_output_shape(self):
+        convert = utils.compile_row_converter(column_spec=_column_spec, type_map=_type_map)
+
+        # single rows and empty result sets are returned as lists
+        self.assertEqual(1, len(convert(_rows[:1])))
+        self.assertEqual([], convert([]))
+        self.assertEqual([], convert([None]))
+
+        item = convert(_rows[3:4])[0]
+        self.assertEqual("3", item.get("id"))
+        self.assertEqual(False, item.get("attr5"))
+        self.assertEqual(_now.strftime(params.DEFAULT_DATE_FORMAT), item.get(params.LAST_UPDATE_DATE))
+
+        # legacy char(1) booleans are still converted
+        legacy = convert([("1", None, None, None, None, "1", None, None, "0")])[0]
+        self.assertEqual(True, legacy.get("attr5"))
+        self.assertEqual(False, legacy.get(params.DELETED))
+        self.assertIsNone(legacy.get("attr1"))
+
+    def test_benchmark(self):
+        # resource columns only, as returned by find, and with the who columns, as returned for metadata
+        for name, width in [("Resource", 6), ("Resource and Who", len(_column_spec))]:
+            column_spec = _column_spec[:width]
+            rows = [r[:width] for r in _rows]
+            convert = utils.compile_row_converter(column_spec=column_spec, type_map=_type_map)
+            self.assertEqual(_per_cell_pivot(rows[:100], column_spec, _type_map), convert(rows[:100]))
+
+            compiled = min(timeit.repeat(lambda: convert(rows), number=1, repeat=_RUNS))
+            per_cell = min(timeit.repeat(lambda: _per_cell_pivot(rows, column_spec, _type_map), number=1,
+                                         repeat=_RUNS))
+
+            print(f"{name}: converted {_ROWS} rows, compiled {compiled:.3f}s ({int(_ROWS / compiled)} rows/s), "
+                  f"per cell {per_cell:.3f}s ({int(_ROWS / per_cell)} rows/s)")
+
+if __name__ == '__main__':
+    unittest.main()
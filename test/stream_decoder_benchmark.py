@@ -0,0 +1,139 @@
+import unittest
+import os
+import sys
+import json
+import timeit
+from decimal import Decimal
+
+sys.path.append("../chalicelib")
+
+from boto3.dynamodb.types import TypeDeserializer
+import chalicelib.utils as utils
+import chalicelib.parameters as params
+from chalicelib.streams_integration import StreamsIntegration
+import chalicelib.streams_integration as si
+
+_RECORDS = 1000
+_BATCHES = 20
+_RUNS = 5
+
+with open(os.path.join(os.path.dirname(__file__), "test_resource_schema.json")) as f:
+    _schema = json.load(f)
+
+_schema["properties"]["attr6"] = {"type": "object", "properties": {"a": {"type": "integer"}, "b": {"type": "string"}}}
+_schema["properties"]["attr7"] = {"type": "array", "items": {"type": "number"}}
+
+
+def _record(x: int, event_name: str = 'MODIFY') -> dict:
+    return {
+        'eventName': event_name,
+        'eventSource': 'aws:dynamodb',
+        'dynamodb': {
+            'Keys': {'id': {'S': str(x)}},
+            'NewImage': {
+                'id': {'S': str(x)},
+                'attr1': {'S': '12345'},
+                'attr2': {'S': f'abc-{x}'},
+                'attr3': {'N': str(x)},
+                'attr4': {'N': str(x * 1.5)},
+                'attr5': {'BOOL': x % 2 == 0},
+                'attr6': {'M': {'a': {'N': str(x)}, 'b': {'S': 'value'}}},
+                'attr7': {'L': [{'N': '1.5'}, {'N': '2'}]},
+                'attr8': {'NULL': True},
+                params.ITEM_VERSION: {'N': '1'},
+                params.DELETED: {'N': '0'}
+            },
+            'SequenceNumber': str(x)
+        }
+    }
+
+
+_batches = [[_record(b * _RECORDS + x) for x in range(_RECORDS)] for b in range(_BATCHES)]
+
+
+def _to_json(value):
+    # convert TypeDeserializer output into JSON types, as the baseline for the compiled decoder
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    elif isinstance(value, dict):
+        return {k: _to_json(v) for k, v in value.items()}
+    elif isinstance(value, (list, set)):
+        return [_to_json(v) for v in value]
+    else:
+        return value
+
+
+def _deserializer_decode(batch: list) -> list:
+    deserializer = TypeDeserializer()
+    output = []
+    for r in batch:
+        document = {k: _to_json(deserializer.deserialize(v)) for k, v in r['dynamodb']['NewImage'].items()}
+        document[params.DELETED] = document[params.DELETED] == 1
+        output.append(document)
+
+    return output
+
+
+class StreamDecoderBenchmark(unittest.TestCase):
+    '''
+    Benchmark for the compiled stream decoder over synthetic DynamoDB stream batches, compared with boto3's
+    TypeDeserializer. Does not require AWS access
+    '''
+
+    def setUp(self):
+        self._decoder = StreamsIntegration._compile_decoder(_schema)
+
+    def test_decode(self):
+        action, document_id, document = StreamsIntegration.decode_record(_record(3), self._decoder)
+
+        self.assertEqual(si.INDEX_ACTION, action)
+        self.assertEqual("3", document_id)
+        self.assertEqual(3, document.get("attr3"))
+        self.assertEqual(4.5, document.get("attr4"))
+        self.assertEqual({'a': 3, 'b': 'value'}, document.get("attr6"))
+        self.assertEqual([1.5, 2.0], document.get("attr7"))
+        self.assertIsNone(document.get("attr8"))
+        self.assertEqual(False, document.get(params.DELETED))
+        self.assertEqual("3", document.get(si.DOCUMENT_ID))
+
+        # values which don't match the schema are decoded generically
+        mismatch = _record(4)
+        mismatch['dynamodb']['NewImage']['attr3'] = {'S': 'four'}
+        mismatch['dynamodb']['NewImage']['attr4'] = {'NULL': True}
+        document = StreamsIntegration.decode_record(mismatch, self._decoder)[2]
+        self.assertEqual("four", document.get("attr3"))
+        self.assertIsNone(document.get("attr4"))
+
+        # hard and soft deletes are delete actions
+        removed = _record(5, 'REMOVE')
+        del removed['dynamodb']['NewImage']
+        self.assertEqual((si.DELETE_ACTION, "5", None), StreamsIntegration.decode_record(removed, self._decoder))
+
+        soft_deleted = _record(6)
+        soft_deleted['dynamodb']['NewImage'][params.DELETED] = {'N': '1'}
+        self.assertEqual(si.DELETE_ACTION, StreamsIntegration.decode_record(soft_deleted, self._decoder)[0])
+
+        soft_deleted['dynamodb']['NewImage'][params.DELETED] = {'BOOL': True}
+        self.assertEqual(si.DELETE_ACTION, StreamsIntegration.decode_record(soft_deleted, self._decoder)[0])
+
+    def test_benchmark(self):
+        def _compiled(batch: list) -> list:
+            return [StreamsIntegration.decode_record(r, self._decoder)[2] for r in batch]
+
+        for b in _batches[:1]:
+            expected = _deserializer_decode(b)
+            for e in expected:
+                e[si.DOCUMENT_ID] = e['id']
+            self.assertEqual(expected, _compiled(b))
+
+        records = _RECORDS * _BATCHES
+        compiled = min(timeit.repeat(lambda: [_compiled(b) for b in _batches], number=1, repeat=_RUNS))
+        deserializer = min(timeit.repeat(lambda: [_deserializer_decode(b) for b in _batches], number=1, repeat=_RUNS))
+
+        print(f"Decoded {records} records in {_BATCHES} batches, compiled {compiled:.3f}s "
+              f"({int(records / compiled)} records/s), TypeDeserializer {deserializer:.3f}s "
+              f"({int(records / deserializer)} records/s)")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,648 @@
+import unittest
+import sys
+import json
+import logging
+import botocore
+
+sys.path.append("../chalicelib")
+
+import chalicelib.streams_integration as si
+import chalicelib.parameters as params
+from elasticsearch.exceptions import RequestError
+from chalicelib.streams_integration import StreamsIntegration
+
+_source_arn = "arn:aws:dynamodb:eu-west-1:123456789012:table/StreamsTest-dev/stream/2020-01-01T00:00:00.000"
+_delivery_stream = "StreamsTest-dev"
+_endpoint = "search-streamstest.eu-west-1.es.amazonaws.com"
+
+
+def _search_config(**kwargs):
+    config = {
+        'DeliveryStreams': {
+            params.RESOURCE: {
+                'SourceStreamARN': _source_arn,
+                'DestinationDeliveryStreamARN': f"arn:aws:firehose:eu-west-1:123456789012:deliverystream/"
+                                                f"{_delivery_stream}",
+                'IndexName': 'streamstest-resource'
+            }
+        },
+        si.ES_DOMAIN: {si.ES_ENDPOINT: _endpoint},
+        params.DELIVERY_STREAM_FAILURE_BUCKET: 'failures'
+    }
+    config.update(kwargs)
+    return config
+
+
+class FirehoseClient:
+    '''Firehose client which fails the first put of any record whose id is in the fail set'''
+
+    def __init__(self, fail_ids: set = None, always_fail_ids: set = None):
+        self.calls = []
+        self._fail_ids = set() if fail_ids is None else set(fail_ids)
+        self._always_fail_ids = set() if always_fail_ids is None else always_fail_ids
+
+    def put_record_batch(self, DeliveryStreamName, Records):
+        self.calls.append(Records)
+        responses = []
+        for r in Records:
+            doc_id = json.loads(r['Data'])['document_id']
+            if doc_id in self._always_fail_ids or doc_id in self._fail_ids:
+                self._fail_ids.discard(doc_id)
+                responses.append({'ErrorCode': 'ServiceUnavailableException', 'ErrorMessage': 'Slow down'})
+            else:
+                responses.append({'RecordId': doc_id})
+
+        return {'FailedPutCount': len([r for r in responses if 'ErrorCode' in r]), 'RequestResponses': responses}
+
+
+class SearchClient:
+    '''ElasticSearch client which throttles the first bulk item for any id in the throttle set, and rejects documents
+    with an invalid attribute. External versions are kept for deleted documents, as tombstones'''
+
+    def __init__(self, throttle_ids: set = None, always_throttle_ids: set = None):
+        self.requests = []
+        self.indexes = {}
+        self.versions = {}
+        self.indices = IndicesClient(self)
+        self._throttle_ids = set() if throttle_ids is None else set(throttle_ids)
+        self._always_throttle_ids = set() if always_throttle_ids is None else always_throttle_ids
+
+    @property
+    def documents(self) -> dict:
+        return {k: v for i in self.indexes.values() for k, v in i.items()}
+
+    def bulk(self, body):
+        lines = body.splitlines()
+        self.requests.append(lines)
+        items = []
+        i = 0
+        while i < len(lines):
+            op, meta = json.loads(lines[i]).popitem()
+            doc_id = meta['_id']
+            index_name = self.indices.resolve(meta['_index'])
+            index = self.indexes.setdefault(index_name, {})
+            stored_version = self.versions.get((index_name, doc_id))
+            if doc_id in self._always_throttle_ids or doc_id in self._throttle_ids:
+                self._throttle_ids.discard(doc_id)
+                items.append({op: {'_id': doc_id, 'status': 429, 'error': {'type': 'es_rejected_execution_exception'}}})
+            elif meta.get('version_type') == 'external_gte' and stored_version is not None and \
+                    meta['version'] < stored_version:
+                items.append({op: {'_id': doc_id, 'status': 409,
+                                   'error': {'type': 'version_conflict_engine_exception'}}})
+            elif op == 'delete':
+                if 'version' in meta:
+                    self.versions[(index_name, doc_id)] = meta['version']
+                found = index.pop(doc_id, None) is not None
+                items.append({op: {'_id': doc_id, 'status': 200 if found else 404}})
+            else:
+                document = json.loads(lines[i + 1])
+                if 'invalid' in document:
+                    items.append({op: {'_id': doc_id, 'status': 400, 'error': {'type': 'mapper_parsing_exception'}}})
+                elif op == 'create' and doc_id in index:
+                    items.append({op: {'_id': doc_id, 'status': 409,
+                                       'error': {'type': 'version_conflict_engine_exception'}}})
+                else:
+                    if 'version' in meta:
+                        self.versions[(index_name, doc_id)] = meta['version']
+                    index[doc_id] = document
+                    items.append({op: {'_id': doc_id, 'status': 201}})
+            i += 1 if op == 'delete' else 2
+
+        return {'errors': any(['error' in list(i.values())[0] for i in items]), 'items': items}
+
+
+class IndicesClient:
+    '''ElasticSearch indices client over the indexes of a SearchClient, with aliases'''
+
+    def __init__(self, search_client: SearchClient):
+        self.aliases = {}
+        self.templates = {}
+        self.settings = {}
+        self.mappings = {}
+        self._search_client = search_client
+
+    def resolve(self, name: str) -> str:
+        return self.aliases.get(name, name)
+
+    def exists(self, index):
+        return index in self._search_client.indexes or index in self.aliases
+
+    def exists_alias(self, name):
+        return name in self.aliases
+
+    def get_alias(self, name):
+        return {self.aliases[name]: {'aliases': {name: {}}}}
+
+    def put_template(self, name, body):
+        self.templates[name] = body
+
+    def put_settings(self, index, body):
+        self.settings.setdefault(self.resolve(index), {}).update(body['index'])
+
+    def put_mapping(self, index, body):
+        # existing fields can't change type
+        current = self.mappings.setdefault(self.resolve(index), {})
+        for k, v in body['properties'].items():
+            if k in current and current[k] != v:
+                raise RequestError(400, 'illegal_argument_exception', f"mapper [{k}] cannot be changed")
+        current.update(body['properties'])
+
+    def create(self, index, body):
+        self._search_client.indexes[index] = {}
+        self.settings[index] = dict(body.get('settings', {}).get('index', {}))
+        for alias in body.get('aliases', {}).keys():
+            self.aliases[alias] = index
+
+    def delete(self, index, ignore_unavailable=False):
+        self._search_client.indexes.pop(index)
+
+    def update_aliases(self, body):
+        for action, args in [a.popitem() for a in body['actions']]:
+            if action == 'remove_index':
+                self._search_client.indexes.pop(args['index'])
+            elif action == 'remove':
+                self.aliases.pop(args['alias'])
+            else:
+                self.aliases[args['alias']] = args['index']
+
+
+class DynamoClient:
+    '''DynamoDB client which parallel scans tables of items in pages of two, consuming one capacity unit per item'''
+
+    def __init__(self, tables: dict):
+        self.scans = []
+        self._tables = tables
+
+    def describe_table(self, TableName):
+        return {'Table': {'KeySchema': [{'AttributeName': 'id', 'KeyType': 'HASH'}]}}
+
+    def scan(self, TableName, Segment, TotalSegments, ReturnConsumedCapacity, ExclusiveStartKey=None):
+        self.scans.append((TableName, Segment, ExclusiveStartKey))
+        items = [i for n, i in enumerate(self._tables[TableName]) if n % TotalSegments == Segment]
+        start = 0 if ExclusiveStartKey is None else int(ExclusiveStartKey['offset']['N'])
+        response = {params.ITEMS: items[start:start + 2], 'ConsumedCapacity': {'CapacityUnits': 2}}
+        if start + 2 < len(items):
+            response[params.LAST_EVALUATED_KEY] = {'offset': {'N': str(start + 2)}}
+        return response
+
+
+class LambdaClient:
+    '''Lambda client with existing event source mappings, returned one per page'''
+
+    def __init__(self, mappings: list):
+        self.mappings = mappings
+        self.updates = []
+
+    def create_event_source_mapping(self, **kwargs):
+        raise botocore.exceptions.ClientError({'Error': {'Code': 'ResourceConflictException'}},
+                                              'CreateEventSourceMapping')
+
+    def list_event_source_mappings(self, EventSourceArn, FunctionName, Marker=None):
+        page = 0 if Marker is None else int(Marker)
+        response = {'EventSourceMappings': [m for m in self.mappings if m['EventSourceArn'] == EventSourceArn][
+                                           page:page + 1]}
+        if page + 1 < len([m for m in self.mappings if m['EventSourceArn'] == EventSourceArn]):
+            response['NextMarker'] = str(page + 1)
+        return response
+
+    def update_event_source_mapping(self, UUID, FunctionResponseTypes):
+        self.updates.append(UUID)
+        next(m for m in self.mappings if m['UUID'] == UUID)['FunctionResponseTypes'] = FunctionResponseTypes
+
+
+class S3Client:
+    def __init__(self, denied: bool = False):
+        self.objects = {}
+        self._denied = denied
+
+    def put_object(self, Bucket, Key, Body):
+        if self._denied:
+            raise botocore.exceptions.ClientError({'Error': {'Code': 'AccessDenied'}}, 'PutObject')
+        self.objects[Key] = Body
+
+
+class ControlTable:
+    '''API control table which returns each item in a separate page'''
+
+    def __init__(self, items: list):
+        self.loads = 0
+        self.gets = 0
+        self._items = items
+
+    def scan(self, **kwargs):
+        if params.EXCLUSIVE_START_KEY not in kwargs:
+            self.loads += 1
+        page = kwargs.get(params.EXCLUSIVE_START_KEY, 0)
+        response = {params.ITEMS: self._items[page:page + 1]}
+        if page + 1 < len(self._items):
+            response[params.LAST_EVALUATED_KEY] = page + 1
+        return response
+
+    def _get(self, key: dict) -> dict:
+        return next(i for i in self._items if i[params.CONTROL_HASH] == key[params.CONTROL_HASH] and
+                    i[params.CONTROL_SORT] == key[params.CONTROL_SORT])
+
+    def get_item(self, Key, ConsistentRead=False, **kwargs):
+        self.gets += 1
+        try:
+            return {'Item': json.loads(json.dumps(self._get(Key)))}
+        except StopIteration:
+            return {}
+
+    def put_item(self, Item):
+        self._items.append(Item)
+
+    def update_item(self, Key, UpdateExpression, ExpressionAttributeNames, ExpressionAttributeValues=None,
+                    ConditionExpression=None, ReturnValues=None):
+        # supports SET and REMOVE of attribute paths, ADD of numbers, and not equal or attribute_not_exists conditions
+        item = self._get(Key)
+        values = {} if ExpressionAttributeValues is None else ExpressionAttributeValues
+
+        def _path(path):
+            names = [ExpressionAttributeNames[n] for n in path.strip().split('.')]
+            parent = item
+            for n in names[:-1]:
+                parent = parent[n]
+            return parent, names[-1]
+
+        if ConditionExpression is not None:
+            if ConditionExpression.startswith('attribute_not_exists('):
+                parent, name = _path(ConditionExpression[len('attribute_not_exists('):-1])
+                failed = name in parent
+            else:
+                path, value = ConditionExpression.split(' <> ')
+                parent, name = _path(path)
+                failed = parent.get(name) == values[value]
+
+            if failed:
+                raise botocore.exceptions.ClientError({'Error': {'Code': 'ConditionalCheckFailedException'}},
+                                                      'UpdateItem')
+
+        for clause in UpdateExpression.replace(' ADD ', '|ADD ').replace(' REMOVE ', '|REMOVE ').split('|'):
+            action, expression = clause.split(' ', 1)
+            if action == 'SET':
+                for assignment in expression.split(', '):
+                    path, value = assignment.split(' = ')
+                    parent, name = _path(path)
+                    parent[name] = values[value]
+            elif action == 'ADD':
+                path, value = expression.split(' ')
+                parent, name = _path(path)
+                parent[name] = parent.get(name, 0) + values[value]
+            else:
+                for path in expression.split(', '):
+                    parent, name = _path(path)
+                    parent.pop(name, None)
+
+        return {'Attributes': json.loads(json.dumps(item))}
+
+
+class StreamsIntegrationTest(unittest.TestCase):
+    def _indexer(self, client, search_config: dict = None):
+        indexer = StreamsIntegration.__new__(StreamsIntegration)
+        indexer._fh_client = client
+        indexer._logger = logging.getLogger("StreamsIntegrationTest")
+        indexer._deployment_stage = 'dev'
+        indexer._routes = {}
+        indexer._search_clients = {}
+        indexer._add_routes(_search_config() if search_config is None else search_config)
+        return indexer
+
+    def _records(self, count: int, padding: int = 0):
+        return [{
+            'eventSourceARN': _source_arn,
+            'eventName': 'INSERT',
+            'dynamodb': {
+                'Keys': {'id': {'S': str(i)}},
+                'NewImage': {'id': {'S': str(i)}, 'body': {'S': 'x' * padding}},
+                'SequenceNumber': str(i)
+            }
+        } for i in range(count)]
+
+    def setUp(self):
+        self._backoff = si.RETRY_BACKOFF_SECONDS
+        si.RETRY_BACKOFF_SECONDS = 0
+
+    def tearDown(self):
+        si.RETRY_BACKOFF_SECONDS = self._backoff
+
+    def test_batch_limits(self):
+        client = FirehoseClient()
+        output = self._indexer(client).forward_to_es_firehose(self._records(1200))
+
+        self.assertEqual(output.get("batchItemFailures"), [])
+        self.assertEqual(sorted([len(c) for c in client.calls]), [200, 500, 500])
+
+        # records of ~100KB are limited by request size rather than count
+        client = FirehoseClient()
+        self._indexer(client).forward_to_es_firehose(self._records(100, padding=100 * 1024))
+
+        for c in client.calls:
+            self.assertLessEqual(sum([len(r['Data']) for r in c]), si.FIREHOSE_MAX_BATCH_BYTES)
+        self.assertEqual(sum([len(c) for c in client.calls]), 100)
+
+    def test_retry_failed_entries(self):
+        client = FirehoseClient(fail_ids={'3', '7'})
+        output = self._indexer(client).forward_to_es_firehose(self._records(10))
+
+        self.assertEqual(output.get("batchItemFailures"), [])
+        self.assertEqual(len(client.calls), 2)
+        self.assertEqual([json.loads(r['Data'])['document_id'] for r in client.calls[1]], ['3', '7'])
+
+    def test_report_batch_item_failures(self):
+        client = FirehoseClient(always_fail_ids={'5'})
+        output = self._indexer(client).forward_to_es_firehose(self._records(10))
+
+        self.assertEqual(output.get("batchItemFailures"), [{"itemIdentifier": "5"}])
+
+    def test_event_source_batch_item_failures(self):
+        lambda_client = LambdaClient([
+            {'UUID': 'a', 'EventSourceArn': _source_arn, 'FunctionResponseTypes': []},
+            {'UUID': 'b', 'EventSourceArn': _source_arn, 'FunctionResponseTypes': ['ReportBatchItemFailures']},
+            {'UUID': 'c', 'EventSourceArn': _source_arn},
+            {'UUID': 'd', 'EventSourceArn': 'arn:aws:dynamodb:other', 'FunctionResponseTypes': []}
+        ])
+        indexer = self._indexer(None)
+        indexer._lambda_client = lambda_client
+
+        # existing mappings of the stream are updated to report batch item failures
+        indexer._verify_event_source(_source_arn)
+        self.assertEqual(['a', 'c'], lambda_client.updates)
+        self.assertEqual([], lambda_client.mappings[3]['FunctionResponseTypes'])
+
+        # change feeds aren't mapped as event sources
+        indexer._verify_event_source('arn:aws:rds:eu-west-1:123456789012:cluster:feed')
+        self.assertEqual(['a', 'c'], lambda_client.updates)
+
+    def test_coalesce(self):
+        def _record(doc_id: str, seq: int, event_name: str = 'MODIFY', deleted: int = 0):
+            record = {
+                'eventSourceARN': _source_arn,
+                'eventName': event_name,
+                'dynamodb': {
+                    'Keys': {'id': {'S': doc_id}},
+                    'NewImage': {'id': {'S': doc_id}, 'seq': {'N': str(seq)}, 'deleted': {'N': str(deleted)}},
+                    'SequenceNumber': str(seq)
+                }
+            }
+            if event_name == 'REMOVE':
+                del record['dynamodb']['NewImage']
+            return record
+
+        # a hot key is reduced to its last image, and records are returned in sequence order
+        records = [_record('hot', i) for i in range(2, 50)] + [_record('cold', 1), _record('other', 100)]
+        coalesced = StreamsIntegration.coalesce(records)
+        self.assertEqual(['1', '49', '100'], [r['dynamodb']['SequenceNumber'] for r in coalesced])
+
+        # inserts which are deleted in the same batch are dropped, while deletes of existing documents are kept
+        records = [_record('a', 1, 'INSERT'), _record('a', 2), _record('a', 3, 'REMOVE'),
+                   _record('b', 4, 'INSERT'), _record('b', 5, deleted=1),
+                   _record('c', 6), _record('c', 7, 'REMOVE'),
+                   _record('d', 8, 'INSERT')]
+        coalesced = StreamsIntegration.coalesce(records)
+        self.assertEqual(['7', '8'], [r['dynamodb']['SequenceNumber'] for r in coalesced])
+
+        client = FirehoseClient()
+        output = self._indexer(client).forward_to_es_firehose(records)
+        self.assertEqual(output.get("batchItemFailures"), [])
+        self.assertEqual([{'document_id': 'c', 'deleted': True}, {'id': 'd', 'seq': 8, 'deleted': False,
+                                                                  'document_id': 'd'}],
+                         [json.loads(r['Data']) for r in client.calls[0]])
+
+    def test_bulk(self):
+        search_client = SearchClient(throttle_ids={'2'})
+        s3_client = S3Client()
+        indexer = self._indexer(None, _search_config(**{params.SEARCH_INDEXER_MODE: params.SEARCH_INDEXER_MODE_BULK,
+                                                          params.BULK_FLUSH_SIZE: 4, params.BULK_CONCURRENCY: 2}))
+        indexer._search_clients[_endpoint] = search_client
+        indexer._s3_client = s3_client
+
+        records = self._records(10)
+        records[5]['dynamodb']['NewImage']['invalid'] = {'BOOL': True}
+        output = indexer.forward(records)
+
+        # throttled items are retried, and rejected documents written to the failure bucket rather than failing
+        self.assertEqual(output.get("batchItemFailures"), [])
+        self.assertEqual(sorted(search_client.documents.keys()), sorted([str(i) for i in range(10) if i != 5]))
+        self.assertEqual([4, 4, 2, 1], [len(r) // 2 for r in search_client.requests])
+        failed = [json.loads(l) for o in s3_client.objects.values() for l in o.decode('utf-8').splitlines()]
+        self.assertEqual(['5'], [f['esDocumentId'] for f in failed])
+
+        # rejected documents which can't be written to the failure bucket are dropped rather than retried
+        indexer._s3_client = S3Client(denied=True)
+        self.assertEqual([], indexer.forward(records[5:6]).get("batchItemFailures"))
+        indexer._s3_client = s3_client
+
+        # deletes remove the document by id, and deletes of missing documents succeed
+        removed = self._records(2)
+        for r in removed:
+            r['eventName'] = 'REMOVE'
+            del r['dynamodb']['NewImage']
+        output = indexer.forward(removed)
+        self.assertEqual(output.get("batchItemFailures"), [])
+        self.assertNotIn('0', search_client.documents)
+        self.assertNotIn('1', search_client.documents)
+
+        # items which are still throttled after retries are reported to Lambda
+        indexer._search_clients[_endpoint] = SearchClient(always_throttle_ids={'3'})
+        output = indexer.forward(self._records(5))
+        self.assertEqual(output.get("batchItemFailures"), [{"itemIdentifier": "3"}])
+
+    def test_routes(self):
+        other_arn = _source_arn.replace("StreamsTest", "OtherTest")
+        other_config = {'DeliveryStreams': {params.RESOURCE: {'SourceStreamARN': other_arn,
+                                                              'DestinationDeliveryStreamARN': 'OtherTest-dev'}}}
+        schema = {'properties': {'attr3': {'type': 'integer'}}}
+        legacy_arn = _source_arn.replace("StreamsTest", "LegacyTest")
+        legacy_streams = {params.RESOURCE: {'SourceStreamARN': legacy_arn,
+                                            'DestinationDeliveryStreamARN': 'LegacyTest-dev'}}
+        control_table = ControlTable([
+            {params.CONTROL_HASH: 'StreamsTest-dev', params.CONTROL_SORT: params.CONTROL_TYPE_META,
+             params.STAGE: 'dev', params.SEARCH_CONFIG: _search_config()},
+            {params.CONTROL_HASH: 'OtherTest-dev', params.CONTROL_SORT: params.CONTROL_TYPE_META,
+             params.STAGE: 'dev', params.SEARCH_CONFIG: other_config},
+            {params.CONTROL_HASH: 'OtherTest-dev', params.CONTROL_SORT: params.CONTROL_TYPE_RESOURCE_SCHEMA,
+             params.CONTROL_TYPE_RESOURCE_SCHEMA: schema},
+            {params.CONTROL_HASH: 'LegacyTest-dev', params.CONTROL_SORT: params.CONTROL_TYPE_META,
+             params.STAGE: 'dev', 'DeliveryStreams': legacy_streams, si.ES_DOMAIN: {'ElasticSearchEndpoint': 'es'}},
+            {params.CONTROL_HASH: 'OtherTest-prod', params.CONTROL_SORT: params.CONTROL_TYPE_META,
+             params.STAGE: 'prod', params.SEARCH_CONFIG: {'DeliveryStreams': {params.RESOURCE: {
+                'SourceStreamARN': 'arn:prod', 'DestinationDeliveryStreamARN': 'OtherTest-prod'}}}}
+        ])
+        client = FirehoseClient()
+        indexer = self._indexer(client, {})
+        indexer._api_control_table = control_table
+
+        # the routing table is loaded on a miss, for every namespace in the stage, with its schema
+        records = [dict(r, eventSourceARN=other_arn) for r in self._records(2)]
+        records[0]['dynamodb']['NewImage']['attr3'] = {'N': '3'}
+        indexer.forward(records)
+        self.assertEqual(1, control_table.loads)
+        self.assertEqual({_source_arn, other_arn, legacy_arn}, set(indexer._routes.keys()))
+        self.assertEqual(3, json.loads(client.calls[0][0]['Data'])['attr3'])
+
+        # search config stored at the top level by earlier versions is moved into SearchConfig
+        legacy = control_table._get({params.CONTROL_HASH: 'LegacyTest-dev',
+                                     params.CONTROL_SORT: params.CONTROL_TYPE_META})
+        self.assertEqual(legacy_streams, legacy[params.SEARCH_CONFIG]['DeliveryStreams'])
+        self.assertNotIn('DeliveryStreams', legacy)
+        self.assertNotIn(si.ES_DOMAIN, legacy)
+
+        indexer.forward(self._records(2))
+        self.assertEqual(1, control_table.loads)
+
+        # reindex targets are refreshed from the namespace's API metadata, without reloading the routing table
+        control_table._items[0][params.SEARCH_CONFIG]['DeliveryStreams'][params.RESOURCE][si.REINDEX_INDEX_NAME] = 'new'
+        indexer._routes[_source_arn]['Refreshed'] -= si.ROUTE_REFRESH_SECONDS + 1
+        indexer.forward(self._records(2))
+        self.assertEqual(1, control_table.loads)
+        self.assertEqual(1, control_table.gets)
+        self.assertEqual('new', indexer._routes[_source_arn][si.REINDEX_INDEX_NAME])
+        del control_table._items[0][params.SEARCH_CONFIG]['DeliveryStreams'][params.RESOURCE][si.REINDEX_INDEX_NAME]
+        indexer._routes[_source_arn][si.REINDEX_INDEX_NAME] = None
+
+        # misses are not reloaded more than once per miss refresh interval
+        with self.assertRaises(si.DetailedException):
+            indexer.forward([dict(r, eventSourceARN='arn:prod') for r in self._records(1)])
+        self.assertEqual(1, control_table.loads)
+
+        # and are reloaded after it, even though the routing table has not expired
+        new_arn = _source_arn.replace("StreamsTest", "NewTest")
+        new_config = {'DeliveryStreams': {params.RESOURCE: {'SourceStreamARN': new_arn,
+                                                            'DestinationDeliveryStreamARN': 'NewTest-dev'}}}
+        control_table._items.append({params.CONTROL_HASH: 'NewTest-dev', params.CONTROL_SORT: params.CONTROL_TYPE_META,
+                                     params.STAGE: 'dev', params.SEARCH_CONFIG: new_config})
+        indexer._routes_miss_loaded -= si.ROUTE_MISS_REFRESH_SECONDS + 1
+        indexer.forward([dict(r, eventSourceARN=new_arn) for r in self._records(1)])
+        self.assertEqual(2, control_table.loads)
+        self.assertIn(new_arn, indexer._routes)
+
+    def test_index_template(self):
+        table_name = 'StreamsTest-dev'
+        alias = 'awsdataapi-streamstest-dev-resource'
+        schema = {'properties': {'name': {'type': 'string'},
+                                 'status': {'type': 'string', 'enum': ['active', 'inactive']},
+                                 'code': {'type': 'string', params.SCHEMA_SEARCH_MAPPING: 'keyword'},
+                                 'created': {'type': 'string', 'format': 'date-time'},
+                                 'count': {'type': ['integer', 'null']},
+                                 'price': {'type': 'number'},
+                                 'image': {'type': 'string', 'contentEncoding': 'base64'},
+                                 'raw': {'type': 'object', params.SCHEMA_SEARCH_MAPPING: 'disabled'},
+                                 'tags': {'type': 'array', 'items': {'type': 'string',
+                                                                    params.SCHEMA_SEARCH_MAPPING: 'keyword'}},
+                                 'address': {'type': 'object', 'properties': {'postcode': {'type': 'string'}}},
+                                 'other': {}},
+                  'additionalProperties': False}
+        search_client = SearchClient()
+        indexer = self._indexer(None, {})
+        indexer._search_clients[_endpoint] = search_client
+
+        # a new namespace gets a versioned index behind its alias, created from the template
+        self.assertTrue(indexer.apply_index_template(table_name, _search_config(), params.RESOURCE, schema))
+        template = search_client.indices.templates[alias]
+        self.assertEqual([alias, f"{alias}-*"], template['index_patterns'])
+        self.assertEqual(params.DEFAULT_SEARCH_REFRESH_INTERVAL, template['settings']['index']['refresh_interval'])
+        self.assertEqual({'name': {'type': 'text'}, 'status': {'type': 'keyword'}, 'code': {'type': 'keyword'},
+                          'created': {'type': 'date'}, 'count': {'type': 'long'}, 'price': {'type': 'double'},
+                          'image': {'type': 'binary'}, 'raw': {'type': 'object', 'enabled': False},
+                          'tags': {'type': 'keyword'}, 'address': {'properties': {'postcode': {'type': 'text'}}},
+                          si.DOCUMENT_ID: {'type': 'keyword'}, params.DELETED: {'type': 'boolean'}},
+                         template['mappings']['properties'])
+        self.assertFalse(template['mappings']['dynamic'])
+        self.assertTrue(search_client.indices.resolve(alias).startswith(f"{alias}-"))
+
+        # schema changes are applied to the current index, unless they change the mapping of an existing attribute
+        schema['properties']['size'] = {'type': 'integer'}
+        config = _search_config(**{params.SEARCH_REFRESH_INTERVAL: '5s'})
+        search_client.indices.mappings[search_client.indices.resolve(alias)] = {}
+        self.assertTrue(indexer.apply_index_template(table_name, config, params.RESOURCE, schema))
+        self.assertEqual({'type': 'long'}, search_client.indices.mappings[search_client.indices.resolve(alias)]['size'])
+        self.assertEqual('5s', search_client.indices.settings[search_client.indices.resolve(alias)]['refresh_interval'])
+
+        schema['properties']['size'] = {'type': 'string'}
+        self.assertFalse(indexer.apply_index_template(table_name, config, params.RESOURCE, schema))
+        self.assertEqual({'type': 'text'}, search_client.indices.templates[alias]['mappings']['properties']['size'])
+
+    def test_reindex(self):
+        table_name = 'StreamsTest-dev'
+        alias = 'awsdataapi-streamstest-dev-resource'
+        search_config = _search_config(**{params.SEARCH_INDEXER_MODE: params.SEARCH_INDEXER_MODE_BULK})
+        search_config['DeliveryStreams'][params.METADATA] = {
+            'SourceStreamARN': _source_arn.replace("StreamsTest-dev", "StreamsTest-dev-Metadata"),
+            'IndexName': 'streamstest-metadata'}
+        control_table = ControlTable([{params.CONTROL_HASH: table_name, params.CONTROL_SORT: params.CONTROL_TYPE_META,
+                                       params.STAGE: 'dev', params.SEARCH_CONFIG: search_config}])
+        search_client = SearchClient()
+        search_client.indexes[alias] = {'stale': {'id': 'stale'}}
+        dynamo_client = DynamoClient({
+            table_name: [{'id': {'S': str(i)}, 'seq': {'N': '0'}, params.ITEM_VERSION: {'N': '1'},
+                          params.DELETED: {'N': '1' if i == 4 else '0'}} for i in range(7)],
+            f"{table_name}-Metadata": [{'id': {'S': '0-meta'}, 'CostCenter': {'S': '7003'}}]
+        })
+
+        indexer = self._indexer(None, {})
+        indexer._api_control_table = control_table
+        indexer._search_clients[_endpoint] = search_client
+        indexer._ddb_client = dynamo_client
+        refresh = si.ROUTE_REFRESH_SECONDS
+        si.ROUTE_REFRESH_SECONDS = 0
+
+        try:
+            job = indexer.start_reindex(table_name, search_config, total_segments=2, read_capacity=1000)
+            index_name = job['Indexes'][params.RESOURCE]
+            self.assertEqual(f"{alias}-{job['Version']}", index_name)
+            self.assertEqual(4, job['Remaining'])
+            self.assertEqual('-1', search_client.indices.settings[index_name]['refresh_interval'])
+
+            # indexers load the reindex target, and also write changes to the new index. item 2 is deleted before
+            # the scan reaches it
+            records = self._records(3)
+            records[1]['dynamodb']['NewImage'].update({'seq': {'N': '1'}, params.ITEM_VERSION: {'N': '2'}})
+            records[2]['eventName'] = 'REMOVE'
+            records[2]['dynamodb']['OldImage'] = dict(records[2]['dynamodb'].pop('NewImage'),
+                                                      **{params.ITEM_VERSION: {'N': '1'}})
+            indexer.forward(records)
+            self.assertEqual(index_name, indexer._routes[_source_arn][si.REINDEX_INDEX_NAME])
+            self.assertEqual(['0', '1'], sorted(search_client.indexes[index_name].keys()))
+            self.assertEqual(2, search_client.versions[(index_name, '2')])
+
+            # a segment stops when the invocation is running out of time, and resumes from its checkpoint
+            self.assertFalse(indexer.reindex_segment(job, table_name, params.RESOURCE, 0, remaining_millis=lambda: 0))
+            job = indexer.get_reindex_job(table_name)
+            self.assertEqual(2, job['Segments'][f"{params.RESOURCE}-0"]['Indexed'])
+
+            for search_type, segment in [(params.RESOURCE, 0), (params.RESOURCE, 1), (params.METADATA, 0),
+                                         (params.METADATA, 1)]:
+                self.assertTrue(indexer.reindex_segment(job, table_name, search_type, segment))
+                job = indexer.get_reindex_job(table_name)
+
+            self.assertEqual([(table_name, 0, None), (table_name, 0, {'offset': {'N': '2'}})],
+                             [s for s in dynamo_client.scans if s[:2] == (table_name, 0)])
+        finally:
+            si.ROUTE_REFRESH_SECONDS = refresh
+
+        # deleted items aren't indexed, and changes and deletes written by indexers aren't replaced by older scanned
+        # items
+        documents = search_client.indexes[index_name]
+        self.assertEqual(['0', '1', '3', '5', '6'], sorted(documents.keys()))
+        self.assertEqual(1, documents['1']['seq'])
+        self.assertEqual('7003', search_client.indexes[job['Indexes'][params.METADATA]]['0-meta']['CostCenter'])
+
+        # the last segment flips the alias, replacing the index which was created before reindexing
+        self.assertEqual(params.STATUS_ACTIVE, job['Status'])
+        self.assertEqual(0, job['Remaining'])
+        self.assertEqual(index_name, search_client.indices.aliases[alias])
+        self.assertNotIn(alias, search_client.indexes)
+        self.assertEqual(params.DEFAULT_SEARCH_REFRESH_INTERVAL,
+                         search_client.indices.settings[index_name]['refresh_interval'])
+        self.assertNotIn(si.REINDEX_INDEX_NAME, control_table._get(
+            {params.CONTROL_HASH: table_name, params.CONTROL_SORT: params.CONTROL_TYPE_META})[params.SEARCH_CONFIG][
+            'DeliveryStreams'][params.RESOURCE])
+
+        # completed segments aren't counted again
+        self.assertTrue(indexer.reindex_segment(job, table_name, params.RESOURCE, 0))
+        self.assertEqual(0, indexer.get_reindex_job(table_name)['Remaining'])
+
+
+if __name__ == '__main__':
+    unittest.main()